@@ -0,0 +1,109 @@
+# benchmarks/bench_export.py
+"""
+Exportación a Excel de "seleccionar todo" para cada asignatura de data/.
+
+Genera las seis tablas con todos los códigos del dataset (una vez) y mide
+utils.export.exportar_excel escribiendo a memoria (BytesIO) y a un fichero:
+tiempo (mediana), pico de memoria Python (tracemalloc) y tamaño del .xlsx.
+
+Después, el coste por celda escrita (µs/celda, mediana) con selecciones de
+distinto tamaño: un código, ~10 % de los códigos (al azar, semilla fija) y
+todos. Con selecciones pequeñas casi todo el texto va sin marcar.
+
+Uso:
+    python -m benchmarks.bench_export [--repeat N] [ruta.xlsx ...]
+"""
+import argparse
+import io
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.bench_loader import _es_libro_curricular
+from core.engine.generate import generate_from_excel
+from core.loader import cargar_datos
+from utils.export import exportar_excel
+
+
+def _todos(ruta: Path) -> list:
+    data = cargar_datos(str(ruta))
+    return sorted(str(c) for c in data.ssbb_set | data.ce_set | data.cev_set | data.do_set)
+
+
+def _tablas(ruta: Path, seleccion=None) -> tuple:
+    seleccion = _todos(ruta) if seleccion is None else seleccion
+    res = generate_from_excel(str(ruta), seleccion, build_excel=False, use_cache=False)
+    return (res.tabla1, res.tabla2_ssbb, res.tabla2_ce, res.tabla2_cev, res.tabla2_do, res.tabla3, res.seleccionados)
+
+
+def _n_celdas(tablas: tuple) -> int:
+    # cabeceras + datos; la tabla 3 se escribe dos veces (hoja 2 y hoja 3)
+    return sum((len(t) + 1) * len(t.columns) for t in tablas[:6]) + (len(tablas[5]) + 1) * len(tablas[5].columns)
+
+
+def _medir(exportar, repeat: int) -> tuple:
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        exportar()
+        tiempos.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    exportar()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("rutas", nargs="*", help="Excel a medir (por defecto data/*.xlsx).")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rutas = [Path(r) for r in args.rutas] or sorted(Path("data").glob("*.xlsx"))
+
+    print(f"{'fichero':<28}{'destino':>10}{'tiempo':>12}{'pico mem':>12}{'tamaño':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for ruta in rutas:
+            if not _es_libro_curricular(ruta):
+                continue
+            tablas = _tablas(ruta)
+            destino = Path(tmp) / f"{ruta.stem}.xlsx"
+            for nombre, exportar in (
+                ("BytesIO", lambda: exportar_excel(*tablas, destino=io.BytesIO())),
+                ("fichero", lambda: exportar_excel(*tablas, destino=str(destino))),
+            ):
+                tiempo, pico = _medir(exportar, args.repeat)
+                tamaño = destino.stat().st_size if nombre == "fichero" else len(exportar().getvalue())
+                print(
+                    f"{ruta.name:<28}{nombre:>10}{tiempo * 1000:>10.1f}ms"
+                    f"{pico / 1024:>9.0f}KiB{tamaño / 1024:>8.0f}KiB"
+                )
+
+    print()
+    print(f"{'fichero':<28}{'selección':>10}{'celdas':>8}{'tiempo':>12}{'por celda':>12}")
+    rnd = random.Random(0)
+    for ruta in rutas:
+        if not _es_libro_curricular(ruta):
+            continue
+        todos = _todos(ruta)
+        for nombre, seleccion in (
+            ("1", todos[:1]),
+            ("10%", rnd.sample(todos, max(1, len(todos) // 10))),
+            ("todos", todos),
+        ):
+            tablas = _tablas(ruta, seleccion)
+            celdas = _n_celdas(tablas)
+            tiempo, _ = _medir(lambda: exportar_excel(*tablas, destino=io.BytesIO()), args.repeat)
+            print(
+                f"{ruta.name:<28}{nombre:>10}{celdas:>8}{tiempo * 1000:>10.1f}ms"
+                f"{tiempo / celdas * 1e6:>10.1f}µs"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
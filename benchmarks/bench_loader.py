@@ -0,0 +1,60 @@
+# benchmarks/bench_loader.py
+"""
+Tiempo de carga de los Excel de data/ con cada motor del loader (sin caché ni snapshot).
+
+Uso:
+    python -m benchmarks.bench_loader [--repeat N] [ruta.xlsx ...]
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from core.loader import ENGINES, HOJAS, _calamine_disponible, cargar_datos
+
+
+def _es_libro_curricular(ruta: Path) -> bool:
+    import openpyxl
+
+    libro = openpyxl.load_workbook(ruta, read_only=True)
+    try:
+        return set(HOJAS).issubset(libro.sheetnames)
+    finally:
+        libro.close()
+
+
+def _medir(ruta: Path, engine: str, repeat: int) -> float:
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cargar_datos(str(ruta), use_cache=False, use_snapshot=False, engine=engine)
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("rutas", nargs="*", help="Excel a medir (por defecto data/*.xlsx).")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rutas = [Path(r) for r in args.rutas] or sorted(Path("data").glob("*.xlsx"))
+    engines = [e for e in ENGINES if e != "auto" and (e != "calamine" or _calamine_disponible())]
+
+    print(f"{'fichero':<28}" + "".join(f"{e:>12}" for e in engines) + f"{'mejora':>10}")
+    for ruta in rutas:
+        if not _es_libro_curricular(ruta):
+            print(f"{ruta.name:<28}  (omitido: no tiene las hojas {', '.join(HOJAS)})")
+            continue
+        medidas = {e: _medir(ruta, e, args.repeat) for e in engines}
+        mejor = min(v for e, v in medidas.items() if e != "pandas")
+        print(
+            f"{ruta.name:<28}"
+            + "".join(f"{medidas[e] * 1000:>10.1f}ms" for e in engines)
+            + f"{medidas['pandas'] / mejor:>9.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
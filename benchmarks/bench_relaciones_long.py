@@ -0,0 +1,104 @@
+# benchmarks/bench_relaciones_long.py
+"""
+Memoria y latencia de relaciones_long: frame crudo vs normalizado en el loader.
+
+"crudo" reproduce lo que había antes (Tipo como texto "CE"/"CEv", un objeto str
+por celda) y filtra con las conversiones que hacía el motor en cada consulta;
+"normalizado" es el frame que produce hoy el loader (Tipo categórico, códigos
+internados) filtrado directamente.
+
+Uso:
+    python -m benchmarks.bench_relaciones_long [--repeat N] [ruta.xlsx ...]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.bench_loader import _es_libro_curricular
+from core.loader import cargar_datos
+
+
+def _bytes_reales(df: pd.DataFrame) -> int:
+    """Bytes del frame contando una sola vez cada objeto compartido (memory_usage(deep) no lo hace)."""
+    total = int(df.index.nbytes)
+    vistos = set()
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            total += int(serie.cat.codes.nbytes)
+            valores = serie.cat.categories
+        else:
+            total += int(serie.to_numpy().nbytes)
+            valores = serie
+        for v in valores:
+            if id(v) not in vistos:
+                vistos.add(id(v))
+                total += sys.getsizeof(v)
+    return total
+
+
+def _crudo(rl: pd.DataFrame) -> pd.DataFrame:
+    # Copia con un objeto str distinto por celda y Tipo como salía del melt
+    out = rl.copy()
+    for col in ("SB", "Codigo"):
+        out[col] = [(s + " ")[:-1] for s in out[col].tolist()]
+    out["Tipo"] = out["Tipo"].map({"CE": "CE", "CEV": "CEv"}).astype(object)
+    return out
+
+
+def _consultas_crudo(rl: pd.DataFrame, codigos: list) -> None:
+    tipo = rl["Tipo"].astype(str).str.strip().str.upper()
+    cod = rl["Codigo"].astype(str).str.strip().str.rstrip(".")
+    rl[(tipo == "CE") & cod.isin(codigos)]["SB"].astype(str).unique()
+    rl[(tipo == "CEV") & cod.isin(codigos)]["SB"].astype(str).unique()
+    rl[rl["SB"].astype(str).str.strip().isin(codigos)]["Codigo"].astype(str).unique()
+
+
+def _consultas_normalizado(rl: pd.DataFrame, codigos: list) -> None:
+    cod = rl["Codigo"].isin(codigos)
+    rl[(rl["Tipo"] == "CE") & cod]["SB"].unique()
+    rl[(rl["Tipo"] == "CEV") & cod]["SB"].unique()
+    rl[rl["SB"].isin(codigos)]["Codigo"].unique()
+
+
+def _medir(fn, rl, codigos, repeat: int) -> float:
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(rl, codigos)
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("rutas", nargs="*", help="Excel a medir (por defecto data/*.xlsx).")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rutas = [Path(r) for r in args.rutas] or sorted(Path("data").glob("*.xlsx"))
+
+    print(f"{'fichero':<28}{'filas':>7}{'mem crudo':>12}{'mem norm':>12}{'filtro crudo':>14}{'filtro norm':>13}")
+    for ruta in rutas:
+        if not _es_libro_curricular(ruta):
+            print(f"{ruta.name:<28}  (omitido: no es un libro curricular)")
+            continue
+        data = cargar_datos(str(ruta), use_cache=False, use_snapshot=False)
+        norm = data.relaciones_long
+        crudo = _crudo(norm)
+        codigos = sorted(data.ce_set)[:3] + sorted(data.ssbb_set)[:3]
+        print(
+            f"{ruta.name:<28}{len(norm):>7}"
+            f"{_bytes_reales(crudo) / 1024:>10.1f}KB{_bytes_reales(norm) / 1024:>10.1f}KB"
+            f"{_medir(_consultas_crudo, crudo, codigos, args.repeat) * 1000:>12.2f}ms"
+            f"{_medir(_consultas_normalizado, norm, codigos, args.repeat) * 1000:>11.2f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+# benchmarks/bench_search.py
+"""
+Latencia de la búsqueda de códigos (tables_search) sobre un currículo sintético.
+
+Compara el filtrado con str.contains sobre el frame de códigos (lo que hacía
+la vista) con core.engine.search.CodeSearchIndex, con consultas que simulan
+lo que se teclea (prefijos de códigos reales, trozos intermedios, tipos).
+También mide core.engine.fulltext.FullTextIndex (búsqueda BM25 en las
+descripciones) con descripciones sintéticas y consultas de 1-3 palabras.
+
+Uso:
+    python -m benchmarks.bench_search [--codes N] [--queries N]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import pandas as pd
+
+from core.engine.fulltext import FullTextIndex
+from core.engine.search import CodeSearchIndex
+from core.engine.sort import NaturalOrder
+
+
+def _curriculo(n: int, rnd: random.Random) -> list:
+    # SSBB "MAT.3.B.12", CE "7", CEv "7.4", DO "CCL3" hasta tener n códigos
+    codigos = {}
+    materias = ["GEH", "LYL", "MAT", "BYG", "FYQ", "ING", "EFI", "TEC"]
+    while len(codigos) < n:
+        r = rnd.random()
+        if r < 0.6:
+            c = f"{rnd.choice(materias)}.{rnd.randint(1, 4)}.{rnd.choice('ABCDEF')}.{rnd.randint(1, 40)}"
+            codigos[c] = "SSBB"
+        elif r < 0.7:
+            codigos[str(rnd.randint(1, 400))] = "CE"
+        elif r < 0.95:
+            codigos[f"{rnd.randint(1, 400)}.{rnd.randint(1, 12)}"] = "CEv"
+        else:
+            codigos[f"{rnd.choice(['CCL', 'CP', 'STEM', 'CD', 'CPSAA', 'CC', 'CE', 'CCEC'])}{rnd.randint(1, 30)}"] = "DO"
+    orden = NaturalOrder(codigos)
+    return [
+        {"code": c, "label": f"{codigos[c]} | {c}", "tipo": codigos[c]}
+        for c in orden.sorted(codigos)
+    ]
+
+
+def _consultas(items: list, n: int, rnd: random.Random) -> list:
+    out = []
+    for _ in range(n):
+        code = rnd.choice(items)["code"].lower()
+        i = rnd.randrange(len(code))
+        j = rnd.randint(i + 1, len(code))
+        out.append(code[:j] if rnd.random() < 0.6 else code[i:j])
+    return out + ["ssbb", "cev", "do |", "zz"]
+
+
+def _pandas(df: pd.DataFrame, q: str, limit: int) -> list:
+    cod = df["code"].str.lower()
+    lab = df["label"].str.lower()
+    starts = df[cod.str.startswith(q)]
+    contains = df[~cod.str.startswith(q) & cod.str.contains(q, regex=False)]
+    label_contains = df[~cod.str.contains(q, regex=False) & lab.str.contains(q, regex=False)]
+    return pd.concat([starts, contains, label_contains])["code"].tolist()[:limit]
+
+
+_PALABRAS = (
+    "revolución comunicación patrimonio cultural análisis histórico territorio "
+    "sociedad económica política ciudadanía democracia identidad diversidad "
+    "fuentes información tecnologías lectura escritura oralidad texto literario "
+    "medio ambiente sostenibilidad conflicto desigualdad población geografía "
+    "arte memoria derechos participación investigación tiempo espacio cambio"
+).split()
+
+
+def _descripciones(items: list, rnd: random.Random) -> list:
+    return [(i["code"], " de la ".join(rnd.choices(_PALABRAS, k=rnd.randint(6, 30)))) for i in items]
+
+
+def _consultas_texto(n: int, rnd: random.Random) -> list:
+    out = []
+    for _ in range(n):
+        palabras = rnd.sample(_PALABRAS, rnd.randint(1, 3))
+        corte = rnd.randint(2, len(palabras[-1]))   # última palabra a medio escribir
+        out.append(" ".join(palabras[:-1] + [palabras[-1][:corte]]))
+    return out
+
+
+def _percentiles(tiempos: list) -> str:
+    tiempos = sorted(t * 1000 for t in tiempos)
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return f"p50 {statistics.median(tiempos):7.3f}ms  p99 {p99:7.3f}ms"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--codes", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    items = _curriculo(args.codes, rnd)
+    consultas = _consultas(items, args.queries, rnd)
+
+    t0 = time.perf_counter()
+    index = CodeSearchIndex(items)
+    print(f"{len(items)} códigos, índice construido en {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    df = pd.DataFrame(items)
+    medidas = {"str.contains": [], "CodeSearchIndex": []}
+    for q in consultas:
+        t0 = time.perf_counter()
+        _pandas(df, q, args.limit)
+        medidas["str.contains"].append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        index.search(q, args.limit)
+        medidas["CodeSearchIndex"].append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    texto = FullTextIndex(_descripciones(items, rnd))
+    print(f"índice de texto construido en {(time.perf_counter() - t0) * 1000:.0f}ms")
+    medidas["FullTextIndex"] = []
+    for q in _consultas_texto(args.queries, rnd):
+        t0 = time.perf_counter()
+        texto.search(q, args.limit)
+        medidas["FullTextIndex"].append(time.perf_counter() - t0)
+
+    for nombre, tiempos in medidas.items():
+        print(f"{nombre:<18}{_percentiles(tiempos)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
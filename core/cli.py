@@ -2,21 +2,37 @@
 import argparse
 from pathlib import Path
 
-from core.engine.normalize import normalize_codes, NormalizationError
+from core.engine import bulk
+from core.engine.lookup import get_code_lookup
+from core.engine.normalize import normalize_codes, split_code_input, NormalizationError
 from core.engine.generate import generate_from_excel
 from core.loader import cargar_datos
+from utils.export_formats import FORMATOS, TIPOS, escribir_formato
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Generar relaciones curriculares a Excel.")
     parser.add_argument("--excel", required=True, help="Ruta al Excel curricular (input).")
-    parser.add_argument("--out", default="exports/relaciones_curriculares.xlsx", help="Ruta del Excel de salida.")
-    parser.add_argument("--codes", nargs="+", help="Códigos a incluir (SB/CE/CEv/DO). Si no se indican, usa el primer CE.")
+    parser.add_argument("--out", help="Ruta de salida (por defecto exports/relaciones_curriculares.<formato>, o exports/<excel>_<bulk>.zip con --bulk).")
+    parser.add_argument("--codes", nargs="+", help="Códigos a incluir (SB/CE/CEv/DO), admite patrones como 1.A.*, CE1-CE4 o 'CEv 2.*'. Si no se indican, usa el primer CE.")
+    parser.add_argument("--bulk", choices=bulk.AGRUPACIONES, help="Un Excel por CE, por CEv o por bloque de SSBB de toda la asignatura, en un ZIP (ignora --codes).")
+    parser.add_argument("--format", choices=FORMATOS, default="xlsx", help="xlsx (por defecto), csv (ZIP con un CSV por tabla), ndjson o parquet (ZIP, requiere pyarrow).")
+    parser.add_argument("--workers", type=int, default=bulk.BULK_WORKERS, help="Procesos para --bulk (por defecto SABERES_BULK_WORKERS o según las CPU).")
     args = parser.parse_args()
 
     excel_path = Path(args.excel)
-    out_path = Path(args.out)
+    if args.bulk and args.format != "xlsx":
+        parser.error("--bulk solo genera Excel (--format xlsx).")
+    if args.bulk:
+        out_path = Path(args.out or f"exports/{excel_path.stem}_{args.bulk}.zip")
+    else:
+        out_path = Path(args.out or f"exports/relaciones_curriculares.{TIPOS[args.format][1]}")
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
+    if args.bulk:
+        n = bulk.write_zip(str(excel_path), args.bulk, out_path, args.workers, nombre_base=excel_path.stem)
+        print(f"OK: {out_path}  ({n / 1024:.0f} KiB)")
+        return 0
+
     data = cargar_datos(str(excel_path))
 
     seleccionados = args.codes
@@ -24,7 +40,7 @@ def main() -> int:
         seleccionados = [str(data.ce_df["CE"].dropna().iloc[0])]
     else:
         try:
-            seleccionados = normalize_codes(seleccionados, data)
+            seleccionados = normalize_codes(split_code_input(" ".join(seleccionados)), data)
         except NormalizationError as e:
             print("❌", str(e))
             print("Ejemplos de SSBB válidos:", sorted(list(data.ssbb_set))[:15])
@@ -34,7 +50,7 @@ def main() -> int:
             return 2
 
         # Validación: comprobar que existen en los datos
-        validos = data.ssbb_set | data.ce_set | data.cev_set | data.do_set
+        validos = get_code_lookup(data).validos
         invalidos = [c for c in seleccionados if c not in validos]
 
         if invalidos:
@@ -45,6 +61,16 @@ def main() -> int:
             print("Ejemplos de DO válidos:", sorted(list(data.do_set))[:15])
             return 2
 
+    if args.format != "xlsx":
+        res = generate_from_excel(str(excel_path), seleccionados, build_excel=False)
+        try:
+            escribir_formato(res.tablas(), args.format, out_path)
+        except ImportError as e:
+            print("❌", str(e))
+            return 2
+        print(f"OK: {out_path}  (codes={seleccionados})")
+        return 0
+
     res = generate_from_excel(str(excel_path), seleccionados)
 
     # res.excel_bytes es bytes (ya lo dejaste bien)
@@ -0,0 +1,163 @@
+# core/engine/bulk.py
+"""
+Exportación masiva: un Excel por CE, por CEv o por bloque de SSBB de la
+asignatura, todos en un ZIP.
+
+El dataset se carga una sola vez en el proceso padre. Los procesos del pool
+lo heredan ya compilado (fork) o lo leen del snapshot al arrancar (spawn).
+Cada proceso escribe sus libros en ficheros temporales; el padre los mete en
+el ZIP según llegan y los borra, así que en memoria solo están los libros en
+curso (como mucho BULK_WINDOW por proceso).
+
+El ZIP se escribe sin seek (descriptores de datos tras cada entrada), así que
+sirve tanto para un fichero como para una respuesta HTTP en streaming.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+from core.engine.generate import generate_from_excel
+from core.engine.sort import natural_sorted
+from core.loader import cargar_datos
+from utils.export import exportar_excel
+from utils.export_formats import SalidaStream
+
+AGRUPACIONES = ("ce", "cev", "ssbb")
+
+# Procesos del pool (0 = según las CPU, con un máximo de 4)
+BULK_WORKERS = int(os.environ.get("SABERES_BULK_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Libros encargados por adelantado por proceso (acota la memoria y los temporales)
+BULK_WINDOW = 2
+
+
+def bloque_ssbb(code: str) -> str:
+    """Bloque de un saber básico: sus tres primeros niveles ("LCL.1.B.2.1" -> "LCL.1.B")."""
+    return ".".join(str(code).split(".")[:3])
+
+
+def grupos(data, agrupacion: str) -> List[Tuple[str, List[str]]]:
+    """(nombre del libro, códigos seleccionados) para cada libro de la agrupación, en orden natural."""
+    agrupacion = (agrupacion or "").strip().lower()
+    if agrupacion == "ce":
+        return [(f"CE{c}", [c]) for c in natural_sorted(data.ce_set)]
+    if agrupacion == "cev":
+        return [(f"CEv{c}", [c]) for c in natural_sorted(data.cev_set)]
+    if agrupacion == "ssbb":
+        bloques: dict = {}
+        for sb in natural_sorted(data.ssbb_set):
+            bloques.setdefault(bloque_ssbb(sb), []).append(sb)
+        return list(bloques.items())
+    raise ValueError(f"Agrupación desconocida: {agrupacion!r}. Opciones: {', '.join(AGRUPACIONES)}")
+
+
+# --- Procesos del pool ---
+
+_ruta_excel: Optional[str] = None
+
+
+def _init_worker(ruta_excel: str) -> None:
+    global _ruta_excel
+    _ruta_excel = ruta_excel
+    # Con fork ya está en la caché del proceso; con spawn se lee del snapshot
+    cargar_datos(ruta_excel)
+
+
+def _libro(tarea: Tuple[str, List[str], str]) -> Tuple[str, str]:
+    nombre, codigos, destino = tarea
+    res = generate_from_excel(_ruta_excel, codigos, build_excel=False, use_cache=False)
+    exportar_excel(
+        res.tabla1, res.tabla2_ssbb, res.tabla2_ce, res.tabla2_cev, res.tabla2_do, res.tabla3,
+        res.seleccionados, destino=destino,
+    )
+    return nombre, destino
+
+
+def _contexto():
+    # fork comparte el dataset ya cargado sin copiarlo ni volver a leerlo
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in metodos else None)
+
+
+def iter_libros(
+    ruta_excel: str,
+    agrupacion: str,
+    carpeta: str,
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Genera los libros de la agrupación en `carpeta` y devuelve (nombre, ruta)
+    de cada uno en el orden de grupos(). El que los recibe debe borrarlos.
+    """
+    _init_worker(ruta_excel)
+    tareas = iter(
+        (nombre, codigos, os.path.join(carpeta, f"{i:04d}.xlsx"))
+        for i, (nombre, codigos) in enumerate(grupos(cargar_datos(ruta_excel), agrupacion))
+    )
+    workers = max(1, workers or BULK_WORKERS)
+    if workers == 1:
+        for tarea in tareas:
+            yield _libro(tarea)
+        return
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=_contexto(), initializer=_init_worker, initargs=(ruta_excel,)
+    )
+    try:
+        pendientes = deque(pool.submit(_libro, t) for _, t in zip(range(workers * BULK_WINDOW), tareas))
+        while pendientes:
+            hecho = pendientes.popleft().result()
+            siguiente = next(tareas, None)
+            if siguiente is not None:
+                pendientes.append(pool.submit(_libro, siguiente))
+            yield hecho
+    finally:
+        # si se deja de consumir (p. ej. el cliente corta la descarga) se cancela lo no empezado
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _entrada(nombre_base: str, nombre: str) -> str:
+    return f"{nombre_base}_{nombre}.xlsx" if nombre_base else f"{nombre}.xlsx"
+
+
+def iter_zip(
+    ruta_excel: str,
+    agrupacion: str,
+    workers: Optional[int] = None,
+    nombre_base: str = "",
+) -> Iterator[bytes]:
+    """
+    El ZIP con un libro por grupo, en trozos (uno por libro más el directorio
+    final). Los .xlsx ya van comprimidos, así que se guardan sin recomprimir.
+    """
+    salida = SalidaStream()
+    with tempfile.TemporaryDirectory(prefix="saberes-bulk-") as carpeta:
+        with zipfile.ZipFile(salida, "w", zipfile.ZIP_STORED) as zf:
+            for nombre, ruta in iter_libros(ruta_excel, agrupacion, carpeta, workers):
+                zf.write(ruta, _entrada(nombre_base, nombre))
+                os.remove(ruta)
+                yield salida.take()
+        yield salida.take()
+
+
+def write_zip(
+    ruta_excel: str,
+    agrupacion: str,
+    destino: Union[str, os.PathLike, BinaryIO],
+    workers: Optional[int] = None,
+    nombre_base: str = "",
+) -> int:
+    """Escribe el ZIP en `destino` (ruta o fichero binario abierto); devuelve los bytes escritos."""
+    total = 0
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "wb") as fh:
+            return write_zip(ruta_excel, agrupacion, fh, workers, nombre_base)
+    for trozo in iter_zip(ruta_excel, agrupacion, workers, nombre_base):
+        destino.write(trozo)
+        total += len(trozo)
+    return total
@@ -0,0 +1,97 @@
+# core/engine/catalog.py
+"""
+Catálogo de códigos de un dataset (lo que antes se recalculaba con
+build_codigos_df en cada búsqueda, render o comprobación de demo).
+
+Se construye una vez por dataset en el loader y guarda:
+- el frame Código / Tipo / Etiqueta ordenado (tipo + orden natural)
+- code_to_type
+- la lista ordenada de códigos de cada tipo
+- los items {"code", "label"} de cada tipo (secuenciación) y todos los items
+  {"code", "label", "tipo"} en orden natural de código (listado sin búsqueda)
+- los conjuntos de códigos permitidos en demo, por límite
+- el índice de búsqueda (core.engine.search), bajo demanda
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+from core.engine.codes import TIPOS, build_codigos_df
+from core.engine.search import CodeSearchIndex
+from core.engine.sort import NaturalOrder, natural_sorted
+
+
+@dataclass
+class CodeCatalog:
+    frame: pd.DataFrame
+    code_to_type: Dict[str, str]
+    codes_by_type: Dict[str, List[str]]
+    labels: Dict[str, str]
+    items_by_type: Dict[str, List[dict]]
+    items: List[dict]
+    _demo: Dict[int, Set[str]] = field(default_factory=dict, repr=False)
+    _search: Optional[CodeSearchIndex] = field(default=None, repr=False)
+
+    def search_index(self) -> CodeSearchIndex:
+        """Índice de búsqueda sobre `items` (se construye la primera vez)."""
+        if self._search is None:
+            self._search = CodeSearchIndex(self.items)
+        return self._search
+
+    def demo_allowed(self, max_per_type: int) -> Set[str]:
+        """Los `max_per_type` primeros códigos (orden natural) de cada tipo."""
+        allowed = self._demo.get(max_per_type)
+        if allowed is None:
+            allowed = {c for tipo in TIPOS for c in self.codes_by_type.get(tipo, [])[:max_per_type]}
+            self._demo[max_per_type] = allowed
+        return allowed
+
+
+def build_catalog(
+    ssbb_df: pd.DataFrame,
+    ce_df: pd.DataFrame,
+    cev_df: pd.DataFrame,
+    do_df: pd.DataFrame,
+    orden: Optional[NaturalOrder] = None,
+) -> CodeCatalog:
+    frame = build_codigos_df(ssbb_df, ce_df, cev_df, do_df, orden).reset_index(drop=True)
+    codigos = frame["Código"].astype(str).tolist()
+    tipos = frame["Tipo"].astype(str).tolist()
+    etiquetas = frame["Etiqueta"].astype(str).tolist()
+
+    codes_by_type: Dict[str, List[str]] = {t: [] for t in TIPOS}
+    items_by_type: Dict[str, List[dict]] = {t: [] for t in TIPOS}
+    for codigo, tipo, etiqueta in zip(codigos, tipos, etiquetas):
+        if tipo in codes_by_type:
+            codes_by_type[tipo].append(codigo)
+            items_by_type[tipo].append({"code": codigo, "label": etiqueta})
+
+    items = [
+        {"code": codigos[i], "label": etiquetas[i], "tipo": tipos[i]}
+        for i in _por_codigo(codigos, orden)
+    ]
+
+    return CodeCatalog(
+        frame=frame,
+        code_to_type=dict(zip(codigos, tipos)),
+        codes_by_type=codes_by_type,
+        labels=dict(zip(codigos, etiquetas)),
+        items_by_type=items_by_type,
+        items=items,
+    )
+
+
+def _por_codigo(codigos: List[str], orden: Optional[NaturalOrder]) -> List[int]:
+    # posiciones de `codigos` en orden natural de código (sin agrupar por tipo)
+    rango = {c: i for i, c in enumerate(natural_sorted(dict.fromkeys(codigos), orden))}
+    return sorted(range(len(codigos)), key=lambda i: rango[codigos[i]])
+
+
+def get_catalog(data) -> CodeCatalog:
+    """Catálogo del CurriculumData (el loader lo construye; aquí solo por si falta)."""
+    if data.catalogo is None:
+        data.catalogo = build_catalog(data.ssbb_df, data.ce_df, data.cev_df, data.do_df, data.orden_natural)
+    return data.catalogo
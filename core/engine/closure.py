@@ -0,0 +1,59 @@
+# core/engine/closure.py
+"""
+Cierre transitivo de la tabla 3 precalculado como bitsets.
+
+La expansión de la tabla 3 (DO -> CE, cualquiera -> SB, SB -> CE/CEv, CE -> DO)
+es una unión de lo que aporta cada código por separado, así que basta con
+guardar, por cada código del dataset, el conjunto de relacionados como una fila
+de bits sobre los IDs del CompactIndex. El conjunto de una selección es el OR
+de sus filas: un np.bitwise_or.reduce sobre unas pocas filas de bytes.
+
+Se compila con el dataset (va en el snapshot) y se reconstruye cuando cambia el
+Excel, igual que el resto del CurriculumData.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Set
+
+import numpy as np
+
+from core.engine.compact import CompactIndex
+
+
+@dataclass
+class ClosureBitsets:
+    ids: Dict[str, int]
+    codes: np.ndarray
+    # fila i = relacionados del código i, empaquetados con np.packbits (bitorder "little")
+    bits: np.ndarray
+
+    def related(self, seleccionados: Iterable[str]) -> Set[str]:
+        """Elementos de la tabla 3 para la selección (los seleccionados siempre incluidos)."""
+        seleccionados = {str(s) for s in seleccionados}
+        filas = [self.ids[s] for s in seleccionados if s in self.ids]
+        if not filas:
+            return seleccionados
+        row = np.bitwise_or.reduce(self.bits[filas], axis=0)
+        miembros = np.flatnonzero(np.unpackbits(row, count=len(self.codes), bitorder="little"))
+        return seleccionados.union(self.codes[miembros].tolist())
+
+    def row_codes(self, code: str) -> List[str]:
+        """Relacionados de un solo código (su fila); [] si no está en el índice."""
+        i = self.ids.get(code)
+        if i is None:
+            return []
+        miembros = np.flatnonzero(np.unpackbits(self.bits[i], count=len(self.codes), bitorder="little"))
+        return self.codes[miembros].tolist()
+
+
+def build_closure(comp: CompactIndex, expand: Callable[[str], Iterable[str]]) -> ClosureBitsets:
+    """`expand(código)` da los relacionados de un solo código (p. ej. relacionados_tabla3)."""
+    n = len(comp.codes)
+    # cada fila se empaqueta directamente (bit j de la fila = byte j >> 3, bit j & 7):
+    # sin pasar por una matriz de bool n x n, que ocupa 8 veces más
+    bits = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+    for code, i in comp.ids.items():
+        cols = np.fromiter((comp.ids[c] for c in expand(code) if c in comp.ids), dtype=np.int64)
+        np.bitwise_or.at(bits[i], cols >> 3, np.left_shift(1, cols & 7).astype(np.uint8))
+    return ClosureBitsets(ids=comp.ids, codes=comp.codes, bits=bits)
@@ -1,7 +1,44 @@
+from typing import Optional
+
 import pandas as pd
-from core.engine.sort import natural_sort_key
+from core.engine.sort import NaturalOrder, natural_sort_key
+
+TIPOS = ("SSBB", "CE", "CEv", "DO")
+
+
+def _norm_code(value) -> str:
+    return str(value or "").strip().rstrip(".")
+
+
+def build_tipos(ssbb_set: set, ce_set: set, cev_set: set, do_set: set) -> tuple[dict, dict]:
+    """
+    Devuelve (tipo_por_codigo, codigos_por_tipo) con los códigos normalizados.
+    Si un código aparece en varios tipos gana el primero de TIPOS (SSBB > CE > CEv > DO).
+    """
+    codigos_por_tipo = {
+        "SSBB": {_norm_code(x) for x in ssbb_set},
+        "CE": {_norm_code(x) for x in ce_set},
+        "CEv": {_norm_code(x) for x in cev_set},
+        "DO": {_norm_code(x) for x in do_set},
+    }
+    tipo_por_codigo = {}
+    for tipo in reversed(TIPOS):
+        for codigo in codigos_por_tipo[tipo]:
+            tipo_por_codigo[codigo] = tipo
+    return tipo_por_codigo, codigos_por_tipo
+
+
+def _clave_codigo(s: pd.Series, orden: Optional[NaturalOrder]) -> pd.Series:
+    return orden.sort_key(s) if orden is not None else s.map(natural_sort_key)
+
 
-def build_codigos_df(ssbb_df: pd.DataFrame, ce_df: pd.DataFrame, cev_df: pd.DataFrame, do_df: pd.DataFrame) -> pd.DataFrame:
+def build_codigos_df(
+    ssbb_df: pd.DataFrame,
+    ce_df: pd.DataFrame,
+    cev_df: pd.DataFrame,
+    do_df: pd.DataFrame,
+    orden: Optional[NaturalOrder] = None,
+) -> pd.DataFrame:
     ssbb = set(ssbb_df["Saber Básico"].astype(str).values)
     ce = set(ce_df["CE"].astype(str).values)
     cev = set(cev_df["Número"].astype(str).values)
@@ -25,7 +62,7 @@ def build_codigos_df(ssbb_df: pd.DataFrame, ce_df: pd.DataFrame, cev_df: pd.Data
     df["TipoOrden"] = df["Tipo"].map(orden_tipo).fillna(99)
     df = df.sort_values(
         by=["TipoOrden", "Código"],
-        key=lambda s: s.map(natural_sort_key) if s.name == "Código" else s
+        key=lambda s: _clave_codigo(s, orden) if s.name == "Código" else s
     ).drop(columns="TipoOrden")
 
     # ✅ SIEMPRE crear Etiqueta al final
@@ -0,0 +1,169 @@
+# core/engine/compact.py
+"""
+Representación compacta del índice de relaciones (motor "csr").
+
+Cada código del dataset tiene un ID int32 denso; cada relación se guarda como
+una matriz dispersa CSR (indptr, indices) sobre esos IDs y las descripciones van
+en un array paralelo a los códigos. Las consultas convierten los códigos a IDs,
+hacen el gather de las filas CSR con numpy y la unión con np.unique, así que el
+coste no depende de comparar strings.
+
+Expone la misma interfaz de consulta que RelationIndex (ce_for_sb, sb_for_code,
+...), de modo que core.relaciones genera las tablas con cualquiera de los dos.
+El orden de los resultados es el de los IDs (no el de aparición en el Excel);
+las tablas no dependen de él porque todo se ordena de forma natural al final.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from core.engine.relation_index import Adjacency, RelationIndex
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+@dataclass
+class CSR:
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    def gather(self, ids: np.ndarray) -> np.ndarray:
+        """IDs únicos (ordenados) relacionados con alguno de `ids`."""
+        if not len(ids):
+            return _EMPTY
+        starts = self.indptr[ids]
+        lens = self.indptr[ids + 1] - starts
+        total = int(lens.sum())
+        if not total:
+            return _EMPTY
+        # posición de cada elemento dentro de `indices`: inicio de su fila + desplazamiento
+        offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+        return np.unique(self.indices[offsets])
+
+
+def _csr(n: int, pares: List[Tuple[int, int]]) -> CSR:
+    if not pares:
+        return CSR(np.zeros(n + 1, dtype=np.int32), _EMPTY)
+    arr = np.unique(np.array(pares, dtype=np.int32), axis=0)
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.add.at(indptr, arr[:, 0] + 1, 1)
+    return CSR(np.cumsum(indptr, dtype=np.int32), np.ascontiguousarray(arr[:, 1]))
+
+
+@dataclass
+class CompactIndex:
+    # código <-> ID
+    ids: Dict[str, int] = field(default_factory=dict)
+    codes: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    descripciones: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+
+    sb_to_ce: CSR = None
+    sb_to_cev: CSR = None
+    ce_to_sb: CSR = None
+    cev_to_sb: CSR = None
+    ce_to_do: CSR = None
+    do_to_ce: CSR = None
+    ce_to_cev: CSR = None  # CEv colgando de cada código por prefijo
+
+    # mismos conjuntos que RelationIndex (compartidos, no copiados)
+    sb_values: Set[str] = field(default_factory=set)
+    code_values: Set[str] = field(default_factory=set)
+    ce_codes: Set[str] = field(default_factory=set)
+    cev_codes: Set[str] = field(default_factory=set)
+    do_values: Set[str] = field(default_factory=set)
+    ce_values: Set[str] = field(default_factory=set)
+    first_tipo: Dict[str, str] = field(default_factory=dict)
+
+    def to_ids(self, codes: Iterable[str]) -> np.ndarray:
+        ids = self.ids
+        return np.fromiter((ids[c] for c in set(codes) if c in ids), dtype=np.int32)
+
+    def to_codes(self, ids: np.ndarray) -> List[str]:
+        return self.codes[ids].tolist()
+
+    def _query(self, relaciones: Tuple[CSR, ...], codes: Iterable[str]) -> List[str]:
+        ids = self.to_ids(codes)
+        if len(relaciones) == 1:
+            return self.to_codes(relaciones[0].gather(ids))
+        return self.to_codes(np.unique(np.concatenate([r.gather(ids) for r in relaciones])))
+
+    # --- SSBB <-> CE / CEv ---
+    def ce_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        return self._query((self.sb_to_ce,), sbs)
+
+    def cev_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        return self._query((self.sb_to_cev,), sbs)
+
+    def code_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        return self._query((self.sb_to_ce, self.sb_to_cev), sbs)
+
+    def sb_for_ce(self, ces: Iterable[str]) -> List[str]:
+        return self._query((self.ce_to_sb,), ces)
+
+    def sb_for_cev(self, cevs: Iterable[str]) -> List[str]:
+        return self._query((self.cev_to_sb,), cevs)
+
+    def sb_for_code(self, codes: Iterable[str]) -> List[str]:
+        return self._query((self.ce_to_sb, self.cev_to_sb), codes)
+
+    # --- CE <-> DO ---
+    def do_for_ce(self, ces: Iterable[str]) -> List[str]:
+        return self._query((self.ce_to_do,), ces)
+
+    def ce_for_do(self, dos: Iterable[str]) -> List[str]:
+        return self._query((self.do_to_ce,), dos)
+
+    # --- CE -> CEv (por prefijo) ---
+    def cev_for_ce(self, ces: Iterable[str]) -> List[str]:
+        return self._query((self.ce_to_cev,), ces)
+
+
+def build_compact_index(idx: RelationIndex, descripciones: dict) -> CompactIndex:
+    # Todos los códigos que pueden aparecer en una consulta, con ID por orden de aparición
+    ids: Dict[str, int] = {}
+
+    def _id(code: str) -> int:
+        return ids.setdefault(code, len(ids))
+
+    adyacencias = {
+        "sb_to_ce": idx.sb_to_ce,
+        "sb_to_cev": idx.sb_to_cev,
+        "ce_to_sb": idx.ce_to_sb,
+        "cev_to_sb": idx.cev_to_sb,
+        "ce_to_do": idx.ce_to_do,
+        "do_to_ce": idx.do_to_ce,
+    }
+    pares: Dict[str, List[Tuple[int, int]]] = {}
+    for nombre, adj in adyacencias.items():
+        pares[nombre] = [(_id(k), _id(v)) for k, vals in adj.items() for _, v in vals]
+    for code in list(idx.ce_values) + (idx.cev_tree.codes() if idx.cev_tree is not None else []):
+        _id(code)
+
+    ce_to_cev = []
+    if idx.cev_tree is not None:
+        for code in list(ids):
+            ce_to_cev.extend((ids[code], _id(cev)) for cev in idx.cev_tree.descendants(code))
+
+    n = len(ids)
+    codes = np.empty(n, dtype=object)
+    for code, i in ids.items():
+        codes[i] = code
+    comp = CompactIndex(
+        ids=ids,
+        codes=codes,
+        descripciones=np.array([descripciones.get(c) for c in codes.tolist()], dtype=object),
+        ce_to_cev=_csr(n, ce_to_cev),
+        sb_values=idx.sb_values,
+        code_values=idx.code_values,
+        ce_codes=idx.ce_codes,
+        cev_codes=idx.cev_codes,
+        do_values=idx.do_values,
+        ce_values=idx.ce_values,
+        first_tipo=idx.first_tipo,
+    )
+    for nombre, lista in pares.items():
+        setattr(comp, nombre, _csr(n, lista))
+    return comp
@@ -0,0 +1,149 @@
+# core/engine/fulltext.py
+"""
+Búsqueda de texto libre sobre las descripciones (SSBB / CE / CEv / DO).
+
+Índice invertido sobre el texto plegado (minúsculas y sin tildes: "revolución"
+y "revolucion" son el mismo término) y ranking BM25. Como BM25 solo depende de
+la consulta a través de qué términos aparecen, el peso de cada (término,
+código) se calcula al construir el índice y buscar es sumar pesos de unas
+pocas listas.
+
+El último término de la consulta se trata como prefijo (la búsqueda se lanza
+mientras se teclea: "revol" ya encuentra "revolución").
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from math import log
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.engine.sort import NaturalOrder, natural_sorted
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Expansión del último token como prefijo: con 1 carácter no se expande y, si
+# hay más de PREFIX_MAX_TERMS términos con ese prefijo, se quedan los que
+# aparecen en más descripciones
+PREFIX_MIN_LEN = 2
+PREFIX_MAX_TERMS = 64
+
+# Palabras vacías: aparecen en casi todas las descripciones
+STOPWORDS = frozenset(
+    "a al como con de del e el en entre es la las lo los o para por que se sin "
+    "su sus un una uno y".split()
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+_MAX_CHAR = "\U0010ffff"
+
+
+def fold(texto: str) -> str:
+    """Minúsculas y sin diacríticos ("Comunicación" -> "comunicacion")."""
+    descompuesto = unicodedata.normalize("NFKD", str(texto or "").lower())
+    return "".join(ch for ch in descompuesto if not unicodedata.combining(ch))
+
+
+def tokenize(texto: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(fold(texto)) if t not in STOPWORDS]
+
+
+def _terminos_consulta(q: str) -> Tuple[List[str], Optional[str]]:
+    # (términos completos, último término a medio escribir o None)
+    tokens = _TOKEN_RE.findall(fold(q))
+    ultimo = None
+    if tokens and _TOKEN_RE.match(q[-1:]):
+        ultimo = tokens.pop()
+    return [t for t in dict.fromkeys(tokens) if t not in STOPWORDS], ultimo
+
+
+class FullTextIndex:
+    def __init__(self, documentos: Iterable[Tuple[str, str]]):
+        # documentos (código, texto) en el orden de desempate (orden natural)
+        self.codes: List[str] = []
+        frecuencias: List[Dict[str, int]] = []
+        for code, texto in documentos:
+            tf: Dict[str, int] = {}
+            for token in tokenize(texto):
+                tf[token] = tf.get(token, 0) + 1
+            self.codes.append(code)
+            frecuencias.append(tf)
+
+        n = len(frecuencias)
+        longitudes = [sum(tf.values()) for tf in frecuencias]
+        media = (sum(longitudes) / n) if n else 0.0
+        df: Dict[str, int] = {}
+        for tf in frecuencias:
+            for term in tf:
+                df[term] = df.get(term, 0) + 1
+
+        # término -> [(doc, peso BM25)] con doc ascendente
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, tf in enumerate(frecuencias):
+            norma = BM25_K1 * (1 - BM25_B + BM25_B * (longitudes[doc] / media if media else 0.0))
+            for term, f in tf.items():
+                idf = log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                postings.setdefault(term, []).append((doc, idf * f * (BM25_K1 + 1) / (f + norma)))
+        self.postings = postings
+        self.vocabulario = sorted(postings)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _prefijo(self, term: str) -> List[str]:
+        if len(term) < PREFIX_MIN_LEN:
+            return [term] if term in self.postings else []
+        lo = bisect_left(self.vocabulario, term)
+        hi = bisect_left(self.vocabulario, term + _MAX_CHAR, lo)
+        if hi - lo <= PREFIX_MAX_TERMS:
+            return self.vocabulario[lo:hi]
+        # frecuencia de documento = longitud de la lista de postings
+        return heapq.nlargest(PREFIX_MAX_TERMS, self.vocabulario[lo:hi], key=lambda t: len(self.postings[t]))
+
+    def search(self, q: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """[(código, puntuación)] de mayor a menor puntuación (empates en orden natural)."""
+        terms, ultimo = _terminos_consulta(q or "")
+        if not terms and ultimo is None:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in terms:
+            for doc, peso in self.postings.get(term, ()):
+                scores[doc] = scores.get(doc, 0.0) + peso
+        if ultimo is not None:
+            # Un documento que casa con varias expansiones suma solo la mejor
+            mejor: Dict[int, float] = {}
+            for term in self._prefijo(ultimo):
+                for doc, peso in self.postings[term]:
+                    if peso > mejor.get(doc, 0.0):
+                        mejor[doc] = peso
+            for doc, peso in mejor.items():
+                scores[doc] = scores.get(doc, 0.0) + peso
+
+        clave = lambda x: (-x[1], x[0])
+        if limit is None:
+            ranking = sorted(scores.items(), key=clave)
+        else:
+            ranking = heapq.nsmallest(limit, scores.items(), key=clave)
+        return [(self.codes[doc], score) for doc, score in ranking]
+
+
+def build_fulltext_index(descripciones: dict, orden: Optional[NaturalOrder] = None) -> FullTextIndex:
+    # descripciones vacías (NaN) cuentan como texto vacío
+    textos = {str(c): t if isinstance(t, str) else "" for c, t in descripciones.items()}
+    return FullTextIndex((c, textos[c]) for c in natural_sorted(textos, orden))
+
+
+def get_fulltext_index(data) -> FullTextIndex:
+    """Índice del CurriculumData (el loader lo construye; aquí solo por si falta)."""
+    if data.indice_texto is None:
+        data.indice_texto = build_fulltext_index(data.descripciones, data.orden_natural)
+    return data.indice_texto
+
+
+def search_descriptions(data, q: str, limit: Optional[int] = None) -> List[str]:
+    """Códigos cuya descripción casa con `q`, ordenados por relevancia."""
+    return [code for code, _ in get_fulltext_index(data).search(q, limit)]
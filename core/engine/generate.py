@@ -1,13 +1,23 @@
 # core/engine/generate.py
-from dataclasses import dataclass
-from typing import List, Optional
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
 import pandas as pd
 
+from core.engine import incremental, result_cache
+from core.engine.pipeline import TABLAS, generar_tablas, normalizar_tablas
 from core.loader import cargar_datos
-from core.relaciones import generar_tabla1, generar_tabla2_ssbb, generar_tabla3, generar_tabla2_ce, generar_tabla2_cev, generar_tabla2_do
+from core.relaciones import _indice, _indice_compacto
 from utils.export import exportar_excel
 
 
+# Motor de generación: "pandas" (índice de adyacencias sobre los frames, el de
+# siempre) o "csr" (IDs int32 + matrices CSR, ver core.engine.compact).
+# Los dos producen las mismas tablas.
+GENERATE_ENGINE = os.environ.get("SABERES_GENERATE_ENGINE", "pandas")
+ENGINES = ("pandas", "csr")
+
+
 @dataclass
 class GenerateResult:
     tabla1: pd.DataFrame
@@ -17,34 +27,154 @@ class GenerateResult:
     tabla2_do: pd.DataFrame
     tabla3: pd.DataFrame
     excel_bytes: Optional[bytes] = None
+    # selección normalizada que produjo las tablas (base para generate_delta)
+    seleccionados: List[str] = field(default_factory=list)
+    # contadores de core.engine.incremental para encadenar generate_delta
+    estado: Optional[incremental.IncrementalState] = field(default=None, repr=False, compare=False)
+
+    def tablas(self) -> Dict[str, pd.DataFrame]:
+        """Las seis tablas por nombre, en el orden de TABLAS (para utils.export_formats)."""
+        return {nombre: getattr(self, nombre) for nombre in TABLAS}
+
+
+def _indice_motor(data, engine: Optional[str]):
+    engine = (engine or GENERATE_ENGINE or "pandas").strip().lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de generación desconocido: {engine!r}. Opciones: {', '.join(ENGINES)}")
+    return _indice_compacto(data) if engine == "csr" else _indice(data)
+
+
+def _normalizar_seleccion(seleccionados) -> List[str]:
+    # strip + rstrip(".") y sin repetidos, conservando el orden
+    out = []
+    for c in seleccionados or []:
+        c = str(c).strip().rstrip(".")
+        if c and c not in out:
+            out.append(c)
+    return out
 
 
 def generate_from_excel(
     ruta_excel: str,
     seleccionados: List[str],
     build_excel: bool = True,
+    use_cache: bool = True,
+    engine: Optional[str] = None,
+    tables: Optional[Iterable[str]] = None,
 ) -> GenerateResult:
+    """
+    Genera las seis tablas (y el Excel si build_excel) para la selección.
+
+    Con use_cache el resultado se memoiza por (contenido del dataset, códigos,
+    build_excel); el GenerateResult devuelto puede ser compartido: no mutarlo.
+    `engine` elige el motor ("pandas" o "csr"; por defecto GENERATE_ENGINE).
+    Como dan el mismo resultado, comparten la entrada de caché.
+    `tables` limita el cálculo a esas tablas (p. ej. ("tabla2_ssbb", "tabla2_cev"));
+    las demás salen vacías. Se ignora con build_excel, que necesita las seis.
+    """
     data = cargar_datos(ruta_excel)
+    seleccionados = _normalizar_seleccion(seleccionados)
+    idx = _indice_motor(data, engine)
+    tablas = normalizar_tablas(tables) if tables is not None and not build_excel else TABLAS
+    subconjunto = tablas if tablas != TABLAS else None
+
+    cache = result_cache.get_result_cache() if use_cache and data.dataset_hash else None
+    key = None
+    if cache is not None:
+        key, res = _buscar(cache, data, seleccionados, build_excel, subconjunto)
+        if res is not None:
+            return res
 
-    tabla1 = generar_tabla1(seleccionados, data)
-    tabla2_ssbb = generar_tabla2_ssbb(seleccionados, data)
-    tabla2_ce = generar_tabla2_ce(seleccionados, data)
-    tabla2_cev = generar_tabla2_cev(seleccionados, data)
-    tabla2_do = generar_tabla2_do(seleccionados, data)
-    tabla3 = generar_tabla3(seleccionados, data)
+    res = _resultado(generar_tablas(seleccionados, data, idx, tablas), seleccionados, build_excel)
+    if cache is not None:
+        cache.set(key, res)
+    return res
 
+
+def _resultado(tablas: dict, seleccionados: List[str], build_excel: bool) -> GenerateResult:
     excel_bytes: Optional[bytes] = None
     if build_excel:
-        excel_io = exportar_excel(tabla1, tabla2_ssbb, tabla2_ce, tabla2_cev, tabla2_do, tabla3, seleccionados)
+        excel_io = exportar_excel(
+            tablas["tabla1"], tablas["tabla2_ssbb"], tablas["tabla2_ce"],
+            tablas["tabla2_cev"], tablas["tabla2_do"], tablas["tabla3"], seleccionados,
+        )
         # si ya devuelve bytes, esto no rompe
         excel_bytes = excel_io.getvalue() if hasattr(excel_io, "getvalue") else excel_io
+    return GenerateResult(**tablas, excel_bytes=excel_bytes, seleccionados=list(seleccionados))
+
+
+def _buscar(cache, data, seleccionados, build_excel, tablas=None):
+    key = result_cache.make_key(data.dataset_hash, seleccionados, build_excel, tablas)
+    res = cache.get(key)
+    # un resultado con todas las tablas (o con Excel) también sirve para lo que se pide
+    alternativas = []
+    if tablas is not None:
+        alternativas.append(result_cache.make_key(data.dataset_hash, seleccionados, build_excel))
+    if not build_excel:
+        alternativas.append(result_cache.make_key(data.dataset_hash, seleccionados, True))
+    for alt in alternativas:
+        if res is not None:
+            break
+        res = cache.peek(alt)
+    return key, res
+
+
+def peek_result(ruta_excel: str, seleccionados: List[str]) -> Optional[GenerateResult]:
+    """Resultado ya memoizado (con las seis tablas) para la selección, sin calcular ni contar en las estadísticas."""
+    data = cargar_datos(ruta_excel)
+    if not data.dataset_hash:
+        return None
+    cache = result_cache.get_result_cache()
+    seleccionados = _normalizar_seleccion(seleccionados)
+    for build_excel in (False, True):
+        res = cache.peek(result_cache.make_key(data.dataset_hash, seleccionados, build_excel))
+        if res is not None:
+            return res
+    return None
+
+
+def generate_delta(
+    ruta_excel: str,
+    previo: GenerateResult,
+    added: Optional[str] = None,
+    removed: Optional[str] = None,
+    build_excel: bool = False,
+    use_cache: bool = True,
+) -> GenerateResult:
+    """
+    Resultado de la selección de `previo` (con las seis tablas) quitando
+    `removed` y añadiendo `added`.
+
+    Solo se miran las filas que aporta el código que cambia (ver
+    core.engine.incremental): las tablas que no cambian son las de `previo` y
+    las demás se cortan de las filas precalculadas del dataset. El resultado
+    es idéntico al de generate_from_excel sobre la selección nueva.
+    """
+    data = cargar_datos(ruta_excel)
+    added = (_normalizar_seleccion([added] if added else []) or [None])[0]
+    removed = (_normalizar_seleccion([removed] if removed else []) or [None])[0]
+    nueva = [c for c in previo.seleccionados if c != removed]
+    if added and added not in nueva:
+        nueva.append(added)
+
+    cache = result_cache.get_result_cache() if use_cache and data.dataset_hash else None
+    key = None
+    if cache is not None:
+        key, res = _buscar(cache, data, nueva, build_excel)
+        if res is not None:
+            return res
 
-    return GenerateResult(
-        tabla1=tabla1,
-        tabla2_ssbb=tabla2_ssbb,
-        tabla2_ce=tabla2_ce,
-        tabla2_cev=tabla2_cev,
-        tabla2_do=tabla2_do,
-        tabla3=tabla3,
-        excel_bytes=excel_bytes,
-    )
+    estado = previo.estado
+    if estado is None:
+        estado = incremental.build_state(previo.seleccionados, data, previo.tabla1)
+    delta = incremental.apply_delta(estado, data, added, removed) if estado is not None and nueva else None
+    if delta is None:
+        # selección vacía o códigos fuera del dataset: como generate_from_excel
+        res = _resultado(generar_tablas(nueva, data, _indice(data), TABLAS), nueva, build_excel)
+    else:
+        nuevo, cambiadas = delta
+        res = _resultado(incremental.tablas(nuevo, cambiadas, previo.tablas(), data), nuevo.seleccion, build_excel)
+        res.estado = nuevo
+    if cache is not None:
+        cache.set(key, res)
+    return res
@@ -0,0 +1,69 @@
+# core/engine/hierarchy.py
+"""
+Índice jerárquico de códigos con puntos ("1", "1.2", "1.A.3", "GEH.1.C.10").
+
+Guarda los códigos ordenados como strings: todos los descendientes de X
+empiezan por X + "." y, como "/" es el carácter siguiente a ".", quedan en el
+rango [X + ".", X + "/") del array. Cada consulta es una bisección más el
+recorrido de los k resultados: O(log n + k).
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+_SEP = "."
+_SEP_NEXT = chr(ord(_SEP) + 1)
+
+
+class CodeHierarchy:
+    def __init__(self, codes: Iterable[str]):
+        first: dict[str, int] = {}
+        for pos, code in enumerate(codes):
+            first.setdefault(str(code), pos)
+        self._pos = first
+        self._sorted: List[str] = sorted(first)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def __contains__(self, code: object) -> bool:
+        return code in self._pos
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self._sorted, prefix + _SEP)
+        hi = bisect_left(self._sorted, prefix + _SEP_NEXT, lo)
+        return lo, hi
+
+    def descendants_with_pos(self, prefix: str) -> List[Tuple[int, str]]:
+        """[(posición original, código)] de todo lo que cuelga de `prefix`, en el orden original."""
+        lo, hi = self._range(str(prefix))
+        return sorted((self._pos[c], c) for c in self._sorted[lo:hi])
+
+    def descendant_count(self, prefix: str) -> int:
+        """Cuántos códigos cuelgan de `prefix` (sin recorrerlos)."""
+        lo, hi = self._range(str(prefix))
+        return hi - lo
+
+    def descendants(self, prefix: str) -> List[str]:
+        """Todos los códigos que empiezan por `prefix` + "." (hijos, nietos...)."""
+        return [c for _, c in self.descendants_with_pos(prefix)]
+
+    def children(self, prefix: str) -> List[str]:
+        """Solo los hijos directos de `prefix` (un nivel más)."""
+        prefix = str(prefix)
+        depth = prefix.count(_SEP) + 1
+        return [c for c in self.descendants(prefix) if c.count(_SEP) == depth]
+
+    def parent(self, code: str) -> Optional[str]:
+        """El ancestro más cercano de `code` que está en el índice (o None)."""
+        code = str(code)
+        while _SEP in code:
+            code = code.rsplit(_SEP, 1)[0]
+            if code in self._pos:
+                return code
+        return None
+
+    def codes(self) -> List[str]:
+        """Todos los códigos en orden lexicográfico."""
+        return list(self._sorted)
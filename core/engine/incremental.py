@@ -0,0 +1,188 @@
+# core/engine/incremental.py
+"""
+Recalculo incremental de las tablas cuando la selección cambia en un código.
+
+Cada tabla es la unión de lo que aporta cada código seleccionado: filas de las
+tablas 2 (sus posiciones en data.filas_tabla2), elementos de la tabla 3 (la
+fila del código en el cierre, ver core.engine.closure) y, en la tabla 1, la
+fila de su tipo. El estado cuenta cuántos seleccionados aportan cada fila, así
+que añadir o quitar un código solo mira los aportes de ese código. Una tabla
+cambia solo si alguna fila pasa de 0 a 1 aportes o de 1 a 0: las demás se
+reutilizan tal cual del resultado anterior, y las que cambian se cortan de las
+filas precalculadas (data.filas_tabla2 / filas_tabla3) sin construir ninguna.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.engine.pipeline import TABLAS
+from core.engine.types import CurriculumData
+from core.relaciones import (
+    NOMBRES_TIPO,
+    TABLAS2,
+    _cierre,
+    _filas_tabla2,
+    _filas_tabla3,
+    _indice,
+    _orden,
+    clasificar_tipo,
+    df_tabla3,
+    fila_tabla1,
+    seleccion_por_tipo,
+)
+
+_TIPO_DE_NOMBRE = {nombre: tipo for tipo, nombre in NOMBRES_TIPO.items()}
+
+
+@dataclass
+class IncrementalState:
+    seleccion: List[str] = field(default_factory=list)
+    # tabla 2 -> posición de la fila en data.filas_tabla2[tabla].frame -> seleccionados que la aportan
+    refs: Dict[str, Dict[int, int]] = field(default_factory=lambda: {nombre: {} for nombre in TABLAS2})
+    # elemento de la tabla 3 -> seleccionados que lo aportan
+    refs_tabla3: Dict[str, int] = field(default_factory=dict)
+    # tipo -> fila de la tabla 1
+    filas_tabla1: Dict[str, dict] = field(default_factory=dict)
+
+    def copia(self) -> "IncrementalState":
+        # el estado de un resultado en caché no se toca: se copian los contadores (no hay frames)
+        return IncrementalState(
+            list(self.seleccion),
+            {nombre: dict(refs) for nombre, refs in self.refs.items()},
+            dict(self.refs_tabla3),
+            dict(self.filas_tabla1),
+        )
+
+
+def _aportes(code: str, data: CurriculumData, idx) -> Optional[Tuple[Dict[str, Set[int]], Set[str]]]:
+    """(tabla 2 -> posiciones de sus filas, elementos de la tabla 3) de un código; None si alguna fila no está precalculada."""
+    filas = _filas_tabla2(data)
+    posiciones = {}
+    for nombre, (_, primarios, _) in TABLAS2.items():
+        pos = filas[nombre].pos
+        try:
+            posiciones[nombre] = {pos[c] for c in primarios([code], idx)}
+        except KeyError:
+            return None
+    return posiciones, {code, *_cierre(data).row_codes(code)}
+
+
+def _contar(refs: dict, claves: Iterable, paso: int) -> bool:
+    """Suma `paso` (+1 / -1) a cada clave; True si alguna aparece o desaparece."""
+    cambia = False
+    for k in claves:
+        n = refs.get(k, 0) + paso
+        if n:
+            refs[k] = n
+        else:
+            del refs[k]
+        cambia = cambia or n == (1 if paso > 0 else 0)
+    return cambia
+
+
+def _aplicar(state: IncrementalState, aportes, paso: int) -> Set[str]:
+    # tablas cuyo conjunto de filas cambia
+    posiciones, elementos = aportes
+    cambiadas = {nombre for nombre, pos in posiciones.items() if _contar(state.refs[nombre], pos, paso)}
+    if _contar(state.refs_tabla3, elementos, paso):
+        cambiadas.add("tabla3")
+    return cambiadas
+
+
+def build_state(seleccion: List[str], data: CurriculumData, tabla1: Optional[pd.DataFrame] = None) -> Optional[IncrementalState]:
+    """
+    Estado de una selección (normalizada). Con `tabla1` (la del resultado de esa
+    selección) sus filas se reutilizan. None si algún código no se puede llevar
+    de forma incremental.
+    """
+    idx = _indice(data)
+    state = IncrementalState(seleccion=list(seleccion))
+    for code in state.seleccion:
+        aportes = _aportes(code, data, idx)
+        if aportes is None:
+            return None
+        _aplicar(state, aportes, +1)
+
+    if tabla1 is not None:
+        state.filas_tabla1 = {_TIPO_DE_NOMBRE[f["Tipo"]]: f for f in tabla1.to_dict("records")}
+    else:
+        for tipo, codigos in seleccion_por_tipo(state.seleccion, data).items():
+            if codigos:
+                state.filas_tabla1[tipo] = fila_tabla1(tipo, codigos, idx, _orden(data))
+    return state
+
+
+def apply_delta(
+    state: IncrementalState,
+    data: CurriculumData,
+    added: Optional[str] = None,
+    removed: Optional[str] = None,
+) -> Optional[Tuple[IncrementalState, Set[str]]]:
+    """
+    (estado nuevo, tablas que cambian) tras quitar `removed` y añadir `added`.
+    `state` no se modifica. None si el código no se puede llevar de forma incremental.
+    """
+    nuevo = state.copia()
+    cambiadas: Set[str] = set()
+    idx = _indice(data)
+    for code, paso in ((removed, -1), (added, +1)):
+        if not code or (code in nuevo.seleccion) == (paso > 0):
+            continue
+        aportes = _aportes(code, data, idx)
+        if aportes is None:
+            return None
+        if paso > 0:
+            nuevo.seleccion.append(code)
+        else:
+            nuevo.seleccion.remove(code)
+        cambiadas |= _aplicar(nuevo, aportes, paso)
+
+        # tabla 1: solo la fila del tipo del código
+        tipo = clasificar_tipo(code, data)
+        if tipo in NOMBRES_TIPO:
+            codigos = seleccion_por_tipo(nuevo.seleccion, data)[tipo]
+            if codigos:
+                nuevo.filas_tabla1[tipo] = fila_tabla1(tipo, codigos, idx, _orden(data))
+            else:
+                nuevo.filas_tabla1.pop(tipo, None)
+            cambiadas.add("tabla1")
+    return nuevo, cambiadas
+
+
+def _tabla3(state: IncrementalState, data: CurriculumData) -> pd.DataFrame:
+    filas = _filas_tabla3(data)
+    try:
+        posiciones = [filas.pos[e] for e in state.refs_tabla3]
+    except KeyError:
+        # algún seleccionado fuera del dataset: como generar_tabla3
+        return df_tabla3(set(state.refs_tabla3), data)
+    if not posiciones:
+        return df_tabla3(set(), data)
+    df = filas.en_posiciones(posiciones)
+    # mismo índice que df_tabla3 (posición del elemento en orden alfabético)
+    rango = {e: i for i, e in enumerate(sorted(state.refs_tabla3))}
+    df.index = [rango[e] for e in df["Elemento"].tolist()]
+    return df
+
+
+def tablas(
+    state: IncrementalState,
+    cambiadas: Set[str],
+    previas: Dict[str, pd.DataFrame],
+    data: CurriculumData,
+) -> Dict[str, pd.DataFrame]:
+    """Las seis tablas del estado: las de `previas` que no cambian se reutilizan tal cual."""
+    out: Dict[str, pd.DataFrame] = {}
+    for nombre in TABLAS:
+        if nombre not in cambiadas:
+            out[nombre] = previas[nombre]
+        elif nombre == "tabla1":
+            out[nombre] = pd.DataFrame([state.filas_tabla1[t] for t in NOMBRES_TIPO if t in state.filas_tabla1])
+        elif nombre == "tabla3":
+            out[nombre] = _tabla3(state, data)
+        else:
+            out[nombre] = _filas_tabla2(data)[nombre].en_posiciones(state.refs[nombre])
+    return out
@@ -0,0 +1,182 @@
+# core/engine/lookup.py
+"""
+Estructuras para normalizar los códigos que escribe el usuario.
+
+- validos: unión de los cuatro sets (SSBB / CE / CEv / DO), calculada una vez
+- sufijos_ssbb: cada sufijo con frontera "." de un SSBB -> SSBB que acaban así
+  ("A.1" -> ["1.A.1", "2.A.1"], "1.A.1" -> ["GEH.1.A.1"]...), para resolver
+  atajos con un acceso a dict en vez de recorrer el set
+- bloques_ssbb: lo mismo para los bloques intermedios de los SSBB
+  ("1.A" -> ["GEH.1.A"]), para comodines como "1.A.*"
+- familias: códigos del mismo tipo, padre y raíz ("CCL" en "CCL1", "" en
+  "1.3") en orden natural, para rangos como "CE1-CE4" o "CCL1-CCL3"
+- un BK-tree (distancia de edición) sobre los códigos y los atajos de SSBB
+  en mayúsculas para sugerir "¿quisiste decir...?" cuando un código no existe
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.engine.sort import natural_sort_key
+
+# Distancia máxima de las sugerencias (los códigos cortos admiten menos)
+SUGGEST_MAX_DISTANCE = 2
+SUGGEST_SHORT_LEN = 3
+SUGGEST_LIMIT = 3
+
+
+_RAIZ_RE = re.compile(r"^(.*?)(\d+)$")
+
+
+def familia(code: str) -> Tuple[str, str]:
+    """(padre, raíz): "GEH.1.A.3" -> ("GEH.1.A", ""), "CCL3" -> ("", "CCL")."""
+    padre, _, ultimo = str(code).rpartition(".")
+    m = _RAIZ_RE.match(ultimo)
+    return padre, (m.group(1) if m else ultimo)
+
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previa = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        fila = [i]
+        for j, cb in enumerate(b, 1):
+            fila.append(min(previa[j] + 1, fila[j - 1] + 1, previa[j - 1] + (ca != cb)))
+        previa = fila
+    return previa[-1]
+
+
+class BKTree:
+    """Árbol BK: cada hijo cuelga de su distancia al padre."""
+
+    def __init__(self, claves: Iterable[str]):
+        self._raiz: Optional[Tuple[str, Dict[int, tuple]]] = None
+        for clave in claves:
+            self._insertar(clave)
+
+    def _insertar(self, clave: str) -> None:
+        if self._raiz is None:
+            self._raiz = (clave, {})
+            return
+        nodo = self._raiz
+        while True:
+            d = levenshtein(clave, nodo[0])
+            if d == 0:
+                return
+            hijo = nodo[1].get(d)
+            if hijo is None:
+                nodo[1][d] = (clave, {})
+                return
+            nodo = hijo
+
+    def near(self, clave: str, max_dist: int) -> List[Tuple[int, str]]:
+        """[(distancia, clave)] a distancia <= max_dist."""
+        if self._raiz is None:
+            return []
+        out = []
+        pendientes = [self._raiz]
+        while pendientes:
+            actual, hijos = pendientes.pop()
+            d = levenshtein(clave, actual)
+            if d <= max_dist:
+                out.append((d, actual))
+            for dh, hijo in hijos.items():
+                if d - max_dist <= dh <= d + max_dist:
+                    pendientes.append(hijo)
+        return out
+
+
+@dataclass
+class CodeLookup:
+    validos: frozenset
+    sufijos_ssbb: Dict[str, Tuple[str, ...]]
+    arbol: BKTree
+    # clave en mayúsculas -> códigos reales
+    por_clave: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    bloques_ssbb: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    # (tipo, padre, raíz) -> códigos en orden natural; código -> (familia, posición)
+    familias: Dict[Tuple[str, str, str], Tuple[str, ...]] = field(default_factory=dict)
+    pos_familia: Dict[str, Tuple[Tuple[str, str, str], int]] = field(default_factory=dict)
+
+    def suggest(self, code: str, limit: int = SUGGEST_LIMIT) -> List[str]:
+        """Códigos existentes más parecidos a `code` (más cercanos primero)."""
+        clave = str(code).upper()
+        max_dist = 1 if len(clave) <= SUGGEST_SHORT_LEN else SUGGEST_MAX_DISTANCE
+        mejor: Dict[str, int] = {}
+        for d, k in self.arbol.near(clave, max_dist):
+            for c in self.por_clave[k]:
+                if c != code and d < mejor.get(c, max_dist + 1):
+                    mejor[c] = d
+        cercanos = sorted(mejor, key=lambda c: (mejor[c], natural_sort_key(c)))
+        return cercanos[:limit]
+
+    def suggest_many(self, codes: Iterable[str], limit: int = SUGGEST_LIMIT) -> Dict[str, List[str]]:
+        """{código: sugerencias} para cada código distinto (vacío si no hay ninguna)."""
+        return {c: self.suggest(c, limit) for c in dict.fromkeys(codes)}
+
+    def family_range(self, desde: str, hasta: str) -> Optional[List[str]]:
+        """Códigos de la familia de `desde` entre `desde` y `hasta` (orden natural), o None si no comparten familia."""
+        a = self.pos_familia.get(desde)
+        b = self.pos_familia.get(hasta)
+        if a is None or b is None or a[0] != b[0]:
+            return None
+        i, j = sorted((a[1], b[1]))
+        return list(self.familias[a[0]][i:j + 1])
+
+
+def build_code_lookup(ssbb_set: set, ce_set: set, cev_set: set, do_set: set) -> CodeLookup:
+    validos = frozenset(ssbb_set | ce_set | cev_set | do_set)
+
+    sufijos: Dict[str, List[str]] = {}
+    for sb in ssbb_set:
+        sb = str(sb)
+        sufijos.setdefault(sb, []).append(sb)
+        for i, ch in enumerate(sb):
+            if ch == ".":
+                sufijos.setdefault(sb[i + 1:], []).append(sb)
+
+    bloques: Dict[str, set] = {}
+    for sb in ssbb_set:
+        partes = str(sb).split(".")
+        for fin in range(1, len(partes)):
+            bloque = ".".join(partes[:fin])
+            for ini in range(fin):
+                bloques.setdefault(".".join(partes[ini:fin]), set()).add(bloque)
+
+    # SSBB > CE > CEv > DO si un código está en varios sets (como build_tipos)
+    tipo_de: Dict[str, str] = {}
+    for tipo, codigos in (("DO", do_set), ("CEv", cev_set), ("CE", ce_set), ("SSBB", ssbb_set)):
+        for c in codigos:
+            tipo_de[str(c)] = tipo
+    familias: Dict[Tuple[str, str, str], List[str]] = {}
+    for c in sorted(tipo_de, key=natural_sort_key):
+        familias.setdefault((tipo_de[c], *familia(c)), []).append(c)
+
+    # Se sugiere sobre los códigos y sobre los atajos de SSBB no ambiguos
+    # ("1.A.l" -> GEH.1.A.1 vía "1.A.1")
+    por_clave: Dict[str, List[str]] = {}
+    for c in validos:
+        por_clave.setdefault(str(c).upper(), []).append(str(c))
+    for sufijo, sbs in sufijos.items():
+        if len(set(sbs)) == 1 and sufijo:
+            por_clave.setdefault(sufijo.upper(), []).append(sbs[0])
+
+    return CodeLookup(
+        validos=validos,
+        sufijos_ssbb={k: tuple(sorted(set(v))) for k, v in sufijos.items()},
+        arbol=BKTree(sorted(por_clave)),
+        por_clave={k: tuple(sorted(set(v))) for k, v in por_clave.items()},
+        bloques_ssbb={k: tuple(sorted(v)) for k, v in bloques.items()},
+        familias={k: tuple(v) for k, v in familias.items()},
+        pos_familia={c: (k, i) for k, v in familias.items() for i, c in enumerate(v)},
+    )
+
+
+def get_code_lookup(data) -> CodeLookup:
+    """CodeLookup del CurriculumData (el loader lo construye; aquí solo por si falta)."""
+    if data.lookup is None:
+        data.lookup = build_code_lookup(data.ssbb_set, data.ce_set, data.cev_set, data.do_set)
+    return data.lookup
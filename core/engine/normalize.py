@@ -1,15 +1,26 @@
 # core/engine/normalize.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
 
+from core.engine.lookup import familia, get_code_lookup
+from core.engine.sort import natural_sorted
 from core.engine.types import CurriculumData
 
+# Máximo de códigos que pueden salir de los patrones ("1.A.*", "CE1-CE4")
+EXPAND_MAX = 500
+
+# Prefijo de tipo -> tipo (el orden importa: CEV antes que CE)
+_PREFIJOS_TIPO = (("SSBB", "SSBB"), ("CEV", "CEv"), ("CE", "CE"), ("DO", "DO"), ("SB", "SSBB"))
+_PREFIJO_DE = {"SSBB": "SB", "CEv": "CEv", "CE": "CE", "DO": "DO"}
+
 
 @dataclass
 class NormalizationError(Exception):
     message: str
+    # código no encontrado -> códigos parecidos que sí existen
+    suggestions: dict = field(default_factory=dict)
 
     def __str__(self) -> str:
         return self.message
@@ -37,46 +48,159 @@ def _strip_prefix(s: str) -> str:
     return s
 
 
-def _resolve_ssbb_shortcut(code: str, ssbb_set: set[str]) -> str:
-    # Si existe tal cual, OK
-    if code in ssbb_set:
-        return code
-
-    # Resolver por sufijo con frontera "."
+def _resolve_ssbb_shortcut(code: str, sufijos_ssbb: dict[str, tuple[str, ...]]) -> str:
+    # Resolver por sufijo con frontera "." (el propio código es su sufijo)
     # Ej: "A.1" -> "1.A.1" si existe y es único
-    candidates = [c for c in ssbb_set if c == code or c.endswith("." + code)]
+    candidates = sufijos_ssbb.get(code, ())
 
     if len(candidates) == 1:
         return candidates[0]
 
     if len(candidates) > 1:
-        preview = ", ".join(sorted(candidates)[:20])
+        preview = ", ".join(candidates[:20])
         raise NormalizationError(f"SSBB ambiguo '{code}'. Coincidencias: {preview}")
 
     return code
 
 
+def split_code_input(text: str) -> list[str]:
+    """
+    Separa lo escrito en el textarea / --codes por comas, espacios o saltos de
+    línea. Un prefijo suelto se une al siguiente trozo ("CEv 2.*" -> "CEv2.*")
+    y lo mismo un guion suelto ("CE1 - CE4" -> "CE1-CE4").
+    """
+    partes = str(text or "").replace("\n", " ").replace(",", " ").split()
+    tokens: list[str] = []
+    pegar = False
+    for parte in partes:
+        if tokens and (pegar or parte.startswith("-")):
+            tokens[-1] += parte
+        else:
+            tokens.append(parte)
+        # "CE", "CE1-" o "CE1-CE": falta lo que sigue ("CE 1 - CE 3" -> "CE1-CE3")
+        cola = tokens[-1].rpartition("-")[2].upper()
+        pegar = not cola or any(cola == p for p, _ in _PREFIJOS_TIPO)
+    return tokens
+
+
+def _tipo_prefijo(s: str) -> tuple[Optional[str], str]:
+    up = s.upper()
+    for prefijo, tipo in _PREFIJOS_TIPO:
+        if up.startswith(prefijo):
+            return tipo, s[len(prefijo):]
+    return None, s
+
+
+def _resolver_bloque(base: str, data: CurriculumData) -> str:
+    # "1.A" -> "GEH.1.A" si el bloque no existe tal cual y el atajo es único
+    if base in data.jerarquia or data.jerarquia.descendant_count(base):
+        return base
+    candidatos = get_code_lookup(data).bloques_ssbb.get(base, ())
+    if len(candidatos) > 1:
+        raise NormalizationError(f"Bloque ambiguo '{base}'. Coincidencias: {', '.join(candidatos[:20])}")
+    return candidatos[0] if candidatos else base
+
+
+def _expandir_comodin(s: str, data: CurriculumData, max_codes: int) -> list[str]:
+    # "1.A.*", "CEv2.*": todo lo que cuelga del bloque (filtrado por tipo si hay prefijo)
+    tipo, base = _tipo_prefijo(s[:-1])
+    base = _norm_basic(base)
+    if not base or "*" in base:
+        raise NormalizationError(f"Patrón no válido '{s}'. Usa un bloque seguido de .* (ej: 1.A.*)")
+    raiz = _resolver_bloque(base, data)
+
+    total = data.jerarquia.descendant_count(raiz)
+    if total > max_codes:
+        raise NormalizationError(f"El patrón '{s}' abarca {total} códigos (máximo {max_codes}).")
+    codigos = data.jerarquia.descendants(raiz)
+    # "CE2.*" nombra el CE padre: sus descendientes son CEv
+    if tipo is not None and tipo != "CE":
+        codigos = [c for c in codigos if data.tipo_por_codigo.get(c) == tipo]
+    if not codigos:
+        raise NormalizationError(f"El patrón '{s}' no coincide con ningún código.")
+    return natural_sorted(codigos, data.orden_natural)
+
+
+def _expandir_rango(s: str, data: CurriculumData, max_codes: int) -> list[str]:
+    # "CE1-CE4", "CE1-4", "A.1-A.5", "A.1-5", "CCL1-CCL3"
+    raw_desde, _, raw_hasta = s.partition("-")
+    tipo, _ = _tipo_prefijo(raw_desde)
+    tipo_hasta, _ = _tipo_prefijo(raw_hasta)
+    if tipo is not None and tipo_hasta is not None and tipo != tipo_hasta:
+        raise NormalizationError(f"Rango '{s}': los extremos deben ser del mismo tipo y bloque.")
+    desde = normalize_user_code(raw_desde, data)
+    hasta = _norm_basic(raw_hasta)
+    if tipo_hasta is None and hasta.isdigit():
+        # Solo el número final: mismo padre y raíz que el inicio
+        padre, raiz = familia(desde)
+        hasta = f"{padre}.{raiz}{hasta}" if padre else f"{raiz}{hasta}"
+    elif tipo_hasta is None and tipo is not None:
+        hasta = normalize_user_code(_PREFIJO_DE[tipo] + hasta, data)
+    else:
+        hasta = normalize_user_code(raw_hasta, data)
+
+    lookup = get_code_lookup(data)
+    codigos = lookup.family_range(desde, hasta)
+    if codigos is None:
+        no_validos = [c for c in (desde, hasta) if c not in lookup.validos]
+        if no_validos:
+            raise NormalizationError(f"Rango '{s}': códigos no encontrados {no_validos}")
+        raise NormalizationError(f"Rango '{s}': los extremos deben ser del mismo tipo y bloque.")
+    if len(codigos) > max_codes:
+        raise NormalizationError(f"El rango '{s}' abarca {len(codigos)} códigos (máximo {max_codes}).")
+    return codigos
+
+
+def expand_code(raw: str, data: CurriculumData, max_codes: int = EXPAND_MAX) -> Optional[list[str]]:
+    """
+    Expande un patrón a códigos del dataset, o None si `raw` no es un patrón:
+      - comodín "X.*": todo lo que cuelga de X (1.A.*, GEH.1.*, CE2.*, CEv 2.*)
+      - rango "A-B": A, B y lo que hay entre ellos en orden natural, del mismo
+        tipo y bloque (CE1-CE4, CE1-4, 1.1-1.5, A.1-A.5, CCL1-CCL3)
+    Coste proporcional a lo expandido (índice jerárquico / familias
+    precalculadas); más de `max_codes` códigos es un error.
+    """
+    s = _norm_basic(raw)
+    if s.endswith("*"):
+        return _expandir_comodin(s, data, max_codes)
+    if "-" in s.strip("-"):
+        return _expandir_rango(s, data, max_codes)
+    return None
+
+
 def normalize_user_code(raw: str, data: CurriculumData) -> str:
     s = _norm_basic(raw)
     s = _strip_prefix(s)
     s = _norm_basic(s)
 
-    validos = data.ssbb_set | data.ce_set | data.cev_set | data.do_set
-    if s in validos:
+    lookup = get_code_lookup(data)
+    if s in lookup.validos:
         return s
 
     # Intentar resolver atajos de SSBB (A.1 -> 1.A.1)
-    resolved = _resolve_ssbb_shortcut(s, data.ssbb_set)
+    resolved = _resolve_ssbb_shortcut(s, lookup.sufijos_ssbb)
     return resolved
 
 
-def normalize_codes(raw_codes: Iterable[str], data: CurriculumData) -> list[str]:
+def _did_you_mean(suggestions: dict) -> str:
+    partes = [f"{c} → {', '.join(s)}" for c, s in suggestions.items() if s]
+    return f" ¿Quisiste decir: {'; '.join(partes)}?" if partes else ""
+
+
+def normalize_codes(raw_codes: Iterable[str], data: CurriculumData, max_expand: int = EXPAND_MAX) -> list[str]:
+    """Normaliza los códigos del usuario, expandiendo patrones (ver expand_code)."""
     out: list[str] = []
     errors: list[str] = []
+    expandidos = 0
 
     for raw in raw_codes:
         try:
-            out.append(normalize_user_code(raw, data))
+            codigos = expand_code(raw, data, max_expand - expandidos)
+            if codigos is None:
+                out.append(normalize_user_code(raw, data))
+            else:
+                out.extend(codigos)
+                expandidos += len(codigos)
         except NormalizationError as e:
             errors.append(str(e))
 
@@ -84,9 +208,13 @@ def normalize_codes(raw_codes: Iterable[str], data: CurriculumData) -> list[str]
         raise NormalizationError(" | ".join(errors))
 
     # Validación final
-    validos = data.ssbb_set | data.ce_set | data.cev_set | data.do_set
-    invalidos = [c for c in out if c not in validos]
+    lookup = get_code_lookup(data)
+    invalidos = [c for c in out if c not in lookup.validos]
     if invalidos:
-        raise NormalizationError(f"Códigos no encontrados: {invalidos}")
+        suggestions = lookup.suggest_many(invalidos)
+        raise NormalizationError(
+            f"Códigos no encontrados: {invalidos}.{_did_you_mean(suggestions)}",
+            suggestions,
+        )
 
     return out
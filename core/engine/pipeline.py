@@ -0,0 +1,121 @@
+# core/engine/pipeline.py
+"""
+Las seis tablas en una sola pasada.
+
+generar_tabla1, las cuatro generar_tabla2_* y generar_tabla3 hacen por separado
+las mismas consultas al índice (SB de la selección, CE/CEv de esos SB, DO de
+cada CE...). Aquí todas comparten un SharedLookups: cada consulta se resuelve
+una vez por (método, conjunto de claves) y las demás tablas reutilizan el
+resultado. Con `tablas` se calcula solo un subconjunto; las que no se piden
+salen vacías, con sus columnas (COLUMNAS).
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+from core.engine.types import CurriculumData
+from core.relaciones import (
+    TABLAS2,
+    _indice,
+    _orden,
+    fila_tabla1,
+    generar_tabla3,
+    seleccion_por_tipo,
+    tabla2_desde_primarios,
+)
+
+TABLAS = ("tabla1", "tabla2_ssbb", "tabla2_ce", "tabla2_cev", "tabla2_do", "tabla3")
+
+# Columnas de cada tabla, para las que no se piden (los escritores CSV/Parquet
+# necesitan la cabecera aunque no haya filas)
+COLUMNAS = {
+    "tabla1": ["Tipo", "Elementos seleccionados", "SSBB relacionados", "CE relacionados", "CEv relacionados", "DO relacionados"],
+    "tabla2_ssbb": ["SB", "CE", "CEv", "DO"],
+    "tabla2_ce": ["CE", "SSBB", "CEv", "DO"],
+    "tabla2_cev": ["CEv", "SSBB", "CE", "DO"],
+    "tabla2_do": ["DO", "CE", "CEv", "SSBB"],
+    "tabla3": ["Elemento", "Tipo", "Descripción", "Orden"],
+}
+
+# Consultas del índice que dependen solo del conjunto de claves
+_CONSULTAS = frozenset({
+    "ce_for_sb", "cev_for_sb", "code_for_sb",
+    "sb_for_ce", "sb_for_cev", "sb_for_code",
+    "do_for_ce", "ce_for_do", "cev_for_ce",
+})
+
+
+class SharedLookups:
+    """
+    Envuelve un RelationIndex / CompactIndex y memoiza sus consultas.
+
+    Las listas devueltas se comparten entre llamadas: no mutarlas.
+    """
+
+    def __init__(self, idx):
+        self._idx = idx
+        self._memo: Dict[tuple, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._idx, name)
+        if name not in _CONSULTAS:
+            return attr
+
+        def consulta(keys: Iterable[str]) -> list:
+            clave = (name, frozenset(keys))
+            res = self._memo.get(clave)
+            if res is None:
+                self.misses += 1
+                res = self._memo[clave] = attr(clave[1])
+            else:
+                self.hits += 1
+            return res
+
+        # se guarda en la instancia: las siguientes llamadas no pasan por __getattr__
+        setattr(self, name, consulta)
+        return consulta
+
+
+def normalizar_tablas(tablas: Optional[Iterable[str]]) -> tuple:
+    """Subconjunto pedido en el orden de TABLAS (None = todas)."""
+    if tablas is None:
+        return TABLAS
+    pedidas = set(tablas)
+    desconocidas = pedidas.difference(TABLAS)
+    if desconocidas:
+        raise ValueError(f"Tablas desconocidas: {', '.join(sorted(desconocidas))}. Opciones: {', '.join(TABLAS)}")
+    return tuple(t for t in TABLAS if t in pedidas)
+
+
+def generar_tablas(
+    seleccionados,
+    data: CurriculumData,
+    idx=None,
+    tablas: Optional[Iterable[str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Mismas tablas que las funciones generar_* de core.relaciones, compartiendo las consultas."""
+    tablas = normalizar_tablas(tablas)
+    shared = SharedLookups(idx if idx is not None else _indice(data))
+
+    out: Dict[str, pd.DataFrame] = {}
+    if "tabla1" in tablas:
+        orden = _orden(data)
+        resumen = [
+            fila_tabla1(tipo, codigos, shared, orden)
+            for tipo, codigos in seleccion_por_tipo(seleccionados, data).items()
+            if codigos
+        ]
+        out["tabla1"] = pd.DataFrame(resumen)
+
+    for nombre, (_, primarios, _) in TABLAS2.items():
+        if nombre in tablas:
+            out[nombre] = tabla2_desde_primarios(nombre, primarios(seleccionados, shared), data, shared)
+
+    # La tabla 3 ya sale de los bitsets precalculados (ver core.engine.closure)
+    if "tabla3" in tablas:
+        out["tabla3"] = generar_tabla3(seleccionados, data)
+    return {t: out[t] if t in out else pd.DataFrame(columns=COLUMNAS[t]) for t in TABLAS}
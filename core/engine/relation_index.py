@@ -0,0 +1,157 @@
+# core/engine/relation_index.py
+"""
+Índice de relaciones SB/CE/CEv/DO precalculado una vez por dataset.
+
+Las CEv de cada CE salen del índice jerárquico de códigos (ver
+core.engine.hierarchy). Cada adyacencia guarda, por clave, los valores relacionados junto con la
+posición de la fila de origen (en relaciones_long, ce_do_exp o cev_df).
+Así las consultas sobre varias claves devuelven los valores en el mismo orden
+que `df[mask][col].unique()` sobre el DataFrame, y las tablas salen idénticas
+a filtrar el frame completo, pero con coste proporcional a la selección.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.engine.hierarchy import CodeHierarchy
+
+# clave -> [(posición de la fila, valor)], sin valores repetidos y por posición
+Adjacency = Dict[str, List[Tuple[int, str]]]
+
+
+def _add(adj: Dict[str, Dict[str, int]], key: str, pos: int, value: str) -> None:
+    # Solo la primera aparición de (clave, valor) cuenta para el orden
+    adj.setdefault(key, {}).setdefault(value, pos)
+
+
+def _freeze(adj: Dict[str, Dict[str, int]]) -> Adjacency:
+    return {key: [(pos, value) for value, pos in values.items()] for key, values in adj.items()}
+
+
+def _first_order(pairs: Iterable[Tuple[int, str]]) -> List[str]:
+    first: Dict[str, int] = {}
+    for pos, value in pairs:
+        prev = first.get(value)
+        if prev is None or pos < prev:
+            first[value] = pos
+    return sorted(first, key=first.__getitem__)
+
+
+def _gather(adjs: Iterable[Adjacency], keys: Iterable[str]) -> List[str]:
+    """Valores únicos relacionados con `keys`, en orden de primera aparición."""
+    return _first_order(pair for key in set(keys) for adj in adjs for pair in adj.get(key, ()))
+
+
+@dataclass
+class RelationIndex:
+    # relaciones_long (SSBB-CE-CEv)
+    sb_to_ce: Adjacency = field(default_factory=dict)
+    sb_to_cev: Adjacency = field(default_factory=dict)
+    ce_to_sb: Adjacency = field(default_factory=dict)
+    cev_to_sb: Adjacency = field(default_factory=dict)
+    # ce_do_exp (CE-DO)
+    ce_to_do: Adjacency = field(default_factory=dict)
+    do_to_ce: Adjacency = field(default_factory=dict)
+    # cev_df: CEv colgando de cada prefijo con frontera "." (1 -> 1.1, 1.2, ...)
+    cev_tree: Optional[CodeHierarchy] = None
+
+    # valores presentes en cada columna
+    sb_values: Set[str] = field(default_factory=set)
+    code_values: Set[str] = field(default_factory=set)
+    ce_codes: Set[str] = field(default_factory=set)
+    cev_codes: Set[str] = field(default_factory=set)
+    do_values: Set[str] = field(default_factory=set)
+    ce_values: Set[str] = field(default_factory=set)
+    # Tipo ("CE"/"CEV") de la primera fila de relaciones_long con cada Codigo
+    first_tipo: Dict[str, str] = field(default_factory=dict)
+
+    # --- SSBB <-> CE / CEv ---
+    def ce_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        return _gather((self.sb_to_ce,), sbs)
+
+    def cev_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        return _gather((self.sb_to_cev,), sbs)
+
+    def code_for_sb(self, sbs: Iterable[str]) -> List[str]:
+        """CE y CEv relacionados (cualquier Tipo)."""
+        return _gather((self.sb_to_ce, self.sb_to_cev), sbs)
+
+    def sb_for_ce(self, ces: Iterable[str]) -> List[str]:
+        return _gather((self.ce_to_sb,), ces)
+
+    def sb_for_cev(self, cevs: Iterable[str]) -> List[str]:
+        return _gather((self.cev_to_sb,), cevs)
+
+    def sb_for_code(self, codes: Iterable[str]) -> List[str]:
+        """SB cuya columna Codigo (CE o CEv) está en `codes`."""
+        return _gather((self.ce_to_sb, self.cev_to_sb), codes)
+
+    # --- CE <-> DO ---
+    def do_for_ce(self, ces: Iterable[str]) -> List[str]:
+        return _gather((self.ce_to_do,), ces)
+
+    def ce_for_do(self, dos: Iterable[str]) -> List[str]:
+        return _gather((self.do_to_ce,), dos)
+
+    # --- CE -> CEv (por prefijo) ---
+    def cev_for_ce(self, ces: Iterable[str]) -> List[str]:
+        if self.cev_tree is None:
+            return []
+        return _first_order(pair for ce in set(ces) for pair in self.cev_tree.descendants_with_pos(ce))
+
+
+def build_relation_index(
+    relaciones_long: pd.DataFrame,
+    ce_do_exp: pd.DataFrame,
+    cev_df: pd.DataFrame,
+    ce_df: pd.DataFrame,
+) -> RelationIndex:
+    idx = RelationIndex()
+    sb_to_ce: Dict[str, Dict[str, int]] = {}
+    sb_to_cev: Dict[str, Dict[str, int]] = {}
+    ce_to_sb: Dict[str, Dict[str, int]] = {}
+    cev_to_sb: Dict[str, Dict[str, int]] = {}
+    ce_to_do: Dict[str, Dict[str, int]] = {}
+    do_to_ce: Dict[str, Dict[str, int]] = {}
+
+    # SSBB-CE-CEv
+    # El loader ya deja los frames normalizados (códigos limpios, Tipo en mayúsculas)
+    sbs = relaciones_long["SB"].tolist()
+    tipos = relaciones_long["Tipo"].tolist()
+    codigos = relaciones_long["Codigo"].tolist()
+    for pos, (sb, tipo, codigo) in enumerate(zip(sbs, tipos, codigos)):
+        idx.sb_values.add(sb)
+        idx.code_values.add(codigo)
+        idx.first_tipo.setdefault(codigo, tipo)
+        if tipo == "CE":
+            idx.ce_codes.add(codigo)
+            _add(sb_to_ce, sb, pos, codigo)
+            _add(ce_to_sb, codigo, pos, sb)
+        elif tipo == "CEV":
+            idx.cev_codes.add(codigo)
+            _add(sb_to_cev, sb, pos, codigo)
+            _add(cev_to_sb, codigo, pos, sb)
+
+    # CE-DO
+    ces = ce_do_exp["CE"].tolist()
+    dos = ce_do_exp["DOs asociados"].tolist()
+    for pos, (ce, do) in enumerate(zip(ces, dos)):
+        idx.do_values.add(do)
+        _add(ce_to_do, ce, pos, do)
+        _add(do_to_ce, do, pos, ce)
+
+    # CEv por prefijo: "1.2.3" cuelga de "1" y de "1.2" (equivale a startswith(prefijo + "."))
+    idx.cev_tree = CodeHierarchy(cev_df["Número"].tolist())
+
+    idx.ce_values = set(ce_df["CE"].values)
+
+    idx.sb_to_ce = _freeze(sb_to_ce)
+    idx.sb_to_cev = _freeze(sb_to_cev)
+    idx.ce_to_sb = _freeze(ce_to_sb)
+    idx.cev_to_sb = _freeze(cev_to_sb)
+    idx.ce_to_do = _freeze(ce_to_do)
+    idx.do_to_ce = _freeze(do_to_ce)
+    return idx
@@ -0,0 +1,141 @@
+# core/engine/result_cache.py
+"""
+Memoización de generate_from_excel.
+
+La clave es (hash del contenido del dataset, conjunto de códigos normalizados,
+build_excel). El almacenamiento es enchufable: por defecto un LRU en memoria
+con TTL (LocalResultCache); desde Django se puede usar cualquier backend de
+`django.core.cache` (ver django_apps.generator.result_cache).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Protocol
+
+KEY_VERSION = 1
+
+RESULT_CACHE_SIZE = int(os.environ.get("SABERES_RESULT_CACHE_SIZE", "128"))
+RESULT_CACHE_TTL = float(os.environ.get("SABERES_RESULT_CACHE_TTL", "900"))
+
+
+class ResultCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[Any]: ...
+    def set(self, key: str, value: Any) -> None: ...
+    def clear(self) -> None: ...
+
+
+class LocalResultCache:
+    """LRU en memoria con caducidad por entrada (ttl en segundos; None = sin caducidad)."""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, ttl: Optional[float] = RESULT_CACHE_TTL):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass(frozen=True)
+class ResultCacheInfo:
+    hits: int
+    misses: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResultCache:
+    """Envuelve un backend y cuenta aciertos/fallos."""
+
+    def __init__(self, backend: ResultCacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Como get, pero sin contar en las estadísticas."""
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> ResultCacheInfo:
+        with self._lock:
+            return ResultCacheInfo(hits=self.hits, misses=self.misses)
+
+
+def make_key(dataset_hash: str, codigos: Iterable[str], build_excel: bool, tablas: Optional[Iterable[str]] = None) -> str:
+    """`tablas`: subconjunto de tablas calculado (None = todas)."""
+    seleccion = "\n".join(sorted(set(codigos)))
+    digest = hashlib.sha1(seleccion.encode("utf-8")).hexdigest()
+    key = f"saberes:gen:{KEY_VERSION}:{dataset_hash}:{digest}:{int(bool(build_excel))}"
+    return key if tablas is None else f"{key}:{','.join(tablas)}"
+
+
+_cache = ResultCache(LocalResultCache())
+
+
+def get_result_cache() -> ResultCache:
+    return _cache
+
+
+def configure_result_cache(backend: Optional[ResultCacheBackend] = None) -> ResultCache:
+    """Sustituye el backend (None = LocalResultCache con los valores por defecto)."""
+    global _cache
+    _cache = ResultCache(backend if backend is not None else LocalResultCache())
+    return _cache
+
+
+def result_cache_info() -> ResultCacheInfo:
+    return _cache.info()
@@ -0,0 +1,128 @@
+# core/engine/rows.py
+"""
+Filas de las tablas 2 precalculadas con groupby.
+
+Cada fila de una tabla 2 depende solo de su código principal (SB, CE, CEv o
+DO), no de la selección. Así que se calculan todas de una vez al cargar el
+dataset: se cruzan las aristas de relaciones_long / ce_do_exp / prefijos de CEv
+con merges, se agrupa por el código principal y se une cada grupo en orden
+natural. Cada tabla queda ordenada de forma natural por su código principal, y
+generar una tabla 2 es tomar las filas de los códigos principales que salen de
+la selección (coste proporcional a la salida).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from core.engine.sort import NaturalOrder, natural_sort_frame, natural_sorted
+
+
+@dataclass
+class Tabla2Rows:
+    columna: str
+    # filas ordenadas de forma natural por `columna`
+    frame: pd.DataFrame
+    # código principal -> posición en `frame`
+    pos: Dict[str, int] = field(default_factory=dict)
+
+    def take(self, codigos: Iterable[str]) -> Optional[pd.DataFrame]:
+        """Filas de `codigos` en orden natural, o None si alguno no está precalculado."""
+        try:
+            posiciones = {self.pos[c] for c in codigos}
+        except KeyError:
+            return None
+        return self.en_posiciones(posiciones)
+
+    def en_posiciones(self, posiciones: Iterable[int]) -> pd.DataFrame:
+        """Filas de esas posiciones de `frame` (sin repetidas), en orden natural."""
+        posiciones = sorted(posiciones)
+        if not posiciones:
+            return pd.DataFrame()
+        return self.frame.iloc[posiciones].reset_index(drop=True)
+
+
+def _unir_grupos(aristas: pd.DataFrame, clave: str, valor: str, orden: Optional[NaturalOrder]) -> pd.Series:
+    """clave -> "v1, v2, ..." (valores únicos en orden natural)."""
+    if aristas.empty:
+        return pd.Series(dtype=object)
+    return aristas.groupby(clave, sort=False)[valor].agg(
+        lambda vals: ", ".join(natural_sorted(set(vals), orden))
+    )
+
+
+def _columna(codigos: pd.Series, aristas: pd.DataFrame, clave: str, valor: str, orden: Optional[NaturalOrder]) -> pd.Series:
+    return codigos.map(_unir_grupos(aristas, clave, valor, orden)).fillna("")
+
+
+def _tabla(columna: str, codigos: Iterable[str], columnas: Dict[str, pd.Series], orden: Optional[NaturalOrder]) -> Tabla2Rows:
+    frame = pd.DataFrame({columna: list(codigos), **{k: v.tolist() for k, v in columnas.items()}})
+    if frame.empty:
+        return Tabla2Rows(columna, frame, {})
+    frame = natural_sort_frame(frame, columna, orden).reset_index(drop=True)
+    return Tabla2Rows(columna, frame, {c: i for i, c in enumerate(frame[columna].tolist())})
+
+
+def _prefijos_cev(cevs: List[str]) -> pd.DataFrame:
+    # (prefijo, cev) por cada prefijo con frontera "." : "1.2.3" -> ("1", ...), ("1.2", ...)
+    pares = [
+        (cev[:i], cev)
+        for cev in dict.fromkeys(cevs)
+        for i, ch in enumerate(cev)
+        if ch == "."
+    ]
+    return pd.DataFrame(pares, columns=["CE", "CEv"])
+
+
+def build_tabla2_rows(
+    relaciones_long: pd.DataFrame,
+    ce_do_exp: pd.DataFrame,
+    cev_df: pd.DataFrame,
+    ce_df: pd.DataFrame,
+    orden: Optional[NaturalOrder] = None,
+) -> Dict[str, Tabla2Rows]:
+    rl = relaciones_long[["SB", "Tipo", "Codigo"]].astype({"Tipo": str})
+    sb_ce = rl[rl["Tipo"] == "CE"][["SB", "Codigo"]].rename(columns={"Codigo": "CE"}).drop_duplicates()
+    sb_cev = rl[rl["Tipo"] == "CEV"][["SB", "Codigo"]].rename(columns={"Codigo": "CEv"}).drop_duplicates()
+    sb_code = rl[["SB", "Codigo"]].drop_duplicates()
+    ce_do = ce_do_exp[["CE", "DOs asociados"]].rename(columns={"DOs asociados": "DO"}).drop_duplicates()
+    ce_cev = _prefijos_cev(cev_df["Número"].tolist())
+    ce_values = set(ce_df["CE"].tolist())
+
+    # --- SSBB: CE y CEv directos, DO de esos CE ---
+    sbs = pd.Series(pd.unique(rl["SB"]), dtype=object)
+    sb_do = sb_ce.merge(ce_do, on="CE")[["SB", "DO"]]
+    ssbb = _tabla("SB", sbs, {
+        "CE": _columna(sbs, sb_ce, "SB", "CE", orden),
+        "CEv": _columna(sbs, sb_cev, "SB", "CEv", orden),
+        "DO": _columna(sbs, sb_do, "SB", "DO", orden),
+    }, orden)
+
+    # --- CE: SSBB de la columna Codigo, CEv por prefijo, DO directos ---
+    ces = pd.Series(pd.unique(sb_ce["CE"]), dtype=object)
+    ce = _tabla("CE", ces, {
+        "SSBB": _columna(ces, sb_code, "Codigo", "SB", orden),
+        "CEv": _columna(ces, ce_cev, "CE", "CEv", orden),
+        "DO": _columna(ces, ce_do, "CE", "DO", orden),
+    }, orden)
+
+    # --- CEv: SSBB de la columna Codigo, CE padre (primer segmento), DO del padre ---
+    cevs = pd.Series(pd.unique(sb_cev["CEv"]), dtype=object)
+    padres = cevs.map(lambda c: c.split(".")[0] if "." in c else "")
+    cev = _tabla("CEv", cevs, {
+        "SSBB": _columna(cevs, sb_code, "Codigo", "SB", orden),
+        "CE": padres.where(padres.isin(ce_values), ""),
+        "DO": _columna(padres, ce_do, "CE", "DO", orden),
+    }, orden)
+
+    # --- DO: CE directos, CEv y SSBB de esos CE ---
+    dos = pd.Series(pd.unique(ce_do["DO"]), dtype=object)
+    do = _tabla("DO", dos, {
+        "CE": _columna(dos, ce_do, "DO", "CE", orden),
+        "CEv": _columna(dos, ce_do.merge(ce_cev, on="CE"), "DO", "CEv", orden),
+        "SSBB": _columna(dos, ce_do.merge(sb_ce, on="CE"), "DO", "SB", orden),
+    }, orden)
+
+    return {"tabla2_ssbb": ssbb, "tabla2_ce": ce, "tabla2_cev": cev, "tabla2_do": do}
@@ -0,0 +1,122 @@
+# core/engine/search.py
+"""
+Índice de búsqueda de códigos para tables_search.
+
+Da el mismo ranking en tres niveles que el filtrado con str.contains sobre el
+frame de códigos:
+  1. códigos que empiezan por la consulta
+  2. códigos que la contienen (sin empezar por ella)
+  3. etiquetas que la contienen (si el código no la contiene)
+cada nivel en orden natural de código, pero sin recorrer todo el catálogo:
+
+- nivel 1: bisección sobre los códigos en minúsculas ordenados
+- niveles 2 y 3: índice invertido de n-gramas (n = 1..3) sobre códigos y
+  etiquetas en minúsculas; para consultas de más de 3 caracteres se cruzan
+  las listas de sus trigramas y se verifica cada candidato
+
+Los resultados salen ya agrupados por tipo y con tope.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+from core.engine.codes import TIPOS
+
+NGRAM_MAX = 3
+_MAX_CHAR = "\U0010ffff"
+
+
+def _ngramas(texto: str, n: int) -> Set[str]:
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+class _NgramIndex:
+    """n-grama -> posiciones (ordenadas) de los textos que lo contienen."""
+
+    def __init__(self, textos: List[str]):
+        self.textos = textos
+        postings: Dict[str, List[int]] = {}
+        for pos, texto in enumerate(textos):
+            for n in range(1, NGRAM_MAX + 1):
+                for gram in _ngramas(texto, n):
+                    postings.setdefault(gram, []).append(pos)
+        self.postings = postings
+
+    def containing(self, q: str) -> List[int]:
+        """Posiciones (orden ascendente) de los textos que contienen `q`."""
+        if len(q) <= NGRAM_MAX:
+            return self.postings.get(q, [])
+        listas = sorted((self.postings.get(g, []) for g in _ngramas(q, NGRAM_MAX)), key=len)
+        if not listas[0]:
+            return []
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                return []
+        textos = self.textos
+        return sorted(p for p in candidatos if q in textos[p])
+
+
+class CodeSearchIndex:
+    def __init__(self, items: Iterable[dict]):
+        # items en orden natural de código: la posición es el rango
+        self.items: List[dict] = list(items)
+        codigos = [str(i["code"]).lower() for i in self.items]
+        etiquetas = [str(i["label"]).lower() for i in self.items]
+        self._por_prefijo = sorted((c, pos) for pos, c in enumerate(codigos))
+        self._claves = [c for c, _ in self._por_prefijo]
+        self._codigos = _NgramIndex(codigos)
+        self._etiquetas = _NgramIndex(etiquetas)
+        self._pos: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _prefijo(self, q: str) -> List[int]:
+        lo = bisect_left(self._claves, q)
+        hi = bisect_left(self._claves, q + _MAX_CHAR, lo)
+        return sorted(pos for _, pos in self._por_prefijo[lo:hi])
+
+    def positions(self, q: str, limit: Optional[int] = None) -> List[int]:
+        """Posiciones de los resultados en orden de ranking (tope `limit`)."""
+        q = (q or "").strip().lower()
+        if not q:
+            return list(range(len(self.items)))[:limit]
+
+        empiezan = self._prefijo(q)
+        out = list(empiezan)
+        if limit is not None and len(out) >= limit:
+            return out[:limit]
+
+        contienen = self._codigos.containing(q)
+        vistos = set(empiezan)
+        out.extend(p for p in contienen if p not in vistos)
+        if limit is not None and len(out) >= limit:
+            return out[:limit]
+
+        en_codigo = set(contienen)
+        out.extend(p for p in self._etiquetas.containing(q) if p not in en_codigo)
+        return out[:limit]
+
+    def search(self, q: str, limit: Optional[int] = None) -> Dict[str, List[dict]]:
+        """
+        {tipo: [item, ...]} con los `limit` primeros resultados en orden de
+        ranking. Los items son copias (se pueden anotar).
+        """
+        return self.group(self.positions(q, limit))
+
+    def position(self, code: str) -> Optional[int]:
+        if self._pos is None:
+            self._pos = {str(i["code"]): pos for pos, i in enumerate(self.items)}
+        return self._pos.get(str(code))
+
+    def group(self, positions: Iterable[int]) -> Dict[str, List[dict]]:
+        """{tipo: [copia del item, ...]} respetando el orden de `positions`."""
+        grupos: Dict[str, List[dict]] = {t: [] for t in TIPOS}
+        for pos in positions:
+            item = self.items[pos]
+            if item["tipo"] in grupos:
+                grupos[item["tipo"]].append(dict(item))
+        return grupos
@@ -1,11 +1,19 @@
 # core/engine/sort.py
 import re
-from typing import Any, Tuple, Union
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
 
 _SPLIT_RE = re.compile(r"(\d+)")
 
-def natural_sort_key(value: Any) -> Tuple[Union[int, str], ...]:
-    s = "" if value is None else str(value)
+# Memo de claves para códigos que no están en ningún NaturalOrder (o para
+# ordenar sin dataset a mano)
+NATURAL_KEY_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=NATURAL_KEY_CACHE_SIZE)
+def _natural_sort_key(s: str) -> Tuple[Union[int, str], ...]:
     parts = _SPLIT_RE.split(s)
     key = []
     for p in parts:
@@ -14,3 +22,65 @@ def natural_sort_key(value: Any) -> Tuple[Union[int, str], ...]:
         else:
             key.append(p.lower())
     return tuple(key)   # ✅ IMPORTANTE: tuple, no list
+
+
+def natural_sort_key(value: Any) -> Tuple[Union[int, str], ...]:
+    return _natural_sort_key("" if value is None else str(value))
+
+
+class NaturalOrder:
+    """
+    Rango entero de cada código del dataset en orden natural.
+
+    Rango denso: códigos con la misma clave natural ("1.a" y "1.A") comparten
+    rango, así que ordenar por rango da lo mismo que ordenar por
+    natural_sort_key. Los códigos que no están en el dataset se ordenan con
+    natural_sort_key (memoizada).
+    """
+
+    def __init__(self, codes: Iterable[Any]):
+        ranks: Dict[str, int] = {}
+        prev = None
+        rank = -1
+        for code in sorted({str(c) for c in codes}, key=natural_sort_key):
+            key = natural_sort_key(code)
+            if key != prev:
+                rank += 1
+                prev = key
+            ranks[code] = rank
+        self.ranks = ranks
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def sorted(self, codes: Iterable[Any]) -> List[Any]:
+        codes = list(codes)
+        ranks = self.ranks
+        try:
+            return sorted(codes, key=ranks.__getitem__)
+        except (KeyError, TypeError):
+            return sorted(codes, key=natural_sort_key)
+
+    def sort_key(self, serie: pd.Series) -> pd.Series:
+        """Clave para DataFrame.sort_values(key=...): rangos, o claves naturales si falta alguno."""
+        rangos = serie.map(self.ranks)
+        if rangos.isna().any():
+            return serie.map(natural_sort_key)
+        return rangos
+
+    def sort_frame(self, df: pd.DataFrame, columna: str) -> pd.DataFrame:
+        return df.sort_values(columna, key=self.sort_key)
+
+
+def natural_sorted(codes: Iterable[Any], orden: Optional[NaturalOrder] = None) -> List[Any]:
+    """sorted(codes, key=natural_sort_key), por rangos si se pasa el NaturalOrder del dataset."""
+    if orden is not None:
+        return orden.sorted(codes)
+    return sorted(codes, key=natural_sort_key)
+
+
+def natural_sort_frame(df: pd.DataFrame, columna: str, orden: Optional[NaturalOrder] = None) -> pd.DataFrame:
+    """df ordenado de forma natural por `columna` (por rangos si se pasa el NaturalOrder)."""
+    if orden is not None:
+        return orden.sort_frame(df, columna)
+    return df.sort_values(columna, key=lambda s: s.map(natural_sort_key))
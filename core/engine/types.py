@@ -1,7 +1,18 @@
 # core/engine/types.py
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 import pandas as pd
 
+from core.engine.catalog import CodeCatalog
+from core.engine.closure import ClosureBitsets
+from core.engine.compact import CompactIndex
+from core.engine.fulltext import FullTextIndex
+from core.engine.hierarchy import CodeHierarchy
+from core.engine.lookup import CodeLookup
+from core.engine.relation_index import RelationIndex
+from core.engine.rows import Tabla2Rows
+from core.engine.sort import NaturalOrder
+
 @dataclass
 class CurriculumData:
     ssbb_df: pd.DataFrame
@@ -17,3 +28,42 @@ class CurriculumData:
     ce_set: set
     cev_set: set
     do_set: set
+
+    # adyacencias SB/CE/CEv/DO (ver core.engine.relation_index)
+    relation_index: Optional[RelationIndex] = None
+
+    # clasificación precalculada sobre códigos normalizados (strip + rstrip(".")):
+    # código -> "SSBB" / "CE" / "CEv" / "DO" y tipo -> set de códigos
+    tipo_por_codigo: dict = field(default_factory=dict)
+    codigos_por_tipo: dict = field(default_factory=dict)
+
+    # sha256 del Excel de origen (identifica la versión del dataset)
+    dataset_hash: str = ""
+
+    # índice jerárquico de todos los códigos (hijos de "1.A", padre de "1.2"...)
+    jerarquia: Optional[CodeHierarchy] = None
+
+    # motor "csr": IDs int32 + adyacencias CSR (ver core.engine.compact)
+    compact_index: Optional[CompactIndex] = None
+
+    # relacionados de la tabla 3 por código como bitsets (ver core.engine.closure)
+    cierre_tabla3: Optional[ClosureBitsets] = None
+
+    # filas de las tablas 2 por código principal (ver core.engine.rows)
+    filas_tabla2: dict = field(default_factory=dict)
+
+    # filas de la tabla 3 de todos los códigos (cierre y dataset), ya ordenadas; se
+    # construye la primera vez que se pide (ver core.engine.incremental)
+    filas_tabla3: Optional[Tabla2Rows] = None
+
+    # rango en orden natural de cada código (ver core.engine.sort.NaturalOrder)
+    orden_natural: Optional[NaturalOrder] = None
+
+    # códigos / tipos / etiquetas ya ordenados para las vistas (ver core.engine.catalog)
+    catalogo: Optional[CodeCatalog] = None
+
+    # índice BM25 sobre las descripciones sin tildes (ver core.engine.fulltext)
+    indice_texto: Optional[FullTextIndex] = None
+
+    # unión de códigos válidos, atajos de SSBB y sugerencias (ver core.engine.lookup)
+    lookup: Optional[CodeLookup] = None
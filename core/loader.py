@@ -1,22 +1,258 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
 import pandas as pd
 from core.engine.types import CurriculumData
+from core.engine.relation_index import build_relation_index
+from core.engine.compact import build_compact_index
+from core.engine.closure import build_closure
+from core.engine.rows import build_tabla2_rows
+from core.engine.catalog import build_catalog
+from core.engine.fulltext import build_fulltext_index
+from core.engine.sort import NaturalOrder
+from core.engine.codes import build_tipos
+from core.engine.hierarchy import CodeHierarchy
+from core.engine.lookup import build_code_lookup
+from core import snapshot
+from core.relaciones import relacionados_tabla3
+
+# Motor de lectura del Excel: "auto" (calamine si está instalado, si no openpyxl),
+# "openpyxl", "calamine" o "pandas" (una lectura por hoja, el comportamiento original)
+LOADER_ENGINE = os.environ.get("SABERES_LOADER_ENGINE", "auto")
+ENGINES = ("auto", "openpyxl", "calamine", "pandas")
+
+# Hojas que usa el loader y columnas que se leen de cada una
+HOJAS = {
+    "SSBB": ["Saber Básico", "Descripción Completa"],
+    "SSBB-CE-CEv": ["SB", "CE", "CEv"],
+    "CEv": ["Número", "Descripción"],
+    "CE": ["CE", "Descripción del CE"],
+    "DO": ["Descriptor", "Descripción"],
+    "CE-DO": ["CE", "DOs asociados"],
+}
+
+# Niveles fijos de relaciones_long["Tipo"] (ya en mayúsculas)
+TIPO_RELACION = pd.CategoricalDtype(["CE", "CEV"])
+
+# Nº máximo de asignaturas (ficheros) que se mantienen parseadas en memoria por proceso
+CACHE_MAX_SUBJECTS = int(os.environ.get("SABERES_CACHE_MAX_SUBJECTS", "8"))
+
+
+@dataclass(frozen=True)
+class CacheInfo:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+
+class _CurriculumCache:
+    """
+    Caché LRU de CurriculumData por proceso.
+
+    La clave es la ruta resuelta; cada entrada guarda además (mtime_ns, size)
+    del fichero, de modo que si el Excel cambia en disco se vuelve a parsear.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, int(max_size))
+        self._entries: "OrderedDict[str, tuple[tuple[int, int], CurriculumData]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str, stamp: tuple[int, int]) -> CurriculumData | None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, path: str, stamp: tuple[int, int], data: CurriculumData) -> None:
+        with self._lock:
+            self._entries[path] = (stamp, data)
+            self._entries.move_to_end(path)
+            self._evict()
+
+    def invalidate(self, path: str | None = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def resize(self, max_size: int) -> None:
+        with self._lock:
+            self.max_size = max(1, int(max_size))
+            self._evict()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._entries),
+                max_size=self.max_size,
+            )
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+_cache = _CurriculumCache(CACHE_MAX_SUBJECTS)
+
+
+def _resolver_ruta(ruta: str) -> str:
+    return str(Path(ruta).resolve())
+
+
+def _sello_fichero(ruta_resuelta: str) -> tuple[int, int]:
+    st = os.stat(ruta_resuelta)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def cargar_datos(
+    ruta: str,
+    use_cache: bool = True,
+    use_snapshot: bool = True,
+    engine: str | None = None,
+) -> CurriculumData:
+    """
+    Devuelve el CurriculumData del Excel indicado.
+
+    Con use_cache=True (por defecto) el resultado se comparte entre llamadas del
+    mismo proceso mientras el fichero no cambie (mtime/tamaño). El objeto
+    devuelto es compartido: no mutar sus DataFrames.
+
+    Con use_snapshot=True se lee el snapshot compilado si está al día y, si no,
+    se parsea el Excel y se recompila (ver core.snapshot).
+
+    engine elige el lector del Excel (ver ENGINES); por defecto LOADER_ENGINE.
+    """
+    if not use_cache:
+        return _cargar_origen(ruta, use_snapshot, engine)
+
+    ruta_resuelta = _resolver_ruta(ruta)
+    sello = _sello_fichero(ruta_resuelta)
 
-def cargar_datos(ruta: str) -> CurriculumData:
-    ssbb_df = pd.read_excel(ruta, sheet_name="SSBB")
-    relaciones_df = pd.read_excel(ruta, sheet_name="SSBB-CE-CEv")
-    cev_df = pd.read_excel(ruta, sheet_name="CEv")
-    ce_df = pd.read_excel(ruta, sheet_name="CE")
-    do_df = pd.read_excel(ruta, sheet_name="DO")
-    ce_do_df = pd.read_excel(ruta, sheet_name="CE-DO")
+    data = _cache.get(ruta_resuelta, sello)
+    if data is not None:
+        return data
 
-    # Normalización general
+    # Parseo fuera del lock: dos peticiones simultáneas pueden parsear a la vez,
+    # pero ninguna bloquea al resto de asignaturas.
+    data = _cargar_origen(ruta_resuelta, use_snapshot, engine)
+    _cache.put(ruta_resuelta, sello, data)
+    return data
+
+
+def invalidar_cache(ruta: str | None = None) -> None:
+    """Descarta la entrada de `ruta` (o toda la caché si ruta es None)."""
+    _cache.invalidate(_resolver_ruta(ruta) if ruta is not None else None)
+
+
+def configurar_cache(max_subjects: int) -> None:
+    """Cambia el nº máximo de asignaturas en caché (expulsa las menos usadas si sobra)."""
+    _cache.resize(max_subjects)
+
+
+def info_cache() -> CacheInfo:
+    return _cache.info()
+
+
+def compilar_dataset(ruta: str, force: bool = False, engine: str | None = None):
+    """
+    Compila el Excel a snapshot. Sin force, no hace nada si el snapshot ya está al día.
+    Devuelve la ruta del snapshot o None si no se pudo escribir.
+    """
+    if not force and snapshot.leer_snapshot(ruta) is not None:
+        return snapshot.ruta_snapshot(ruta)
+    data = _leer_excel(ruta, engine)
+    invalidar_cache(ruta)
+    return snapshot.escribir_snapshot(ruta, data)
+
+
+def _cargar_origen(ruta: str, use_snapshot: bool, engine: str | None) -> CurriculumData:
+    if not (use_snapshot and snapshot.snapshots_activos()):
+        return _leer_excel(ruta, engine)
+
+    data = snapshot.leer_snapshot(ruta)
+    if data is None:
+        data = _leer_excel(ruta, engine)
+        snapshot.escribir_snapshot(ruta, data)
+    return data
+
+
+def _calamine_disponible() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _resolver_engine(engine: str | None) -> str:
+    engine = (engine or LOADER_ENGINE or "auto").strip().lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de lectura desconocido: {engine!r}. Opciones: {', '.join(ENGINES)}")
+    if engine == "auto":
+        return "calamine" if _calamine_disponible() else "openpyxl"
+    if engine == "calamine" and not _calamine_disponible():
+        raise ImportError("El motor 'calamine' requiere el paquete python-calamine.")
+    return engine
+
+
+def _leer_hojas(ruta: str, engine: str | None = None) -> dict[str, pd.DataFrame]:
+    engine = _resolver_engine(engine)
+
+    if engine == "pandas":
+        return {hoja: pd.read_excel(ruta, sheet_name=hoja) for hoja in HOJAS}
+
+    # Un único open del libro (openpyxl en modo read_only / calamine) y solo las columnas usadas
+    with pd.ExcelFile(ruta, engine=engine) as libro:
+        return {hoja: libro.parse(hoja, usecols=cols) for hoja, cols in HOJAS.items()}
+
+
+def _hash_fichero(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as fh:
+        for bloque in iter(lambda: fh.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _leer_excel(ruta: str, engine: str | None = None) -> CurriculumData:
+    hojas = _leer_hojas(ruta, engine)
+    ssbb_df = hojas["SSBB"]
+    relaciones_df = hojas["SSBB-CE-CEv"]
+    cev_df = hojas["CEv"]
+    ce_df = hojas["CE"]
+    do_df = hojas["DO"]
+    ce_do_df = hojas["CE-DO"]
+
+    # Normalización general (una sola vez: el motor ya no vuelve a convertir).
+    # Los códigos se internan: cada código aparece una vez en memoria aunque se
+    # repita en muchas filas, y las comparaciones entre ellos son por identidad.
     def limpiar_codigos(col: pd.Series) -> pd.Series:
-        return col.astype(str).str.strip().str.rstrip(".")
+        return col.astype(str).str.strip().str.rstrip(".").map(sys.intern)
 
     ssbb_df["Saber Básico"] = limpiar_codigos(ssbb_df["Saber Básico"])
     ce_df["CE"] = limpiar_codigos(ce_df["CE"])
     cev_df["Número"] = limpiar_codigos(cev_df["Número"])
-    do_df["Descriptor"] = do_df["Descriptor"].astype(str).str.strip().str.rstrip(".")
+    do_df["Descriptor"] = limpiar_codigos(do_df["Descriptor"])
 
     relaciones_df["CE"] = relaciones_df["CE"].astype(str).str.strip()
     relaciones_df["CEv"] = relaciones_df["CEv"].astype(str).str.strip()
@@ -28,8 +264,9 @@ def cargar_datos(ruta: str) -> CurriculumData:
     )
     relaciones_long["Codigo"] = relaciones_long["Codigo"].astype(str).str.split(",")
     relaciones_long = relaciones_long.explode("Codigo")
-    relaciones_long["Codigo"] = relaciones_long["Codigo"].astype(str).str.strip().str.rstrip(".")
+    relaciones_long["Codigo"] = limpiar_codigos(relaciones_long["Codigo"])
     relaciones_long.dropna(subset=["Codigo"], inplace=True)
+    relaciones_long["Tipo"] = relaciones_long["Tipo"].str.upper().astype(TIPO_RELACION)
 
     # Expandir CE-DO
     ce_do_df["DOs asociados"] = ce_do_df["DOs asociados"].astype(str).str.split(",")
@@ -45,10 +282,25 @@ def cargar_datos(ruta: str) -> CurriculumData:
     descripciones.update(do_df.set_index("Descriptor")["Descripción"].to_dict())
 
     # Sets para clasificar rápido
-    ssbb_set = set(ssbb_df["Saber Básico"].astype(str).values)
-    ce_set = set(ce_df["CE"].astype(str).values)
-    cev_set = set(cev_df["Número"].astype(str).values)
-    do_set = set(do_df["Descriptor"].astype(str).values)
+    ssbb_set = set(ssbb_df["Saber Básico"].values)
+    ce_set = set(ce_df["CE"].values)
+    cev_set = set(cev_df["Número"].values)
+    do_set = set(do_df["Descriptor"].values)
+
+    tipo_por_codigo, codigos_por_tipo = build_tipos(ssbb_set, ce_set, cev_set, do_set)
+
+    # Rango natural de todo código que puede salir en una tabla
+    orden_natural = NaturalOrder(
+        list(descripciones)
+        + relaciones_long["SB"].tolist()
+        + relaciones_long["Codigo"].tolist()
+        + ce_do_exp["CE"].tolist()
+        + ce_do_exp["DOs asociados"].tolist()
+    )
+
+    relation_index = build_relation_index(relaciones_long, ce_do_exp, cev_df, ce_df)
+    compact_index = build_compact_index(relation_index, descripciones)
+    cierre_tabla3 = build_closure(compact_index, lambda c: relacionados_tabla3([c], relation_index))
 
     return CurriculumData(
         ssbb_df=ssbb_df,
@@ -62,4 +314,21 @@ def cargar_datos(ruta: str) -> CurriculumData:
         ce_set=ce_set,
         cev_set=cev_set,
         do_set=do_set,
+        relation_index=relation_index,
+        compact_index=compact_index,
+        cierre_tabla3=cierre_tabla3,
+        filas_tabla2=build_tabla2_rows(relaciones_long, ce_do_exp, cev_df, ce_df, orden_natural),
+        orden_natural=orden_natural,
+        catalogo=build_catalog(ssbb_df, ce_df, cev_df, do_df, orden_natural),
+        indice_texto=build_fulltext_index(descripciones, orden_natural),
+        lookup=build_code_lookup(ssbb_set, ce_set, cev_set, do_set),
+        tipo_por_codigo=tipo_por_codigo,
+        codigos_por_tipo=codigos_por_tipo,
+        dataset_hash=_hash_fichero(ruta),
+        jerarquia=CodeHierarchy(
+            ssbb_df["Saber Básico"].tolist()
+            + ce_df["CE"].tolist()
+            + cev_df["Número"].tolist()
+            + do_df["Descriptor"].tolist()
+        ),
     )
@@ -1,385 +1,376 @@
+from typing import Optional
+
 import pandas as pd
 
 from core.engine.types import CurriculumData
-from core.engine.sort import natural_sort_key
-import unicodedata
-import re
+from core.engine.relation_index import RelationIndex, build_relation_index
+from core.engine.compact import CompactIndex, build_compact_index
+from core.engine.closure import ClosureBitsets, build_closure
+from core.engine.rows import Tabla2Rows, build_tabla2_rows
+from core.engine.codes import build_tipos
+from core.engine.sort import NaturalOrder, natural_sort_frame, natural_sorted
 
 def _norm_code(value: str) -> str:
     return str(value or "").strip().rstrip(".")
 
-def _norm_col(name: str) -> str:
-    base = unicodedata.normalize("NFKD", str(name or ""))
-    ascii_name = base.encode("ascii", "ignore").decode("ascii")
-    return re.sub(r"[^a-z0-9]", "", ascii_name.lower())
-
-def _find_col(df: pd.DataFrame, candidates) -> str | None:
-    for col in df.columns:
-        key = _norm_col(col)
-        for cand in candidates:
-            if cand in key:
-                return col
-    return None
+def _indice(data: CurriculumData) -> RelationIndex:
+    # El loader lo construye al cargar; aquí solo por si el CurriculumData viene de otra parte
+    if data.relation_index is None:
+        data.relation_index = build_relation_index(data.relaciones_long, data.ce_do_exp, data.cev_df, data.ce_df)
+    return data.relation_index
+
+def _indice_compacto(data: CurriculumData) -> CompactIndex:
+    # Motor "csr": se construye la primera vez que se pide y queda en el CurriculumData
+    if data.compact_index is None:
+        data.compact_index = build_compact_index(_indice(data), data.descripciones)
+    return data.compact_index
+
+def _cierre(data: CurriculumData) -> ClosureBitsets:
+    # El loader lo compila con el dataset; aquí solo por si falta
+    if data.cierre_tabla3 is None:
+        idx = _indice(data)
+        data.cierre_tabla3 = build_closure(_indice_compacto(data), lambda c: relacionados_tabla3([c], idx))
+    return data.cierre_tabla3
+
+def _filas_tabla2(data: CurriculumData) -> dict:
+    # Igual que el índice: el loader las precalcula, aquí solo por si faltan
+    if not data.filas_tabla2:
+        data.filas_tabla2 = build_tabla2_rows(data.relaciones_long, data.ce_do_exp, data.cev_df, data.ce_df, _orden(data))
+    return data.filas_tabla2
+
+def _filas_tabla3(data: CurriculumData) -> Tabla2Rows:
+    # Filas de la tabla 3 de cada código del cierre o del dataset (también los
+    # que no tienen relaciones) en el orden de df_tabla3: la tabla 3 de un
+    # conjunto de esos códigos son sus filas, en este orden
+    if data.filas_tabla3 is None:
+        frame = df_tabla3(set(_cierre(data).codes.tolist()) | set(_tipos(data)), data).reset_index(drop=True)
+        data.filas_tabla3 = Tabla2Rows("Elemento", frame, {c: i for i, c in enumerate(frame["Elemento"].tolist())})
+    return data.filas_tabla3
+
+def _orden(data: CurriculumData) -> NaturalOrder:
+    if data.orden_natural is None:
+        data.orden_natural = NaturalOrder(list(data.descripciones) + list(_indice(data).code_values | _indice(data).sb_values))
+    return data.orden_natural
+
+def _tipos(data: CurriculumData) -> dict:
+    if not data.tipo_por_codigo:
+        data.tipo_por_codigo, data.codigos_por_tipo = build_tipos(data.ssbb_set, data.ce_set, data.cev_set, data.do_set)
+    return data.tipo_por_codigo
 
 def clasificar_tipo(codigo: str, data: CurriculumData) -> str:
-    c = _norm_code(codigo)
-    ssbb_set = {_norm_code(x) for x in data.ssbb_set}
-    ce_set = {_norm_code(x) for x in data.ce_set}
-    cev_set = {_norm_code(x) for x in data.cev_set}
-    do_set = {_norm_code(x) for x in data.do_set}
-    if c in ssbb_set: return "SSBB"
-    if c in ce_set: return "CE"
-    if c in cev_set: return "CEv"
-    if c in do_set: return "DO"
-    return "Otro"
-
-
-def generar_tabla1(seleccionados, data: CurriculumData):
-    seleccionados = [str(c).strip().rstrip(".") for c in (seleccionados or []) if str(c).strip()]
-    resumen = []
-    tipos = {
-        "SSBB": "Saber Básico",
-        "CE": "Competencia Específica",
-        "CEv": "Criterio de Evaluación",
-        "DO": "Descriptor Operativo"
+    return _tipos(data).get(_norm_code(codigo), "Otro")
+
+
+NOMBRES_TIPO = {
+    "SSBB": "Saber Básico",
+    "CE": "Competencia Específica",
+    "CEv": "Criterio de Evaluación",
+    "DO": "Descriptor Operativo"
+}
+
+
+def _unir(codigos, orden: Optional[NaturalOrder] = None) -> str:
+    # con el NaturalOrder del dataset ordena por rangos precalculados
+    return ', '.join(natural_sorted(codigos, orden))
+
+
+def fila_tabla1(tipo: str, codigos, idx: RelationIndex, orden: Optional[NaturalOrder] = None) -> dict:
+    """Fila de la tabla 1 para los códigos seleccionados de un tipo."""
+    nombre_tipo = NOMBRES_TIPO[tipo]
+    elementos = _unir(set(codigos), orden)
+
+    # Inicializar relaciones
+    sbs_rel = []
+    ce_rel = []
+    cev_rel = []
+    do_rel = []
+
+    if tipo == 'CE':
+        # SB directamente relacionados
+        sbs_rel = idx.sb_for_ce(codigos)
+
+        # CEv por prefijo
+        cev_rel = idx.cev_for_ce(codigos)
+
+        # DO por relación directa
+        do_rel = idx.do_for_ce(codigos)
+
+        ce_rel = []  # No mostrar CE seleccionados en su propia columna
+
+    elif tipo == 'SSBB':
+        sbs_rel = []  # No mostrar SSBB seleccionados en su propia columna
+
+        ce_rel = idx.ce_for_sb(codigos)
+        cev_rel = idx.cev_for_sb(codigos)
+        do_rel = idx.do_for_ce(ce_rel)
+
+    elif tipo == 'CEv':
+        cev_rel = []  # No mostrar CEv seleccionados en su propia columna
+
+        # Encontrar SB asociados
+        sbs_rel = idx.sb_for_cev(codigos)
+
+        # CE padres por prefijo
+        posibles_ce = [c.split('.')[0] for c in codigos if '.' in c]
+        ce_rel = [c for c in posibles_ce if c in idx.ce_values]
+
+        # DO asociados a esos CE
+        do_rel = idx.do_for_ce(ce_rel)
+
+    elif tipo == 'DO':
+        do_rel = []  # No mostrar DO seleccionados en su propia columna
+
+        # CE asociados a DO
+        ce_rel = idx.ce_for_do(codigos)
+
+        # SB asociados a esos CE
+        sbs_rel = idx.sb_for_ce(ce_rel)
+
+        # CEv relacionados por prefijo CE
+        cev_rel = idx.cev_for_ce(ce_rel)
+
+    return {
+        'Tipo': nombre_tipo,
+        'Elementos seleccionados': elementos,
+        'SSBB relacionados': _unir(set(sbs_rel), orden) or '-',
+        'CE relacionados': _unir(set(ce_rel), orden) or '-',
+        'CEv relacionados': _unir(set(cev_rel), orden) or '-',
+        'DO relacionados': _unir(set(do_rel), orden) or '-',
     }
-    por_tipo = {t: [] for t in tipos}
 
+
+def seleccion_por_tipo(seleccionados, data: CurriculumData) -> dict:
+    seleccionados = [str(c).strip().rstrip(".") for c in (seleccionados or []) if str(c).strip()]
+    por_tipo = {t: [] for t in NOMBRES_TIPO}
     for cod in seleccionados:
         tipo = clasificar_tipo(cod, data)
         if tipo in por_tipo:
             por_tipo[tipo].append(str(cod))
+    return por_tipo
 
-    for tipo, codigos in por_tipo.items():
-        if not codigos:
-            continue
-
-        nombre_tipo = tipos[tipo]
-        elementos = ', '.join(sorted(set(codigos), key=natural_sort_key))
-
-        # Inicializar relaciones
-        sbs_rel = []
-        ce_rel = []
-        cev_rel = []
-        do_rel = []
-
-        relaciones_long = data.relaciones_long
-        cev_df = data.cev_df
-        ce_do_exp = data.ce_do_exp
-        ce_df = data.ce_df
-
-        if tipo == 'CE':
-            # SB directamente relacionados
-            sbs_rel = relaciones_long[
-                (relaciones_long['Tipo'].str.strip().str.upper() == 'CE') &
-                (relaciones_long['Codigo'].astype(str).isin(codigos))
-            ]['SB'].dropna().astype(str).unique().tolist()
-
-            # CEv por prefijo
-            cev_rel = cev_df[
-                cev_df['Número'].astype(str).str.startswith(tuple(str(c) + '.' for c in codigos))
-            ]['Número'].dropna().astype(str).unique().tolist()
-
-            # DO por relación directa
-            do_rel = ce_do_exp[
-                ce_do_exp['CE'].astype(str).isin(codigos)
-            ]['DOs asociados'].dropna().astype(str).unique().tolist()
-
-            ce_rel = []  # No mostrar CE seleccionados en su propia columna
-
-        elif tipo == 'SSBB':
-            sbs_rel = []  # No mostrar SSBB seleccionados en su propia columna
-
-            ce_rel = relaciones_long[
-                (relaciones_long['SB'].isin(codigos)) &
-                (relaciones_long['Tipo'].str.strip().str.upper() == 'CE')
-            ]['Codigo'].dropna().astype(str).unique().tolist()
-
-            cev_rel = relaciones_long[
-                (relaciones_long['SB'].isin(codigos)) &
-                (relaciones_long['Tipo'].str.strip().str.upper() == 'CEV')
-            ]['Codigo'].dropna().astype(str).unique().tolist()
-
-            do_rel = ce_do_exp[
-                ce_do_exp['CE'].isin(ce_rel)
-            ]['DOs asociados'].dropna().astype(str).unique().tolist()
-
-        elif tipo == 'CEv':
-            cev_rel = []  # No mostrar CEv seleccionados en su propia columna
-
-            # Encontrar SB asociados
-            sbs_rel = relaciones_long[
-                (relaciones_long['Tipo'].str.strip().str.upper() == 'CEV') &
-                (relaciones_long['Codigo'].astype(str).isin(codigos))
-            ]['SB'].dropna().astype(str).unique().tolist()
-
-            # CE padres por prefijo
-            posibles_ce = [c.split('.')[0] for c in codigos if '.' in c]
-            ce_rel = [c for c in posibles_ce if c in ce_df['CE'].astype(str).values]
-
-            # DO asociados a esos CE
-            do_rel = ce_do_exp[
-                ce_do_exp['CE'].isin(ce_rel)
-            ]['DOs asociados'].dropna().astype(str).unique().tolist()
-
-        elif tipo == 'DO':
-            do_rel = []  # No mostrar DO seleccionados en su propia columna
-
-            # CE asociados a DO
-            ce_rel = ce_do_exp[
-                ce_do_exp['DOs asociados'].astype(str).isin(codigos)
-            ]['CE'].dropna().astype(str).unique().tolist()
-
-            # SB asociados a esos CE
-            sbs_rel = relaciones_long[
-                (relaciones_long['Tipo'].str.strip().str.upper() == 'CE') &
-                (relaciones_long['Codigo'].astype(str).isin(ce_rel))
-            ]['SB'].dropna().astype(str).unique().tolist()
-
-            # CEv relacionados por prefijo CE
-            cev_col = _find_col(cev_df, ["numero", "n"])
-            if cev_col:
-                cev_rel = cev_df[
-                    cev_df[cev_col].astype(str).str.startswith(tuple(str(c) + '.' for c in ce_rel))
-                ][cev_col].dropna().astype(str).unique().tolist()
-
-        resumen.append({
-            'Tipo': nombre_tipo,
-            'Elementos seleccionados': elementos,
-            'SSBB relacionados': ', '.join(sorted(set(sbs_rel), key=natural_sort_key)) or '-',
-            'CE relacionados': ', '.join(sorted(set(ce_rel), key=natural_sort_key)) or '-',
-            'CEv relacionados': ', '.join(sorted(set(cev_rel), key=natural_sort_key)) or '-',
-            'DO relacionados': ', '.join(sorted(set(do_rel), key=natural_sort_key)) or '-',
-        })
 
+def generar_tabla1(seleccionados, data: CurriculumData, idx=None):
+    idx = idx if idx is not None else _indice(data)
+    resumen = []
+    for tipo, codigos in seleccion_por_tipo(seleccionados, data).items():
+        if codigos:
+            resumen.append(fila_tabla1(tipo, codigos, idx, _orden(data)))
     return pd.DataFrame(resumen)
 
 
-def generar_tabla2_ssbb(seleccionados, data: CurriculumData) -> pd.DataFrame:
-    relaciones_long = data.relaciones_long
-    ce_do_exp = data.ce_do_exp
+# --- Tablas 2: una fila por código principal ---
+# Cada fila depende solo de su código principal; la selección decide qué filas salen.
+
+def primarios_tabla2_ssbb(seleccionados, idx: RelationIndex) -> list:
     # SB directamente seleccionados o relacionados con seleccionados
-    sb_directos = [s for s in seleccionados if s in relaciones_long['SB'].astype(str).values]
-    sb_relacionados = relaciones_long[
-        relaciones_long['Codigo'].astype(str).isin(seleccionados)
-    ]['SB'].dropna().astype(str).unique().tolist()
+    sb_directos = [s for s in seleccionados if s in idx.sb_values]
+    sb_relacionados = idx.sb_for_code(seleccionados)
     sbs_finales = list(set(sb_directos + sb_relacionados))
 
     # Si hay DO seleccionados, buscamos CE relacionados
-    do_seleccionados = [s for s in seleccionados if s in ce_do_exp['DOs asociados'].astype(str).values]
+    do_seleccionados = [s for s in seleccionados if s in idx.do_values]
     if do_seleccionados:
         # CE relacionados a esos DO
-        ces_relacionados = ce_do_exp[
-            ce_do_exp['DOs asociados'].astype(str).isin(do_seleccionados)
-        ]['CE'].dropna().astype(str).unique().tolist()
+        ces_relacionados = idx.ce_for_do(do_seleccionados)
 
         # Añadir esos CE relacionados a la lista
-        sbs_de_dos = relaciones_long[
-            (relaciones_long['Tipo'].str.strip().str.upper() == 'CE') &
-            (relaciones_long['Codigo'].astype(str).isin(ces_relacionados))
-        ]['SB'].dropna().astype(str).unique().tolist()
+        sbs_de_dos = idx.sb_for_ce(ces_relacionados)
 
         # Añadir SB relacionados a los CE relacionados por DO
         sbs_finales = list(set(sbs_finales + sbs_de_dos))
+    return sbs_finales
+
+
+def fila_tabla2_ssbb(sb: str, idx: RelationIndex, orden: Optional[NaturalOrder] = None) -> dict:
+    fila = {'SB': sb}
+
+    ce_vals = idx.ce_for_sb([sb])
+    cev_vals = idx.cev_for_sb([sb])
+
+    fila['CE'] = _unir(ce_vals, orden) if ce_vals else ''
+    fila['CEv'] = _unir(cev_vals, orden) if cev_vals else ''
 
-    registros = []
-    for sb in sbs_finales:
-        relacionados = relaciones_long[relaciones_long['SB'].astype(str) == sb]
-        fila = {'SB': sb}
+    dos = idx.do_for_ce(ce_vals)
+    fila['DO'] = _unir(dos, orden) if dos else ''
+    return fila
+
+
+def primarios_tabla2_ce(seleccionados, idx: RelationIndex) -> list:
+    # CE directamente seleccionados o relacionados
+    ce_directos = [s for s in seleccionados if s in idx.code_values and idx.first_tipo[s] == 'CE']
+    ce_relacionados = idx.code_for_sb(seleccionados)
+    ce_relacionados = [c for c in ce_relacionados if c in idx.ce_codes]
+    return list(set(ce_directos + ce_relacionados))
+
+
+def fila_tabla2_ce(ce: str, idx: RelationIndex, orden: Optional[NaturalOrder] = None) -> dict:
+    fila = {'CE': ce}
+
+    sb_vals = idx.sb_for_code([ce])
+    fila['SSBB'] = _unir(sb_vals, orden) if sb_vals else ''
+
+    # CEv por prefijo del CE
+    cev_vals = idx.cev_for_ce([ce])
+    fila['CEv'] = _unir(cev_vals, orden) if cev_vals else ''
+
+    # DO por relación directa
+    dos = idx.do_for_ce([ce])
+    fila['DO'] = _unir(dos, orden) if dos else ''
+    return fila
+
+
+def primarios_tabla2_cev(seleccionados, idx: RelationIndex) -> list:
+    # CEv directamente seleccionados o relacionados
+    cev_directos = [s for s in seleccionados if s in idx.code_values and idx.first_tipo[s] == 'CEV']
+    cev_relacionados = idx.code_for_sb(seleccionados)
+    cev_relacionados = [c for c in cev_relacionados if c in idx.cev_codes]
+    return list(set(cev_directos + cev_relacionados))
 
-        ce_vals = relacionados[relacionados['Tipo'].str.strip().str.upper() == 'CE']['Codigo'].dropna().astype(str).unique().tolist()
-        cev_vals = relacionados[relacionados['Tipo'].str.strip().str.upper() == 'CEV']['Codigo'].dropna().astype(str).unique().tolist()
 
-        fila['CE'] = ', '.join(sorted(ce_vals, key=natural_sort_key)) if ce_vals else ''
-        fila['CEv'] = ', '.join(sorted(cev_vals, key=natural_sort_key)) if cev_vals else ''
+def fila_tabla2_cev(cev: str, idx: RelationIndex, orden: Optional[NaturalOrder] = None) -> dict:
+    fila = {'CEv': cev}
 
-        dos = ce_do_exp[ce_do_exp['CE'].astype(str).isin(ce_vals)]['DOs asociados'].dropna().astype(str).unique().tolist()
-        fila['DO'] = ', '.join(sorted(dos, key=natural_sort_key)) if dos else ''
-        registros.append(fila)
+    sb_vals = idx.sb_for_code([cev])
+    fila['SSBB'] = _unir(sb_vals, orden) if sb_vals else ''
 
+    # CE padre por prefijo
+    ce_padre = str(cev).split('.')[0] if '.' in str(cev) else ''
+    fila['CE'] = ce_padre if ce_padre in idx.ce_values else ''
+
+    # DO por relación con el CE
+    dos = idx.do_for_ce([ce_padre]) if ce_padre else []
+    fila['DO'] = _unir(dos, orden) if dos else ''
+    return fila
+
+
+def primarios_tabla2_do(seleccionados, idx: RelationIndex) -> list:
+    # DO directamente seleccionados o relacionados
+    do_directos = [s for s in seleccionados if s in idx.do_values]
+
+    # CE relacionados a seleccionados
+    ce_relacionados = idx.ce_for_sb(seleccionados)
+
+    # DO relacionados a esos CE
+    do_relacionados = idx.do_for_ce(ce_relacionados)
+    return list(set(do_directos + do_relacionados))
+
+
+def fila_tabla2_do(do: str, idx: RelationIndex, orden: Optional[NaturalOrder] = None) -> dict:
+    fila = {'DO': do}
+
+    # CE asociado
+    ce_vals = idx.ce_for_do([do])
+    fila['CE'] = _unir(ce_vals, orden) if ce_vals else ''
+
+    # CEv del CE
+    cev_vals = []
+    for ce in ce_vals:
+        cev_vals.extend(idx.cev_for_ce([ce]))
+    fila['CEv'] = _unir(set(cev_vals), orden) if cev_vals else ''
+
+    # SSBB relacionados a los CE
+    sb_vals = idx.sb_for_ce(ce_vals)
+    fila['SSBB'] = _unir(set(sb_vals), orden) if sb_vals else ''
+    return fila
+
+
+# tabla -> (columna principal, códigos principales de una selección, fila de un código)
+TABLAS2 = {
+    "tabla2_ssbb": ("SB", primarios_tabla2_ssbb, fila_tabla2_ssbb),
+    "tabla2_ce": ("CE", primarios_tabla2_ce, fila_tabla2_ce),
+    "tabla2_cev": ("CEv", primarios_tabla2_cev, fila_tabla2_cev),
+    "tabla2_do": ("DO", primarios_tabla2_do, fila_tabla2_do),
+}
+
+
+def df_tabla2(registros, columna: str, orden: Optional[NaturalOrder] = None) -> pd.DataFrame:
     df = pd.DataFrame(registros)
-    if not df.empty and "SB" in df.columns:
-        df = df.sort_values("SB", key=lambda s: s.map(natural_sort_key))
+    if not df.empty and columna in df.columns:
+        df = natural_sort_frame(df, columna, orden)
     return df
 
 
-def generar_tabla2_ce(seleccionados, data: CurriculumData) -> pd.DataFrame:
+def tabla2_desde_primarios(nombre: str, codigos, data: CurriculumData, idx) -> pd.DataFrame:
+    """Tabla 2 `nombre` con las filas de `codigos` (precalculadas si están; si no, fila a fila)."""
+    columna, _, fila = TABLAS2[nombre]
+    df = _filas_tabla2(data)[nombre].take(codigos)
+    if df is None:
+        orden = _orden(data)
+        df = df_tabla2([fila(c, idx, orden) for c in codigos], columna, orden)
+    return df
+
+
+def _generar_tabla2(nombre: str, seleccionados, data: CurriculumData, idx=None) -> pd.DataFrame:
+    idx = idx if idx is not None else _indice(data)
+    primarios = TABLAS2[nombre][1]
+    return tabla2_desde_primarios(nombre, primarios(seleccionados, idx), data, idx)
+
+
+def generar_tabla2_ssbb(seleccionados, data: CurriculumData, idx=None) -> pd.DataFrame:
+    return _generar_tabla2("tabla2_ssbb", seleccionados, data, idx)
+
+
+def generar_tabla2_ce(seleccionados, data: CurriculumData, idx=None) -> pd.DataFrame:
     """
     Genera tabla de relaciones para cada CE seleccionado/relacionado.
     Similar a generar_tabla2 pero para CE en lugar de SSBB.
     """
-    relaciones_long = data.relaciones_long
-    ce_do_exp = data.ce_do_exp
-    
-    # CE directamente seleccionados o relacionados
-    ce_directos = [s for s in seleccionados if s in relaciones_long['Codigo'].astype(str).values and 
-                   relaciones_long[relaciones_long['Codigo'].astype(str) == s]['Tipo'].str.strip().str.upper().iloc[0] == 'CE']
-    ce_relacionados = relaciones_long[
-        relaciones_long['SB'].astype(str).isin(seleccionados)
-    ]['Codigo'].dropna().astype(str).unique().tolist()
-    ce_relacionados = [c for c in ce_relacionados if c in relaciones_long[relaciones_long['Tipo'].str.strip().str.upper() == 'CE']['Codigo'].values]
-    
-    ces_finales = list(set(ce_directos + ce_relacionados))
-
-    registros = []
-    for ce in ces_finales:
-        relacionados = relaciones_long[relaciones_long['Codigo'].astype(str) == ce]
-        fila = {'CE': ce}
-
-        sb_vals = relacionados[relacionados['Codigo'].astype(str) == ce]['SB'].dropna().astype(str).unique().tolist()
-        fila['SSBB'] = ', '.join(sorted(sb_vals, key=natural_sort_key)) if sb_vals else ''
-
-        # CEv por prefijo del CE
-        cev_vals = data.cev_df[
-            data.cev_df['Número'].astype(str).str.startswith(str(ce) + '.')
-        ]['Número'].dropna().astype(str).unique().tolist()
-        fila['CEv'] = ', '.join(sorted(cev_vals, key=natural_sort_key)) if cev_vals else ''
-
-        # DO por relación directa
-        dos = ce_do_exp[ce_do_exp['CE'].astype(str) == ce]['DOs asociados'].dropna().astype(str).unique().tolist()
-        fila['DO'] = ', '.join(sorted(dos, key=natural_sort_key)) if dos else ''
-        
-        registros.append(fila)
+    return _generar_tabla2("tabla2_ce", seleccionados, data, idx)
 
-    df = pd.DataFrame(registros)
-    if not df.empty and "CE" in df.columns:
-        df = df.sort_values("CE", key=lambda s: s.map(natural_sort_key))
-    return df
 
-
-def generar_tabla2_cev(seleccionados, data: CurriculumData) -> pd.DataFrame:
+def generar_tabla2_cev(seleccionados, data: CurriculumData, idx=None) -> pd.DataFrame:
     """
     Genera tabla de relaciones para cada CEv seleccionado/relacionado.
     """
-    relaciones_long = data.relaciones_long
-    ce_do_exp = data.ce_do_exp
-    
-    # CEv directamente seleccionados o relacionados
-    cev_directos = [s for s in seleccionados if s in relaciones_long['Codigo'].astype(str).values and 
-                    relaciones_long[relaciones_long['Codigo'].astype(str) == s]['Tipo'].str.strip().str.upper().iloc[0] == 'CEV']
-    cev_relacionados = relaciones_long[
-        relaciones_long['SB'].astype(str).isin(seleccionados)
-    ]['Codigo'].dropna().astype(str).unique().tolist()
-    cev_relacionados = [c for c in cev_relacionados if c in relaciones_long[relaciones_long['Tipo'].str.strip().str.upper() == 'CEV']['Codigo'].values]
-    
-    cevs_finales = list(set(cev_directos + cev_relacionados))
-
-    registros = []
-    for cev in cevs_finales:
-        relacionados = relaciones_long[relaciones_long['Codigo'].astype(str) == cev]
-        fila = {'CEv': cev}
-
-        sb_vals = relacionados[relacionados['Codigo'].astype(str) == cev]['SB'].dropna().astype(str).unique().tolist()
-        fila['SSBB'] = ', '.join(sorted(sb_vals, key=natural_sort_key)) if sb_vals else ''
-
-        # CE padre por prefijo
-        ce_padre = str(cev).split('.')[0] if '.' in str(cev) else ''
-        fila['CE'] = ce_padre if ce_padre in data.ce_df['CE'].astype(str).values else ''
-
-        # DO por relación con el CE
-        dos = ce_do_exp[ce_do_exp['CE'].astype(str) == ce_padre]['DOs asociados'].dropna().astype(str).unique().tolist() if ce_padre else []
-        fila['DO'] = ', '.join(sorted(dos, key=natural_sort_key)) if dos else ''
-        
-        registros.append(fila)
-
-    df = pd.DataFrame(registros)
-    if not df.empty and "CEv" in df.columns:
-        df = df.sort_values("CEv", key=lambda s: s.map(natural_sort_key))
-    return df
+    return _generar_tabla2("tabla2_cev", seleccionados, data, idx)
 
 
-def generar_tabla2_do(seleccionados, data: CurriculumData) -> pd.DataFrame:
+def generar_tabla2_do(seleccionados, data: CurriculumData, idx=None) -> pd.DataFrame:
     """
     Genera tabla de relaciones para cada DO seleccionado/relacionado.
     """
-    relaciones_long = data.relaciones_long
-    ce_do_exp = data.ce_do_exp
-    
-    # DO directamente seleccionados o relacionados
-    do_directos = [s for s in seleccionados if s in ce_do_exp['DOs asociados'].astype(str).values]
-    
-    # CE relacionados a seleccionados
-    ce_relacionados = relaciones_long[
-        relaciones_long['SB'].astype(str).isin(seleccionados) &
-        (relaciones_long['Tipo'].str.strip().str.upper() == 'CE')
-    ]['Codigo'].dropna().astype(str).unique().tolist()
-    
-    # DO relacionados a esos CE
-    do_relacionados = ce_do_exp[
-        ce_do_exp['CE'].astype(str).isin(ce_relacionados)
-    ]['DOs asociados'].dropna().astype(str).unique().tolist()
-    
-    dos_finales = list(set(do_directos + do_relacionados))
-
-    registros = []
-    for do in dos_finales:
-        fila = {'DO': do}
-
-        # CE asociado
-        ce_vals = ce_do_exp[ce_do_exp['DOs asociados'].astype(str) == do]['CE'].dropna().astype(str).unique().tolist()
-        fila['CE'] = ', '.join(sorted(ce_vals, key=natural_sort_key)) if ce_vals else ''
-
-        # CEv del CE
-        cev_vals = []
-        if ce_vals:
-            for ce in ce_vals:
-                cevs = data.cev_df[
-                    data.cev_df['Número'].astype(str).str.startswith(str(ce) + '.')
-                ]['Número'].dropna().astype(str).unique().tolist()
-                cev_vals.extend(cevs)
-        fila['CEv'] = ', '.join(sorted(set(cev_vals), key=natural_sort_key)) if cev_vals else ''
-
-        # SSBB relacionados a los CE
-        sb_vals = relaciones_long[
-            (relaciones_long['Codigo'].astype(str).isin(ce_vals)) &
-            (relaciones_long['Tipo'].str.strip().str.upper() == 'CE')
-        ]['SB'].dropna().astype(str).unique().tolist()
-        fila['SSBB'] = ', '.join(sorted(set(sb_vals), key=natural_sort_key)) if sb_vals else ''
-        
-        registros.append(fila)
-
-    df = pd.DataFrame(registros)
-    if not df.empty and "DO" in df.columns:
-        df = df.sort_values("DO", key=lambda s: s.map(natural_sort_key))
-    return df
+    return _generar_tabla2("tabla2_do", seleccionados, data, idx)
 
 
-def generar_tabla3(seleccionados, data: CurriculumData):
+def relacionados_tabla3(seleccionados, idx: RelationIndex) -> set:
     seleccionados = [str(s) for s in seleccionados]
 
     relacionados = set(seleccionados)
-    relaciones_long = data.relaciones_long
-    ce_do_exp = data.ce_do_exp
 
     # Si hay DO seleccionados, añadir CE vinculados
-    dos = ce_do_exp[ce_do_exp["DOs asociados"].astype(str).isin(seleccionados)]["CE"].dropna().astype(str).unique()
-    relacionados.update(dos)
+    relacionados.update(idx.ce_for_do(seleccionados))
 
     # Añadir SB relacionados con cualquier elemento relacionado
-    sb_rel = relaciones_long[
-        relaciones_long["Codigo"].astype(str).isin(relacionados) |
-        relaciones_long["SB"].astype(str).isin(relacionados)
-    ]["SB"].dropna().astype(str).unique()
+    sb_rel = idx.sb_for_code(relacionados)
+    sb_rel += [s for s in relacionados if s in idx.sb_values]
     relacionados.update(sb_rel)
 
     # Añadir CE / CEv asociados a esos SB
-    ce_cev = relaciones_long[relaciones_long["SB"].astype(str).isin(sb_rel)]
-    relacionados.update(ce_cev["Codigo"].dropna().astype(str).unique())
+    relacionados.update(idx.code_for_sb(sb_rel))
 
     # Añadir DO asociados a los CE encontrados
-    ces = ce_cev[ce_cev["Tipo"].astype(str).str.strip().str.upper() == "CE"]["Codigo"].dropna().astype(str).unique()
-    dos2 = ce_do_exp[ce_do_exp["CE"].astype(str).isin(ces)]["DOs asociados"].dropna().astype(str).unique()
-    relacionados.update(dos2)
+    ces = idx.ce_for_sb(sb_rel)
+    relacionados.update(idx.do_for_ce(ces))
+    return relacionados
+
 
+def df_tabla3(relacionados, data: CurriculumData) -> pd.DataFrame:
     df = pd.DataFrame({"Elemento": sorted(relacionados)})
-    df["Tipo"] = df["Elemento"].apply(lambda x: clasificar_tipo(x, data))
+    tipos = _tipos(data)
+    df["Tipo"] = df["Elemento"].map(lambda x: tipos.get(_norm_code(x), "Otro"))
     df["Descripción"] = df["Elemento"].apply(lambda x: data.descripciones.get(str(x), "Descripción no encontrada"))
 
     orden = {"SSBB": 0, "CE": 1, "CEv": 2, "DO": 3, "Otro": 99}
     df["Orden"] = df["Tipo"].map(orden).fillna(99)
+    orden_natural = _orden(data)
     df = df.sort_values(
         ["Orden", "Elemento"],
-        key=lambda s: s.map(natural_sort_key) if s.name == "Elemento" else s
+        key=lambda s: orden_natural.sort_key(s) if s.name == "Elemento" else s
     )
 
     return df
+
+
+def generar_tabla3(seleccionados, data: CurriculumData):
+    # OR de los bitsets precalculados de cada código (equivale a relacionados_tabla3)
+    return df_tabla3(_cierre(data).related(seleccionados), data)
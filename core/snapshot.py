@@ -0,0 +1,85 @@
+# core/snapshot.py
+"""
+Snapshots compilados de los Excel curriculares.
+
+Un snapshot es un pickle versionado con el CurriculumData ya normalizado
+(frames, relaciones_long, ce_do_exp, descripciones y sets). Se guarda en
+`<carpeta del Excel>/.saberes_cache/<nombre>.pkl` (o en SABERES_SNAPSHOT_DIR)
+y solo se usa si es más reciente que el Excel y corresponde a su mtime/tamaño.
+"""
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from core.engine.types import CurriculumData
+
+# Subir cuando cambie el contenido de CurriculumData o la normalización del loader
+SNAPSHOT_VERSION = 15
+SNAPSHOT_DIRNAME = ".saberes_cache"
+
+
+def snapshots_activos() -> bool:
+    return os.environ.get("SABERES_SNAPSHOTS", "1").strip().lower() not in ("0", "false", "no")
+
+
+def ruta_snapshot(ruta_excel: str) -> Path:
+    origen = Path(ruta_excel).resolve()
+    base = os.environ.get("SABERES_SNAPSHOT_DIR", "").strip()
+    carpeta = Path(base) if base else origen.parent / SNAPSHOT_DIRNAME
+    return carpeta / f"{origen.stem}.pkl"
+
+
+def _sello_origen(ruta_excel: str) -> tuple[int, int]:
+    st = os.stat(ruta_excel)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def leer_snapshot(ruta_excel: str) -> CurriculumData | None:
+    """Devuelve el CurriculumData compilado o None si no existe / está obsoleto."""
+    destino = ruta_snapshot(ruta_excel)
+    try:
+        st_snap = os.stat(destino)
+        sello = _sello_origen(ruta_excel)
+        if st_snap.st_mtime_ns < sello[0]:
+            return None
+        with open(destino, "rb") as fh:
+            payload = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Snapshot corrupto o de otra versión del código: se recompila
+        return None
+
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("version") != SNAPSHOT_VERSION or payload.get("source") != sello:
+        return None
+    data = payload.get("data")
+    return data if isinstance(data, CurriculumData) else None
+
+
+def escribir_snapshot(ruta_excel: str, data: CurriculumData) -> Path | None:
+    """
+    Escribe el snapshot de forma atómica (tmp + rename).
+    Devuelve la ruta escrita o None si el destino no es escribible.
+    """
+    destino = ruta_snapshot(ruta_excel)
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "source": _sello_origen(ruta_excel),
+        "data": data,
+    }
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=destino.stem, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(payload, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, destino)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    except OSError:
+        return None
+    return destino
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.loader import compilar_dataset
+from django_apps.accounts.models import Subject
+
+
+class Command(BaseCommand):
+    help = "Compila a snapshot los Excel de todas las asignaturas (Subject.dataset_path)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recompila aunque el snapshot esté al día.",
+        )
+
+    def handle(self, *args, **options):
+        compiled = 0
+        failed = 0
+
+        subjects = Subject.objects.exclude(dataset_path="").order_by("code")
+        for subject in subjects:
+            path = Path(subject.dataset_path)
+            if not path.is_absolute():
+                path = Path(settings.BASE_DIR) / path
+
+            try:
+                out = compilar_dataset(str(path), force=options["force"])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{subject.code}: {e}"))
+                continue
+
+            if out is None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{subject.code}: no se pudo escribir el snapshot"))
+                continue
+
+            compiled += 1
+            self.stdout.write(f"{subject.code}: {out}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Asignaturas compiladas: {compiled}, con error: {failed}"
+            )
+        )
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import ExportJob
+from django.db.models import Count
+
+from .models import ExportBlob, ExportJob
 
 
 @admin.register(ExportJob)
@@ -7,3 +9,16 @@ class ExportJobAdmin(admin.ModelAdmin):
     list_display = ("created_at", "user", "subject", "status")
     search_fields = ("user__username", "subject__code", "subject__name", "codes_raw")
     list_filter = ("status", "subject")
+
+
+@admin.register(ExportBlob)
+class ExportBlobAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "key", "size", "refs")
+    search_fields = ("key",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(refs=Count("jobs"))
+
+    @admin.display(ordering="refs", description="Referencias")
+    def refs(self, obj):
+        return obj.refs
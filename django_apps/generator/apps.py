@@ -2,4 +2,16 @@ from django.apps import AppConfig
 
 class GeneratorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "django_apps.generator"
\ No newline at end of file
+    name = "django_apps.generator"
+
+    def ready(self):
+        from django.conf import settings
+
+        # Resultados de generate_from_excel en la caché de Django (locmem, fichero...)
+        alias = getattr(settings, "SABERES_RESULT_CACHE", "")
+        if alias:
+            from core.engine.result_cache import configure_result_cache
+            from django_apps.generator.result_cache import DjangoResultCache
+
+            timeout = settings.CACHES[alias].get("TIMEOUT", 300)
+            configure_result_cache(DjangoResultCache(alias, timeout=timeout))
@@ -0,0 +1,325 @@
+"""
+Cola de exportaciones sobre la tabla ExportJob.
+
+Las vistas crean el job en PENDING y vuelven enseguida; los procesos de
+`manage.py run_export_workers` reclaman jobs (PENDING -> RUNNING con un
+UPDATE condicional, atómico también en SQLite), generan el Excel y lo guardan
+en un ExportBlob (SUCCESS) o guardan el error (FAILED).
+
+Los Excel se guardan por contenido (ver ExportBlob): si la misma petición ya
+se exportó, el job apunta al fichero existente sin generarlo otra vez.
+"""
+import hashlib
+import os
+import socket
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, Q
+from django.db.models.deletion import ProtectedError
+from django.utils import timezone
+
+from core.engine.generate import generate_from_excel
+from core.engine.normalize import NormalizationError, normalize_codes, split_code_input
+from core.loader import cargar_datos
+from django_apps.generator.models import ExportBlob, ExportJob
+from utils.export import EXPORTER_VERSION
+
+# Intentos de reclamar un job cuando otro worker se lo lleva antes
+CLAIM_RETRIES = 5
+# Los FAILED se conservan un rato para que la página del job pueda enseñar el error
+FAILED_KEEP = timedelta(hours=1)
+# Blobs borrados por transacción en gc_export_blobs
+GC_BATCH_SIZE = 500
+
+
+def dataset_path(subject) -> str:
+    """Ruta absoluta del Excel del Subject (dataset_path suele ser relativo a BASE_DIR)."""
+    if not subject.dataset_path:
+        raise RuntimeError("Subject.dataset_path está vacío.")
+    path = Path(subject.dataset_path)
+    if not path.is_absolute():
+        path = Path(settings.BASE_DIR) / path
+    return str(path)
+
+
+def export_key(dataset_hash: str, codes) -> str:
+    """Clave del Excel: contenido del dataset + códigos normalizados ordenados + versión del exportador."""
+    seleccion = "\n".join(sorted(set(codes)))
+    return hashlib.sha256(f"{EXPORTER_VERSION}\n{dataset_hash}\n{seleccion}".encode("utf-8")).hexdigest()
+
+
+def _resolver(subject, codes_raw: str) -> tuple:
+    # (ruta del dataset, códigos normalizados, clave del Excel)
+    excel_path = dataset_path(subject)
+    tokens = split_code_input(codes_raw)
+    if not tokens:
+        raise NormalizationError("No has indicado códigos válidos.")
+    data = cargar_datos(excel_path)
+    tokens = normalize_codes(tokens, data)
+    return excel_path, tokens, export_key(data.dataset_hash, tokens)
+
+
+def find_blob(key: str) -> Optional[ExportBlob]:
+    """
+    Blob ya guardado para `key` (None si no hay o si su fichero ha desaparecido).
+    Lo marca como usado ahora (last_used_at) para que gc_export_blobs no lo
+    borre antes de que el job que lo va a reutilizar exista.
+    """
+    blob = ExportBlob.objects.filter(key=key).first()
+    if blob is None or not blob.file or not blob.file.storage.exists(blob.file.name):
+        return None
+    blob.last_used_at = timezone.now()
+    if not ExportBlob.objects.filter(id=blob.id).update(last_used_at=blob.last_used_at):
+        # borrado entretanto
+        return None
+    return blob
+
+
+def store_blob(key: str, contenido: bytes) -> ExportBlob:
+    """Guarda el Excel bajo `key`; si otro worker lo ha guardado a la vez, devuelve el suyo."""
+    blob = ExportBlob.objects.filter(key=key).first()
+    if blob is None:
+        blob = ExportBlob(key=key)
+    elif blob.file and blob.file.storage.exists(blob.file.name):
+        # otro worker ya lo ha generado: su fichero vale (y puede estar sirviéndose)
+        blob.last_used_at = timezone.now()
+        ExportBlob.objects.filter(id=blob.id).update(last_used_at=blob.last_used_at)
+        return blob
+    elif blob.file:
+        # fila sin fichero en disco: se vuelve a escribir
+        blob.file.delete(save=False)
+    blob.size = len(contenido)
+    blob.last_used_at = timezone.now()
+    blob.file.save(f"{key}.xlsx", ContentFile(contenido), save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        blob.file.delete(save=False)
+        return ExportBlob.objects.get(key=key)
+    return blob
+
+
+def enqueue_export(user, subject, codes_raw: str) -> ExportJob:
+    """
+    Crea el job en PENDING. Si ese mismo Excel ya está guardado, el job nace
+    en SUCCESS apuntando a él y no pasa por la cola.
+    """
+    try:
+        blob = find_blob(_resolver(subject, codes_raw)[2])
+    except Exception:
+        # códigos o dataset con problemas: el worker dejará el error en el job
+        blob = None
+    if blob is not None:
+        ahora = timezone.now()
+        try:
+            with transaction.atomic():
+                job = ExportJob.objects.create(
+                    user=user,
+                    subject=subject,
+                    codes_raw=codes_raw,
+                    status=ExportJob.Status.SUCCESS,
+                    blob=blob,
+                    started_at=ahora,
+                    finished_at=ahora,
+                )
+        except IntegrityError:
+            # el blob se ha borrado de todas formas: se encola como uno nuevo
+            pass
+        else:
+            prune_export_jobs(user)
+            return job
+
+    return ExportJob.objects.create(
+        user=user,
+        subject=subject,
+        codes_raw=codes_raw,
+        status=ExportJob.Status.PENDING,
+    )
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(worker: Optional[str] = None) -> Optional[ExportJob]:
+    """
+    Reclama el PENDING más antiguo. El UPDATE solo afecta a la fila si sigue
+    en PENDING, así que si dos workers eligen el mismo job solo uno lo consigue
+    (el otro prueba con el siguiente).
+    """
+    worker = worker or worker_name()
+    for _ in range(CLAIM_RETRIES):
+        job_id = (
+            ExportJob.objects
+            .filter(status=ExportJob.Status.PENDING)
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = ExportJob.objects.filter(id=job_id, status=ExportJob.Status.PENDING).update(
+            status=ExportJob.Status.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            return ExportJob.objects.select_related("subject", "user").get(id=job_id)
+    return None
+
+
+def requeue_stale_jobs(older_than: timedelta) -> int:
+    """Devuelve a PENDING los RUNNING que llevan demasiado (worker caído)."""
+    limite = timezone.now() - older_than
+    return ExportJob.objects.filter(status=ExportJob.Status.RUNNING, started_at__lt=limite).update(
+        status=ExportJob.Status.PENDING,
+        worker="",
+        started_at=None,
+    )
+
+
+def _finish(job: ExportJob, status: str, error_message: str = "") -> None:
+    job.status = status
+    job.error_message = error_message
+    job.finished_at = timezone.now()
+    job.save()
+
+
+def run_export_job(job: ExportJob) -> ExportJob:
+    """Genera el Excel del job (ya en RUNNING) y lo deja en SUCCESS o FAILED."""
+    try:
+        excel_path, tokens, key = _resolver(job.subject, job.codes_raw)
+        blob = find_blob(key)
+        if blob is None:
+            res = generate_from_excel(excel_path, tokens)
+            if not res.excel_bytes:
+                raise RuntimeError("generate() no devolvió excel_bytes (vacío o None).")
+            blob = store_blob(key, res.excel_bytes)
+
+        job.blob = blob
+        _finish(job, ExportJob.Status.SUCCESS)
+        prune_export_jobs(job.user)
+    except NormalizationError as e:
+        _finish(job, ExportJob.Status.FAILED, str(e))
+    except OperationalError:
+        # BD bloqueada / caída: que lo repita otro worker
+        raise
+    except Exception:
+        _finish(job, ExportJob.Status.FAILED, traceback.format_exc()[:8000])
+    return job
+
+
+def run_pending_jobs(worker: Optional[str] = None, limit: Optional[int] = None) -> int:
+    """Procesa jobs hasta vaciar la cola (o hasta `limit`); devuelve cuántos."""
+    hechos = 0
+    while limit is None or hechos < limit:
+        job = claim_next_job(worker)
+        if job is None:
+            break
+        run_export_job(job)
+        hechos += 1
+    return hechos
+
+
+def prune_export_jobs(user, keep: int = 15) -> None:
+    """
+    Conserva los `keep` SUCCESS más recientes del usuario (y los que siguen en
+    cola). Solo borra filas: los blobs sin referencias los recoge gc_export_blobs.
+    """
+    # Condiciones sobre la propia fila (no una lista de ids leída antes): así un
+    # job que otro worker termina mientras tanto no se borra por error
+    viejos = Q(status=ExportJob.Status.FAILED) & (
+        Q(finished_at__isnull=True) | Q(finished_at__lt=timezone.now() - FAILED_KEEP)
+    )
+    recientes = list(
+        ExportJob.objects
+        .filter(user=user, status=ExportJob.Status.SUCCESS)
+        .order_by("-created_at")
+        .values_list("created_at", flat=True)[:keep]
+    )
+    if len(recientes) == keep:
+        viejos |= Q(status=ExportJob.Status.SUCCESS, created_at__lt=recientes[-1])
+    ExportJob.objects.filter(user=user).filter(viejos).delete()
+
+
+def gc_export_blobs(grace: timedelta, dry_run: bool = False) -> tuple[int, int]:
+    """
+    Borra los blobs sin ningún ExportJob (y sin usar en los últimos `grace`,
+    para no competir con un job que acaba de reutilizarlos, ver find_blob)
+    junto con sus ficheros. Devuelve (blobs, bytes) borrados, o los que se
+    borrarían con dry_run.
+    """
+    limite = timezone.now() - grace
+    candidatos = list(
+        ExportBlob.objects
+        .filter(last_used_at__lt=limite)
+        .annotate(refs=Count("jobs"))
+        .filter(refs=0)
+        .values_list("id", flat=True)
+    )
+    if dry_run:
+        return len(candidatos), sum(
+            ExportBlob.objects.filter(id__in=candidatos).values_list("size", flat=True)
+        )
+
+    storage = ExportBlob._meta.get_field("file").storage
+    n = total = 0
+    for i in range(0, len(candidatos), GC_BATCH_SIZE):
+        lote = candidatos[i:i + GC_BATCH_SIZE]
+        try:
+            with transaction.atomic():
+                # se vuelve a comprobar: un job puede haber cogido el blob entretanto
+                filas = list(
+                    ExportBlob.objects
+                    .filter(id__in=lote, jobs__isnull=True, last_used_at__lt=limite)
+                    .values_list("id", "file", "size")
+                )
+                ExportBlob.objects.filter(id__in=[f[0] for f in filas]).delete()
+        except (ProtectedError, IntegrityError):
+            continue
+        # ficheros fuera de la transacción: si algo falla aquí, queda un huérfano (ver gc_orphan_files)
+        for _, nombre, size in filas:
+            if nombre:
+                storage.delete(nombre)
+            n += 1
+            total += size
+    return n, total
+
+
+def _ficheros(storage, carpeta: str):
+    dirs, files = storage.listdir(carpeta)
+    for f in files:
+        yield f"{carpeta}/{f}"
+    for d in dirs:
+        yield from _ficheros(storage, f"{carpeta}/{d}")
+
+
+def gc_orphan_files(grace: timedelta, dry_run: bool = False, carpeta: str = "exports") -> tuple[int, int]:
+    """
+    Borra los ficheros de `carpeta` (en MEDIA_ROOT) que no son de ningún blob
+    ni de ningún job antiguo (output_file), p. ej. los que dejaban los jobs
+    purgados antes de ExportBlob. Devuelve (ficheros, bytes).
+    """
+    storage = ExportBlob._meta.get_field("file").storage
+    if not storage.exists(carpeta):
+        return 0, 0
+    usados = set(ExportBlob.objects.values_list("file", flat=True))
+    usados.update(ExportJob.objects.exclude(output_file="").exclude(output_file=None).values_list("output_file", flat=True))
+    limite = timezone.now() - grace
+
+    n = total = 0
+    for nombre in list(_ficheros(storage, carpeta)):
+        if nombre in usados or storage.get_modified_time(nombre) >= limite:
+            continue
+        total += storage.size(nombre)
+        n += 1
+        if not dry_run:
+            storage.delete(nombre)
+    return n, total
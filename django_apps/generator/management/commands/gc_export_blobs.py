@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_apps.generator import jobs
+
+
+class Command(BaseCommand):
+    help = "Borra los Excel exportados (ExportBlob) que ya no usa ningún ExportJob."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=settings.EXPORT_GC_GRACE_MINUTES,
+            help="No borra nada más reciente que esto (por defecto EXPORT_GC_GRACE_MINUTES).",
+        )
+        parser.add_argument(
+            "--orphan-files",
+            action="store_true",
+            help="Además, borra los ficheros de media/exports/ sin blob ni job (exportaciones antiguas).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo cuenta lo que se borraría.",
+        )
+
+    def handle(self, *args, **options):
+        grace = timedelta(minutes=max(0, options["grace_minutes"]))
+        dry_run = options["dry_run"]
+        verbo = "Se borrarían" if dry_run else "Borrados"
+
+        n, total = jobs.gc_export_blobs(grace, dry_run=dry_run)
+        self.stdout.write(f"{verbo} {n} blobs sin referencias ({total / 1024:.0f} KiB).")
+
+        if options["orphan_files"]:
+            n, total = jobs.gc_orphan_files(grace, dry_run=dry_run)
+            self.stdout.write(f"{verbo} {n} ficheros huérfanos ({total / 1024:.0f} KiB).")
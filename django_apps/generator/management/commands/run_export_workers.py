@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from django_apps.generator import jobs
+
+# Cada cuánto el proceso padre busca jobs RUNNING abandonados
+REQUEUE_EVERY_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _salir(*_):
+    raise SystemExit(0)
+
+
+def _worker_loop(nombre: str, poll: float, once: bool) -> None:
+    # Proceso hijo: conexiones propias y salida limpia con SIGTERM
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+    signal.signal(signal.SIGTERM, _salir)
+
+    while True:
+        try:
+            hechos = jobs.run_pending_jobs(nombre)
+        except OperationalError:
+            # SQLite bloqueado más allá del timeout: reintentar en la siguiente vuelta
+            connections.close_all()
+            hechos = 0
+        except Exception:
+            # un fallo fuera del job (BD, almacenamiento...) no debe parar el worker
+            logger.exception("Worker de exportación %s: error procesando la cola", nombre)
+            connections.close_all()
+            hechos = 0
+        if once and hechos == 0:
+            return
+        if hechos == 0:
+            time.sleep(poll)
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los workers que generan las exportaciones encoladas (ExportJob PENDING)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.EXPORT_WORKERS,
+            help="Procesos en paralelo (por defecto EXPORT_WORKERS).",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=settings.EXPORT_POLL_SECONDS,
+            help="Segundos entre consultas a la cola cuando está vacía.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Procesa lo que haya en la cola y termina.",
+        )
+
+    def handle(self, *args, **options):
+        n = max(1, options["workers"])
+        stale = timedelta(minutes=settings.EXPORT_STALE_MINUTES)
+
+        requeued = jobs.requeue_stale_jobs(stale)
+        if requeued:
+            self.stdout.write(f"Jobs RUNNING abandonados devueltos a la cola: {requeued}")
+
+        # Los hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        base = jobs.worker_name()
+
+        def arrancar(i):
+            p = multiprocessing.Process(
+                target=_worker_loop,
+                args=(f"{base}/{i}", options["poll"], options["once"]),
+                daemon=True,
+            )
+            p.start()
+            return p
+
+        procesos = [arrancar(i) for i in range(n)]
+        signal.signal(signal.SIGTERM, _salir)
+        self.stdout.write(self.style.SUCCESS(f"Workers de exportación: {n}"))
+
+        try:
+            ultimo_requeue = time.monotonic()
+            # con --once se espera a que terminen; si no, no se para nunca
+            while not options["once"] or any(p.is_alive() for p in procesos):
+                time.sleep(1)
+                if not options["once"]:
+                    # un hijo muerto se sustituye: si no, la cola se queda sin workers
+                    for i, p in enumerate(procesos):
+                        if not p.is_alive():
+                            self.stderr.write(f"Worker {base}/{i} terminado (código {p.exitcode}); se arranca otro.")
+                            connections.close_all()
+                            procesos[i] = arrancar(i)
+                if not options["once"] and time.monotonic() - ultimo_requeue > REQUEUE_EVERY_SECONDS:
+                    jobs.requeue_stale_jobs(stale)
+                    connections.close_all()
+                    ultimo_requeue = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for p in procesos:
+                if p.is_alive():
+                    p.terminate()
+            for p in procesos:
+                p.join()
+        self.stdout.write("Workers detenidos.")
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+import django_apps.generator.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0007_exportjob_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to=django_apps.generator.models._blob_upload_to)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='jobs', to='generator.exportblob'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0008_exportblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportblob',
+            name='last_used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
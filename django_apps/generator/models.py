@@ -1,12 +1,48 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django_apps.accounts.models import Subject
 
+
+def _blob_upload_to(instance, filename):
+    # exports/blobs/ab/abcdef....xlsx (dos niveles para no llenar un directorio)
+    return f"exports/blobs/{instance.key[:2]}/{filename}"
+
+
+class ExportBlob(models.Model):
+    """
+    Excel exportado, direccionado por contenido: `key` resume (hash del
+    dataset, códigos normalizados ordenados, versión del exportador), así que
+    la misma petición reutiliza el mismo fichero. Lo comparten todos los
+    ExportJob que apuntan a él (su número es la cuenta de referencias); los
+    que se quedan sin referencias los borra `manage.py gc_export_blobs`.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=_blob_upload_to)
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # última vez que un job lo ha reutilizado (el GC no borra los usados hace poco)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"{self.key[:12]} ({self.size} B)"
+
+    @property
+    def refcount(self) -> int:
+        return self.jobs.count()
+
+
 class ExportJob(models.Model):
     class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
         SUCCESS = "SUCCESS", "Success"
         FAILED = "FAILED", "Failed"
 
+    # Estados en los que el job sigue en la cola (ver generator.jobs)
+    ACTIVE_STATUSES = (Status.PENDING, Status.RUNNING)
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
     subject = models.ForeignKey(
@@ -20,11 +56,44 @@ class ExportJob(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.FAILED)
     error_message = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
+    # jobs antiguos: fichero propio; los nuevos comparten el de `blob`
     output_file = models.FileField(upload_to="exports/%Y/%m/%d/", blank=True, null=True)
+    blob = models.ForeignKey(
+        ExportBlob,
+        on_delete=models.PROTECT,
+        related_name="jobs",
+        blank=True,
+        null=True,
+    )
+
+    # cola de exportación: quién lo ha cogido y cuándo empezó / terminó
+    worker = models.CharField(max_length=64, blank=True, default="")
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"], name="exportjob_queue_idx")]
 
     def __str__(self) -> str:
         return f"{self.created_at:%Y-%m-%d %H:%M} {self.user.username} {self.subject.code} {self.status}"
 
+    @property
+    def is_active(self) -> bool:
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def export_file(self):
+        """El Excel del job (el blob compartido o, en jobs antiguos, output_file); None si no hay."""
+        if self.blob_id:
+            return self.blob.file
+        return self.output_file or None
+
+    @property
+    def download_name(self) -> str:
+        if self.blob_id:
+            return f"export_{self.subject.code}_{timezone.localtime(self.created_at):%Y-%m-%d_%H-%M}.xlsx"
+        return self.output_file.name.split("/")[-1]
+
 
 class secuenciacionPlan(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -0,0 +1,24 @@
+from django.core.cache import caches
+
+from core.engine.result_cache import RESULT_CACHE_TTL
+
+
+class DjangoResultCache:
+    """Backend de core.engine.result_cache sobre un alias de settings.CACHES."""
+
+    def __init__(self, alias: str = "default", timeout: float | None = RESULT_CACHE_TTL):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key: str):
+        return self.cache.get(key)
+
+    def set(self, key: str, value) -> None:
+        self.cache.set(key, value, timeout=self.timeout)
+
+    def clear(self) -> None:
+        self.cache.clear()
@@ -6,9 +6,11 @@ app_name = "generator"
 urlpatterns = [
     path("", views.index, name="index"),
     path("export/", views.export_by_subject, name="export"),
+    path("export/bulk/", views.export_bulk, name="export_bulk"),
     path("exports/", views.my_exports, name="my_exports"),
     path("exports/<int:job_id>/download/", views.download_export, name="download_export"),
     path("exports/<int:job_id>/", views.export_detail, name="export_detail"),
+    path("exports/<int:job_id>/status/", views.export_status, name="export_status"),
     path("tables/", views.tables_view, name="tables"),
     path("tables/render/", views.tables_render, name="tables_render"),   # paso 3
     path("tables/export/", views.tables_export, name="tables_export"),   # paso 4
@@ -22,5 +24,6 @@ urlpatterns = [
     path("secuenciacion/plans/<int:plan_id>/delete/", views.secuenciacion_plan_delete, name="secuenciacion_plan_delete"),
     path("secuenciacion/analyze/", views.secuenciacion_analyze, name="secuenciacion_analyze"),
     path("secuenciacion/codes/", views.secuenciacion_codes, name="secuenciacion_codes"),
+    path("secuenciacion/hierarchy/", views.secuenciacion_hierarchy, name="secuenciacion_hierarchy"),
 ]
 
@@ -1,28 +1,31 @@
 from pathlib import Path
+import logging
 import re
 import unicodedata
+from django.utils import timezone
 from django.utils.html import escape
 
 import json
 
-import traceback
 
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.conf import settings
 
 from core.loader import cargar_datos
-from core.engine.normalize import normalize_codes, NormalizationError
+from core.engine.normalize import normalize_codes, split_code_input, NormalizationError
 
-from core.engine.generate import generate_from_excel
+from core.engine.generate import generate_from_excel, generate_delta, peek_result
+from core.engine import bulk
+from utils import export_formats
 
 from django.contrib.auth.decorators import login_required
 from django_apps.accounts.permissions import require_subject_access
 
+from django_apps.generator import jobs
 from django_apps.generator.models import ExportJob, secuenciacionPlan
 
-from django.core.files.base import ContentFile
-from django.utils import timezone
 
 from django.http import FileResponse, Http404
 
@@ -30,16 +33,19 @@ from django.core.paginator import Paginator
 
 from django_apps.accounts.models import Subject, UserSubjectAccess
 from core.loader import cargar_datos
-from core.engine.codes import build_codigos_df
+from core.engine.catalog import get_catalog
+from core.engine.fulltext import search_descriptions
 from core.engine.generate import generate_from_excel
 from core.engine.display import marcar_seleccion_tabla2, marcar_seleccion_tabla3
 
 from django.views.decorators.http import require_POST
 from django.views.decorators.http import require_GET
 
-from core.engine.sort import natural_sort_key
+from core.engine.sort import natural_sorted
 from core.engine.generate import generate_from_excel
 
+logger = logging.getLogger(__name__)
+
 CODE_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜÑ0-9]+(?:\.[A-Za-zÁÉÍÓÚÜÑ0-9]+)+")  # tipo GEH.1.C.10
 
 # Ajusta esto a TU fichero por defecto
@@ -83,16 +89,6 @@ def _resolve_subject(user, subject_id):
         demo_mode = False
     return subject, demo_mode, demo_subject
 
-def _prune_export_jobs(user, keep: int = 15):
-    keep_ids = list(
-        ExportJob.objects
-        .filter(user=user, status=ExportJob.Status.SUCCESS)
-        .order_by("-created_at")
-        .values_list("id", flat=True)[:keep]
-    )
-    if keep_ids:
-        ExportJob.objects.filter(user=user).exclude(id__in=keep_ids).delete()
-
 def _get_subjects_for_user(user):
     accesses = user.usersubjectaccess_set.select_related("subject").all()
     return [a.subject for a in accesses]
@@ -102,47 +98,6 @@ def _normalize_colname(name: str) -> str:
     ascii_name = base.encode("ascii", "ignore").decode("ascii")
     return re.sub(r"[^a-z0-9]", "", ascii_name.lower())
 
-def _sort_df_by_codigo_natural(dfx):
-    if dfx is None or dfx.empty:
-        return dfx
-    code_col = None
-    for col in dfx.columns:
-        key = _normalize_colname(col)
-        if "codigo" in key or key == "code":
-            code_col = col
-            break
-    if not code_col:
-        return dfx
-    return dfx.sort_values(code_col, key=lambda s: s.map(natural_sort_key))
-def _get_demo_allowed_codes(df, max_per_type: int):
-    if df is None or df.empty:
-        return set()
-    def _find_col(candidates):
-        for col in df.columns:
-            key = _normalize_colname(col)
-            for cand in candidates:
-                if cand in key:
-                    return col
-        return None
-    code_col = _find_col(["codigo", "code"])
-    type_col = _find_col(["tipo", "type"])
-    if not code_col or not type_col:
-        return set()
-    df_sorted = _sort_df_by_codigo_natural(df)
-    allowed = set()
-    for t in ("SSBB", "CE", "CEv", "DO"):
-        subset = df_sorted[df_sorted[type_col] == t]
-        count = 0
-        for code in subset[code_col].astype(str).tolist():
-            code_norm = _normalize_code(code)
-            if not code_norm:
-                continue
-            allowed.add(code_norm)
-            count += 1
-            if count >= max_per_type:
-                break
-    return allowed
-
 def _apply_demo_description_lock(df, demo_allowed: set):
     if df is None or df.empty:
         return df
@@ -178,13 +133,9 @@ def index(request):
     if not codes_raw:
         return HttpResponseBadRequest("No has indicado códigos.")
 
-    # Permite separar por coma, espacio o salto de línea
-    # Ej: "CE1, A.1\n1.2" -> ["CE1","A.1","1.2"]
-    tokens = []
-    for part in codes_raw.replace("\n", " ").replace(",", " ").split(" "):
-        t = part.strip()
-        if t:
-            tokens.append(t)
+    # Permite separar por coma, espacio o salto de línea, y patrones
+    # Ej: "CE1, A.1\n1.2 CE2-CE4 1.A.*" -> ["CE1","A.1","1.2","CE2-CE4","1.A.*"]
+    tokens = split_code_input(codes_raw)
 
     if not tokens:
         return HttpResponseBadRequest("No has indicado códigos válidos.")
@@ -217,14 +168,7 @@ def export_by_subject(request):
     subject_code = (request.POST.get("subject_code") or "").strip()
     codes_raw = (request.POST.get("codes") or "").strip()
 
-    job = None  # lo creamos cuando tengamos subject válido
-
     def render_error(message: str, status: int = 400):
-        nonlocal job
-        if job is not None:
-            job.error_message = message
-            job.save(update_fields=["error_message"])
-
         return render(
             request,
             "generator/export.html",
@@ -250,51 +194,18 @@ def export_by_subject(request):
         if not subject.dataset_path:
             return render_error("Esta asignatura no tiene dataset configurado.")
 
-        # Crear el job ya con FK correcta
-        job = ExportJob.objects.create(
-            user=request.user,
-            subject=subject,
-            codes_raw=codes_raw,
-            status=ExportJob.Status.FAILED,
-            error_message="",
-        )
-
-        excel_path = str(Path(settings.BASE_DIR) / subject.dataset_path)
+        excel_path = jobs.dataset_path(subject)
 
-        # Parsear códigos
-        tokens = []
-        for part in codes_raw.replace("\n", " ").replace(",", " ").split(" "):
-            t = part.strip()
-            if t:
-                tokens.append(t)
+        # Parsear y validar ya (errores de códigos al momento); el Excel lo genera un worker
+        tokens = split_code_input(codes_raw)
 
         if not tokens:
             return render_error("No has indicado códigos válidos.")
 
-        # Core
-        data = cargar_datos(excel_path)
-        tokens = normalize_codes(tokens, data)
-
-        res = generate_from_excel(excel_path, tokens)
+        normalize_codes(tokens, cargar_datos(excel_path))
 
-        # Guardar archivo
-        timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
-        stored_filename = f"{subject_code}_{request.user.username}_{timestamp}.xlsx"
-        job.output_file.save(stored_filename, ContentFile(res.excel_bytes), save=False)
-
-        job.status = ExportJob.Status.SUCCESS
-        job.error_message = ""
-        job.save()
-        _prune_export_jobs(request.user)
-
-        # Descarga inmediata
-        download_filename = f"relaciones_{subject_code}.xlsx"
-        response = HttpResponse(
-            res.excel_bytes,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = f'attachment; filename="{download_filename}"'
-        return response
+        job = jobs.enqueue_export(request.user, subject, codes_raw)
+        return redirect("generator:export_detail", job_id=job.id)
 
     except NormalizationError as e:
         return render_error(str(e))
@@ -303,12 +214,44 @@ def export_by_subject(request):
         return render_error(str(e))
 
 
+@login_required
+@require_POST
+def export_bulk(request):
+    """
+    ZIP con un Excel por CE, por CEv o por bloque de SSBB de la asignatura.
+    Se genera en un pool de procesos y se envía según se escribe (streaming).
+    """
+    subject_code = (request.POST.get("subject_code") or "").strip()
+    grouping = (request.POST.get("grouping") or "").strip().lower()
+
+    if not subject_code:
+        return HttpResponseBadRequest("Falta asignatura (subject_code).")
+    if grouping not in bulk.AGRUPACIONES:
+        return HttpResponseBadRequest(f"Agrupación no válida. Opciones: {', '.join(bulk.AGRUPACIONES)}")
+
+    subject = require_subject_access(request.user, subject_code)
+    if not subject.dataset_path:
+        return HttpResponseBadRequest("Esta asignatura no tiene dataset configurado.")
+
+    response = StreamingHttpResponse(
+        bulk.iter_zip(
+            jobs.dataset_path(subject),
+            grouping,
+            workers=settings.EXPORT_BULK_WORKERS,
+            nombre_base=subject.code,
+        ),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f'attachment; filename="export_{subject.code}_{grouping}.zip"'
+    return response
+
+
 @login_required
 def my_exports(request):
     qs = (
         ExportJob.objects
-        .select_related("subject")
-        .filter(user=request.user, status=ExportJob.Status.SUCCESS)
+        .select_related("subject", "blob")
+        .filter(user=request.user, status__in=[ExportJob.Status.SUCCESS, *ExportJob.ACTIVE_STATUSES])
         .order_by("-created_at")
     )
 
@@ -341,13 +284,13 @@ def download_export(request, job_id: int):
     except ExportJob.DoesNotExist:
         raise Http404("No existe")
 
-    if job.status != "SUCCESS" or not job.output_file:
+    if job.status != "SUCCESS" or not job.export_file:
         raise Http404("No disponible")
 
     return FileResponse(
-        job.output_file.open("rb"),
+        job.export_file.open("rb"),
         as_attachment=True,
-        filename=job.output_file.name.split("/")[-1],
+        filename=job.download_name,
     )
 
 def tables_view(request):
@@ -393,12 +336,52 @@ def tables_view(request):
         "options": [],
         "has_subject": False,
         "has_selection": False,
+        "parquet_available": export_formats.parquet_disponible(),
     }
     return render(request, "generator/tables.html", ctx)
 
 @login_required
 def export_detail(request, job_id: int):
-    return HttpResponse("export_detail pendiente", content_type="text/plain")
+    job = _get_user_job(request.user, job_id)
+    return render(request, "generator/export_detail.html", _export_status_ctx(job))
+
+
+@login_required
+@require_GET
+def export_status(request, job_id: int):
+    """
+    Estado del job para el polling: fragmento HTML (HTMX) que se repinta cada
+    pocos segundos mientras está en cola y pasa a la descarga al terminar, o
+    JSON con ?format=json.
+    """
+    job = _get_user_job(request.user, job_id)
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "id": job.id,
+            "status": job.status,
+            "done": not job.is_active,
+            "error": job.error_message if job.status == ExportJob.Status.FAILED else "",
+            "download_url": (
+                reverse("generator:download_export", args=[job.id])
+                if job.status == ExportJob.Status.SUCCESS and job.export_file else ""
+            ),
+        })
+    return render(request, "generator/_export_status.html", _export_status_ctx(job))
+
+
+def _export_status_ctx(job: ExportJob) -> dict:
+    # Los errores de códigos se enseñan siempre; los tracebacks solo en DEBUG
+    detalle = job.error_message
+    if detalle.startswith("Traceback") and not settings.DEBUG:
+        detalle = ""
+    return {"job": job, "error_detail": detalle}
+
+
+def _get_user_job(user, job_id: int) -> ExportJob:
+    try:
+        return ExportJob.objects.select_related("subject", "blob").get(id=job_id, user=user)
+    except ExportJob.DoesNotExist:
+        raise Http404("No existe")
 
 def _parse_bool_checkbox(post, name: str) -> bool:
     # En HTML, si el checkbox no está marcado, no viene en POST
@@ -457,14 +440,11 @@ def tables_render(request):
         })
 
     data = cargar_datos(subject.dataset_path)
-    codigos_df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-    codigos_df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-
-    code_to_type = {}
-    for c, t in zip(codigos_df["Código"].astype(str), codigos_df["Tipo"].astype(str)):
-        code_to_type[str(c).strip().rstrip(".")] = str(t).strip()
+    code_to_type = get_catalog(data).code_to_type
 
-    demo_allowed = _get_demo_allowed_codes(codigos_df, DEMO_MAX_CODES_PER_TYPE) if demo_mode else None
+    demo_allowed = None
+    if demo_mode:
+        demo_allowed = get_catalog(data).demo_allowed(DEMO_MAX_CODES_PER_TYPE)
     has_selection = has_subject and bool(selected_codes)
 
     table1 = table2_ssbb = table2_ce = table2_cev = table2_do = table3 = None
@@ -477,6 +457,8 @@ def tables_render(request):
                 subject.dataset_path,
                 selected_codes,
                 build_excel=False,
+                # la vista "solo tabla 2" únicamente pinta SSBB y CEv
+                tables=("tabla2_ssbb", "tabla2_cev") if only_table2 else None,
             )
 
             tabla2_ssbb_display = marcar_seleccion_tabla2(res.tabla2_ssbb, selected_codes)
@@ -578,63 +560,44 @@ def tables_export(request):
     if demo_mode:
         return HttpResponse("Disponible con acceso. Envía un email a pabcadmon@gmail.com para más información.", status=403)
 
-    job = ExportJob.objects.create(
-        user=request.user,
-        subject=subject,
-        status="PENDING",
-        codes_raw="\n".join(codes),
-    )
-
-    try:
-        # ⚠️ IMPORTANTÍSIMO: dataset_path suele ser relativo ("data/GEH.xlsx").
-        # Asegura ruta absoluta:
-        dataset_path = subject.dataset_path
-        if not dataset_path:
-            raise RuntimeError("Subject.dataset_path está vacío.")
-
-        if not dataset_path.startswith("/"):
-            dataset_path = str(settings.BASE_DIR / dataset_path)
-
-        result = generate_from_excel(dataset_path, codes)  # si aquí revienta, lo veremos
-
-        excel_bytes = getattr(result, "excel_bytes", None)
-        if not excel_bytes:
-            raise RuntimeError("generate() no devolvió excel_bytes (vacío o None).")
+    if not subject.dataset_path:
+        return HttpResponse("Esta asignatura no tiene dataset configurado.", status=400)
 
-        filename = f"export_{subject.code}_{timezone.now().strftime('%Y-%m-%d_%H-%M')}.xlsx"
-
-        job.output_file.save(filename, ContentFile(excel_bytes), save=False)
-        job.status = "SUCCESS"
-        job.error_message = ""
-        job.save()
-        _prune_export_jobs(request.user)
-
-        resp = HttpResponse(
-            excel_bytes,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return resp
+    formato = (request.POST.get("format") or "xlsx").strip().lower()
+    if formato not in export_formats.FORMATOS:
+        return HttpResponse(f"Formato no válido. Opciones: {', '.join(export_formats.FORMATOS)}", status=400)
 
-    except Exception:
-        tb = traceback.format_exc()
-        print(tb)  # <-- verás el error real en consola
+    if formato == "xlsx":
+        # El Excel lo genera un worker (manage.py run_export_workers); la página del
+        # job consulta el estado y pasa a la descarga cuando termina
+        job = jobs.enqueue_export(request.user, subject, "\n".join(codes))
+        return redirect("generator:export_detail", job_id=job.id)
 
-        job.status = "FAILED"
-        job.error_message = tb[:8000]  # evita reventar por tamaño
-        job.save()
+    # Formatos de datos: solo las tablas (sin Excel), escritas según se envían
+    if formato == "parquet" and not export_formats.parquet_disponible():
+        return HttpResponse("El formato parquet no está disponible en este servidor.", status=400)
 
-        # en dev, mejor devolver el traceback para arreglar rápido
-        if getattr(settings, "DEBUG", False):
-            return HttpResponse(tb, status=500, content_type="text/plain")
+    excel_path = jobs.dataset_path(subject)
+    try:
+        codes = normalize_codes(split_code_input("\n".join(codes)), cargar_datos(excel_path))
+    except NormalizationError as e:
+        return HttpResponse(str(e), status=400)
+    res = generate_from_excel(excel_path, codes, build_excel=False)
 
-        return HttpResponse("Error generando el Excel.", status=500)
+    content_type, extension = export_formats.TIPOS[formato]
+    response = StreamingHttpResponse(export_formats.iter_formato(res.tablas(), formato), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="tablas_{subject.code}_{timezone.localdate():%Y-%m-%d}.{extension}"'
+    )
+    return response
 
 @require_POST
 def tables_search(request):
     subject_id = (request.POST.get("subject_id") or "").strip()
     q = (request.POST.get("q") or "").strip()
     mode = (request.POST.get("mode") or "").strip()
+    # "codes": código / etiqueta; "text": texto libre sobre las descripciones
+    search_in = (request.POST.get("search_in") or "codes").strip()
 
     selected_codes = [c.strip() for c in request.POST.getlist("codes") if c.strip()]
     selected_set = set([_normalize_code(c) for c in selected_codes])
@@ -648,62 +611,21 @@ def tables_search(request):
 
     if has_subject:
         data = cargar_datos(subject.dataset_path)
-        df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-
-        cod = df["Código"].astype(str)
-        lab = df["Etiqueta"].astype(str)
+        catalogo = get_catalog(data)
 
-        out = []
         max_results = None if demo_mode else 50
-        demo_allowed = _get_demo_allowed_codes(df, DEMO_MAX_CODES_PER_TYPE) if demo_mode else None
-
-        if q:
-            q_low = q.lower()
-
-            starts = df[cod.str.lower().str.startswith(q_low)]
-            contains = df[~cod.str.lower().str.startswith(q_low) & cod.str.lower().str.contains(q_low)]
-            label_contains = df[
-                ~cod.str.lower().str.contains(q_low) &
-                lab.str.lower().str.contains(q_low)
-            ]
-
-            starts = _sort_df_by_codigo_natural(starts)
-            contains = _sort_df_by_codigo_natural(contains)
-            label_contains = _sort_df_by_codigo_natural(label_contains)
-
-            for part in (starts, contains, label_contains):
-                for _, row in part.iterrows():
-                    out.append({
-                        "code": str(row["Código"]),
-                        "label": str(row["Etiqueta"]),
-                        "tipo": str(row["Tipo"]),
-                    })
-                    if max_results is not None and len(out) >= max_results:
-                        break
-                if max_results is not None and len(out) >= max_results:
-                    break
-
+        demo_allowed = catalogo.demo_allowed(DEMO_MAX_CODES_PER_TYPE) if demo_mode else None
+
+        # Código que empieza por q, código que contiene q, etiqueta que contiene q;
+        # sin q -> mostrar TODO (o un máximo alto, para no matar el render si hay miles)
+        max_all = None if demo_mode else 500
+        index = catalogo.search_index()
+        if q and search_in == "text":
+            # Ranking BM25; dentro de cada tipo se mantiene el orden por relevancia
+            posiciones = (index.position(c) for c in search_descriptions(data, q, max_results))
+            groups = index.group(p for p in posiciones if p is not None)
         else:
-            # 🔥 NUEVO: sin query -> mostrar TODO (o un máximo alto)
-            df_all = _sort_df_by_codigo_natural(df)
-            print(df_all)
-
-            # si quieres "todo todo", quita el límite o súbelo
-            MAX_ALL = None if demo_mode else 500  # recomendado para no matar el render si hay miles
-            for _, row in df_all.iterrows():
-                out.append({
-                    "code": str(row["Código"]),
-                    "label": str(row["Etiqueta"]),
-                    "tipo": str(row["Tipo"]),
-                })
-                if MAX_ALL is not None and len(out) >= MAX_ALL:
-                    break
-
-        # agrupar por tipo
-        for item in out:
-            t = item.get("tipo")
-            if t in groups:
-                groups[t].append(item)
+            groups = index.search(q, max_results if q else max_all)
 
         if demo_mode and demo_allowed is not None:
             for items in groups.values():
@@ -723,6 +645,7 @@ def tables_search(request):
         "has_subject": has_subject,
         "q": q,
         "mode": mode,
+        "search_in": search_in,
         "groups_cols": groups_cols,
         "selected_codes": selected_codes,
         "is_full_list": has_subject and not q,   # opcional para el template
@@ -743,6 +666,22 @@ def _chunk_list_even(items, max_cols: int):
     per_col = (len(items) + cols - 1) // cols
     return _chunk_list(items, per_col)
 
+def _prewarm_delta(subject, codes_previos, added=None, removed=None):
+    """
+    Si la selección anterior ya está en la caché de resultados, deriva la nueva
+    de forma incremental y la deja en caché para el tables_render que sigue.
+    """
+    if subject is None:
+        return
+    try:
+        previo = peek_result(subject.dataset_path, codes_previos)
+        if previo is not None:
+            generate_delta(subject.dataset_path, previo, added=added, removed=removed)
+    except Exception:
+        # es solo un adelanto: si falla, tables_render lo calcula entero
+        logger.exception("No se pudo adelantar la selección de %s", subject)
+
+
 @require_POST
 def tables_selected_add(request):
     code = (request.POST.get("code") or "").strip()
@@ -753,8 +692,7 @@ def tables_selected_add(request):
 
     if demo_mode and subject and code and code not in codes:
         data = cargar_datos(subject.dataset_path)
-        df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-        allowed = _get_demo_allowed_codes(df, DEMO_MAX_CODES_PER_TYPE)
+        allowed = get_catalog(data).demo_allowed(DEMO_MAX_CODES_PER_TYPE)
         if _normalize_code(code) not in allowed:
             response = render(request, "generator/_selected_codes.html", {"selected_codes": codes})
             response["HX-Trigger-After-Settle"] = "codesChanged"
@@ -769,6 +707,7 @@ def tables_selected_add(request):
         return response
 
     if code and code not in codes:
+        _prewarm_delta(subject, codes, added=code)
         codes.append(code)
 
     response = render(request, "generator/_selected_codes.html", {"selected_codes": codes})
@@ -781,6 +720,11 @@ def tables_selected_remove(request):
     code = (request.POST.get("code") or "").strip()
     codes = [c.strip() for c in request.POST.getlist("codes") if c.strip()]
 
+    if code in codes:
+        subject_id = (request.POST.get("subject_id") or "").strip()
+        subject, demo_mode, demo_subject = _resolve_subject(request.user, subject_id)
+        _prewarm_delta(subject, codes, removed=code)
+
     codes = [c for c in codes if c != code]
 
     response = render(request, "generator/_selected_codes.html", {"selected_codes": codes})
@@ -1113,27 +1057,11 @@ def secuenciacion_analyze(request):
 
     # 1) Universo desde Excel: todos los SSBB y CEv de esa asignatura
     data = cargar_datos(subject.dataset_path)
-    df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-
-    # Normaliza a strings seguros
-    df["Código"] = df["Código"].astype(str)
-    df["Etiqueta"] = df["Etiqueta"].astype(str)
-    df["Tipo"] = df["Tipo"].astype(str)
-
-    # Solo SSBB y CEv
-    df_ssbb = df[df["Tipo"] == "SSBB"]
-    df_cev = df[df["Tipo"] == "CEv"]
-
-    # Mapa code -> label
-    all_ssbb = {}
-    for _, row in df_ssbb.iterrows():
-        code = str(row["Código"]).strip().rstrip(".")
-        all_ssbb[code] = str(row["Etiqueta"])
+    catalogo = get_catalog(data)
 
-    all_cev = {}
-    for _, row in df_cev.iterrows():
-        code = str(row["Código"]).strip().rstrip(".")
-        all_cev[code] = str(row["Etiqueta"])
+    # Solo SSBB y CEv: mapa code -> label
+    all_ssbb = {_normalize_code(i["code"]): i["label"] for i in catalogo.items_by_type["SSBB"]}
+    all_cev = {_normalize_code(i["code"]): i["label"] for i in catalogo.items_by_type["CEv"]}
 
     # 2) Lo usado por el usuario (repartido entre unidades)
     used_ssbb_counts = {}
@@ -1157,8 +1085,8 @@ def secuenciacion_analyze(request):
     missing_cev_codes = [c for c in all_cev.keys() if c not in used_cev_counts]
 
     # Orden natural (reusa tu helper)
-    missing_ssbb_codes = sorted(missing_ssbb_codes, key=natural_sort_key)
-    missing_cev_codes = sorted(missing_cev_codes, key=natural_sort_key)
+    missing_ssbb_codes = natural_sorted(missing_ssbb_codes, data.orden_natural)
+    missing_cev_codes = natural_sorted(missing_cev_codes, data.orden_natural)
 
     missing_ssbb = [{"code": c, "label": all_ssbb.get(c, "")} for c in missing_ssbb_codes]
     missing_cev = [{"code": c, "label": all_cev.get(c, "")} for c in missing_cev_codes]
@@ -1206,20 +1134,51 @@ def secuenciacion_codes(request):
     if subject is None:
         return JsonResponse({"ok": False, "error": "Asignatura no válida o sin acceso."}, status=404)
 
-    data = cargar_datos(subject.dataset_path)
-    df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
-    df_all = _sort_df_by_codigo_natural(df)
+    catalogo = get_catalog(cargar_datos(subject.dataset_path))
+    return JsonResponse({"ok": True, "ssbb": catalogo.items_by_type["SSBB"], "cev": catalogo.items_by_type["CEv"]})
 
-    ssbb = []
-    cev = []
 
-    for _, row in df_all.iterrows():
-        t = str(row["Tipo"])
-        item = {"code": str(row["Código"]), "label": str(row["Etiqueta"])}
-        if t == "SSBB":
-            ssbb.append(item)
-        elif t == "CEv":
-            cev.append(item)
 
-    return JsonResponse({"ok": True, "ssbb": ssbb, "cev": cev})
+@login_required
+@require_GET
+def secuenciacion_hierarchy(request):
+    """
+    GET ?subject_id=..&code=..  (p.ej. code=1.A o code=2)
+    Devuelve el padre de `code` y los códigos que cuelgan de él:
+    {"ok": true, "code": "1.A", "parent": "1", "children": [...], "descendants": [...]}
+    con items {"code", "tipo"} en orden natural (en demo, los que no se pueden
+    usar llevan "demo_disabled": true).
+    """
+    subject_id = (request.GET.get("subject_id") or "").strip()
+    code = _normalize_code(request.GET.get("code"))
+    if not subject_id:
+        return JsonResponse({"ok": False, "error": "Falta subject_id."}, status=400)
+    if not code:
+        return JsonResponse({"ok": False, "error": "Falta code."}, status=400)
+
+    subject, demo_mode, demo_subject = _resolve_subject(request.user, subject_id)
+    if subject is None:
+        return JsonResponse({"ok": False, "error": "Asignatura no válida o sin acceso."}, status=404)
 
+    data = cargar_datos(subject.dataset_path)
+    jerarquia = data.jerarquia
+    catalogo = get_catalog(data)
+    code_to_type = catalogo.code_to_type
+    demo_allowed = catalogo.demo_allowed(DEMO_MAX_CODES_PER_TYPE) if demo_mode else None
+
+    def _items(codes):
+        items = []
+        for c in natural_sorted(codes, data.orden_natural):
+            item = {"code": c, "tipo": code_to_type.get(c, "Otro")}
+            if demo_allowed is not None:
+                item["demo_disabled"] = c not in demo_allowed
+            items.append(item)
+        return items
+
+    return JsonResponse({
+        "ok": True,
+        "code": code,
+        "parent": jerarquia.parent(code),
+        "children": _items(jerarquia.children(code)),
+        "descendants": _items(jerarquia.descendants(code)),
+    })
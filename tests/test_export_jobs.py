@@ -0,0 +1,189 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("django")
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    """Django con web.settings sobre un SQLite (fichero, para poder usarlo desde varios hilos) y MEDIA_ROOT temporales."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "web.settings")
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    django.setup()
+    carpeta = tmp_path_factory.mktemp("export_jobs")
+    settings.MEDIA_ROOT = str(carpeta / "media")
+    connection.settings_dict["TEST"]["NAME"] = str(carpeta / "test.sqlite3")
+    setup_test_environment()
+    nombre = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre, verbosity=0)
+        teardown_test_environment()
+
+
+@pytest.fixture
+def subject(db):
+    from django.contrib.auth.models import User
+    from django_apps.accounts.models import Subject
+    from django_apps.generator.models import ExportBlob, ExportJob
+
+    ExportJob.objects.all().delete()
+    ExportBlob.objects.all().delete()
+    user, _ = User.objects.get_or_create(username="profe")
+    subject, _ = Subject.objects.get_or_create(
+        code="geh1", defaults={"name": "GeH 1ESO", "dataset_path": "data/1ESO_GeH.xlsx"}
+    )
+    return user, subject
+
+
+def test_reclama_y_ejecuta_un_job(subject):
+    from django_apps.generator import jobs
+    from django_apps.generator.models import ExportJob
+
+    user, subject = subject
+    job = jobs.enqueue_export(user, subject, "CE1, CE2")
+    assert job.status == ExportJob.Status.PENDING
+
+    claimed = jobs.claim_next_job("w1")
+    assert claimed.id == job.id
+    assert claimed.status == ExportJob.Status.RUNNING and claimed.worker == "w1"
+    assert jobs.claim_next_job("w2") is None
+
+    jobs.run_export_job(claimed)
+    job.refresh_from_db()
+    assert job.status == ExportJob.Status.SUCCESS, job.error_message
+    assert job.blob.size > 1000
+    assert job.export_file.storage.exists(job.export_file.name)
+
+
+def test_dos_workers_no_reclaman_el_mismo_job(subject):
+    from django.db import connections
+    from django_apps.generator import jobs
+    from django_apps.generator.models import ExportJob
+
+    user, subject = subject
+    creados = {
+        ExportJob.objects.create(user=user, subject=subject, codes_raw="CE1", status=ExportJob.Status.PENDING).id
+        for _ in range(12)
+    }
+    salida = threading.Barrier(4)
+    reclamados = {}
+
+    def worker(nombre):
+        ids = []
+        salida.wait()
+        try:
+            while True:
+                job = jobs.claim_next_job(nombre)
+                if job is None:
+                    break
+                ids.append(job.id)
+        finally:
+            reclamados[nombre] = ids
+            connections.close_all()
+
+    hilos = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    todos = [i for ids in reclamados.values() for i in ids]
+    assert sorted(todos) == sorted(creados)
+    for nombre, ids in reclamados.items():
+        assert set(ExportJob.objects.filter(id__in=ids).values_list("worker", flat=True)) <= {nombre}
+    assert not ExportJob.objects.filter(status=ExportJob.Status.PENDING).exists()
+
+
+def test_reutiliza_el_blob_de_la_misma_exportacion(subject):
+    from django_apps.generator import jobs
+    from django_apps.generator.models import ExportBlob, ExportJob
+
+    user, subject = subject
+    primero = jobs.enqueue_export(user, subject, "CE1, CE2")
+    jobs.run_export_job(jobs.claim_next_job("w1"))
+    primero.refresh_from_db()
+    usado = primero.blob.last_used_at
+
+    # mismos códigos en otro orden: nace en SUCCESS con el mismo fichero, sin pasar por la cola
+    segundo = jobs.enqueue_export(user, subject, "CE2 CE1")
+    assert segundo.status == ExportJob.Status.SUCCESS
+    assert segundo.blob_id == primero.blob_id
+    assert ExportBlob.objects.count() == 1
+    assert ExportBlob.objects.get().last_used_at > usado
+    assert jobs.claim_next_job("w1") is None
+
+
+def test_encola_de_nuevo_si_el_blob_desaparece(subject, monkeypatch):
+    from django_apps.generator import jobs
+    from django_apps.generator.models import ExportBlob, ExportJob
+
+    user, subject = subject
+    jobs.enqueue_export(user, subject, "CE1")
+    jobs.run_export_job(jobs.claim_next_job("w1"))
+    blob = ExportBlob.objects.get()
+
+    # el GC lo borra entre find_blob y la creación del job
+    def find_blob(key):
+        ExportJob.objects.all().delete()
+        ExportBlob.objects.filter(id=blob.id).delete()
+        return blob
+
+    monkeypatch.setattr(jobs, "find_blob", find_blob)
+    job = jobs.enqueue_export(user, subject, "CE1")
+    assert job.status == ExportJob.Status.PENDING and job.blob_id is None
+
+
+def test_gc_borra_solo_blobs_sin_jobs_y_sin_uso_reciente(subject):
+    from datetime import timedelta
+
+    from django.core.files.base import ContentFile
+    from django.utils import timezone
+    from django_apps.generator import jobs
+    from django_apps.generator.models import ExportBlob, ExportJob
+
+    user, subject = subject
+    hace_un_dia = timezone.now() - timedelta(days=1)
+    blobs = {}
+    for nombre in ("con_job", "reciente", "viejo"):
+        blob = ExportBlob(key=nombre * 4, size=3)
+        blob.file.save(f"{nombre}.xlsx", ContentFile(b"xls"), save=False)
+        blob.save()
+        blobs[nombre] = blob
+    ExportBlob.objects.filter(key__in=["con_job" * 4, "viejo" * 4]).update(last_used_at=hace_un_dia)
+    ExportJob.objects.create(user=user, subject=subject, status=ExportJob.Status.SUCCESS, blob=blobs["con_job"])
+
+    assert jobs.gc_export_blobs(timedelta(hours=1), dry_run=True) == (1, 3)
+    assert jobs.gc_export_blobs(timedelta(hours=1)) == (1, 3)
+    assert set(ExportBlob.objects.values_list("key", flat=True)) == {"con_job" * 4, "reciente" * 4}
+    storage = blobs["viejo"].file.storage
+    assert not storage.exists(blobs["viejo"].file.name)
+    assert storage.exists(blobs["reciente"].file.name)
+
+
+def test_store_blob_no_reescribe_un_fichero_que_existe(subject):
+    from django_apps.generator import jobs
+
+    blob = jobs.store_blob("k" * 64, b"primero")
+    nombre, usado = blob.file.name, blob.last_used_at
+
+    # otro worker termina la misma exportación: se queda el fichero que ya hay
+    otro = jobs.store_blob("k" * 64, b"segundo")
+    assert otro.id == blob.id and otro.file.name == nombre
+    assert otro.last_used_at > usado
+    with otro.file.storage.open(nombre) as fh:
+        assert fh.read() == b"primero"
+
+    # si el fichero ha desaparecido, se vuelve a escribir
+    otro.file.storage.delete(nombre)
+    tercero = jobs.store_blob("k" * 64, b"tercero")
+    assert tercero.id == blob.id and tercero.size == len(b"tercero")
+    with tercero.file.storage.open(tercero.file.name) as fh:
+        assert fh.read() == b"tercero"
@@ -16,3 +16,143 @@ def test_generate_from_excel_genera_excel_bytes():
     assert "Tipo" in res.tabla1.columns
     assert "SB" in res.tabla2.columns
     assert "Elemento" in res.tabla3.columns
+
+
+def test_generate_from_excel_memoiza_resultados():
+    from core.engine.result_cache import LocalResultCache, configure_result_cache, result_cache_info
+
+    configure_result_cache(LocalResultCache(maxsize=4, ttl=60))
+    try:
+        data = cargar_datos("data/1ESO_GeH.xlsx")
+        ejemplo = str(data.ce_df["CE"].dropna().iloc[0])
+
+        res1 = generate_from_excel("data/1ESO_GeH.xlsx", [ejemplo], build_excel=False)
+        res2 = generate_from_excel("data/1ESO_GeH.xlsx", [ejemplo + "."], build_excel=False)
+        assert res2 is res1
+        assert result_cache_info().hits == 1
+        assert result_cache_info().misses == 1
+    finally:
+        configure_result_cache()
+
+
+def test_generate_delta_coincide_con_recalculo_completo():
+    import pandas as pd
+    from core.engine.generate import generate_delta
+
+    ruta = "data/1ESO_GeH.xlsx"
+    data = cargar_datos(ruta)
+    ces = sorted(data.ce_set)[:2]
+    sb = sorted(data.ssbb_set)[0]
+    do = sorted(data.do_set)[0]
+
+    # el primero parte de un resultado de generate_from_excel (sin estado); los demás encadenan
+    previo = generate_from_excel(ruta, ces, build_excel=False, use_cache=False)
+    pasos = [(sb, None), (None, ces[0]), (do, ces[1]), ("ZZZ9", None), (None, "ZZZ9"), (None, sb), (None, do), (ces[0], None)]
+    for added, removed in pasos:
+        delta = generate_delta(ruta, previo, added=added, removed=removed, use_cache=False)
+        completo = generate_from_excel(ruta, delta.seleccionados, build_excel=False, use_cache=False)
+        assert delta.seleccionados == completo.seleccionados
+        for nombre, tabla in completo.tablas().items():
+            pd.testing.assert_frame_equal(getattr(delta, nombre), tabla, obj=nombre)
+        previo = delta
+
+
+def test_generate_from_excel_solo_las_tablas_pedidas():
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    seleccion = sorted(data.ce_set)[:2] + sorted(data.ssbb_set)[:2]
+
+    completo = generate_from_excel("data/1ESO_GeH.xlsx", seleccion, build_excel=False, use_cache=False)
+    parcial = generate_from_excel(
+        "data/1ESO_GeH.xlsx", seleccion, build_excel=False, use_cache=False,
+        tables=("tabla2_ssbb", "tabla2_cev"),
+    )
+    assert parcial.tabla2_ssbb.equals(completo.tabla2_ssbb)
+    assert parcial.tabla2_cev.equals(completo.tabla2_cev)
+    assert parcial.tabla1.empty and parcial.tabla2_ce.empty and parcial.tabla3.empty
+    for nombre in ("tabla1", "tabla2_ce", "tabla2_do", "tabla3"):
+        assert list(getattr(parcial, nombre).columns) == list(getattr(completo, nombre).columns), nombre
+
+
+def test_exportar_excel_escribe_en_destino(tmp_path):
+    from openpyxl import load_workbook
+    from utils.export import exportar_excel
+
+    res = generate_from_excel("data/1ESO_GeH.xlsx", ["1", "GEH.1.A.1"], build_excel=False)
+    destino = tmp_path / "out.xlsx"
+    tablas = (res.tabla1, res.tabla2_ssbb, res.tabla2_ce, res.tabla2_cev, res.tabla2_do, res.tabla3)
+    assert exportar_excel(*tablas, res.seleccionados, destino=str(destino)) == str(destino)
+
+    libro = load_workbook(destino)
+    assert libro.sheetnames == ["Relaciones por tipo", "Relaciones individuales", "Descr. de elementos mostrados"]
+    hoja = libro["Relaciones individuales"]
+    assert [c.value for c in hoja[1]] == list(res.tabla2_ssbb.columns)
+    assert hoja.cell(row=len(res.tabla2_ssbb) + 4, column=1).value == "Tabla 3: CE relacionados"
+    assert libro["Descr. de elementos mostrados"].column_dimensions["C"].width > 20
+
+
+def test_exportar_excel_escribe_titulos_de_tablas_sin_columnas(tmp_path):
+    import pandas as pd
+    from openpyxl import load_workbook
+    from utils.export import exportar_excel
+
+    ssbb = pd.DataFrame({"SB": ["GEH.1.A.1"], "CE": ["1"], "CEv": [""], "DO": [""]})
+    una = pd.DataFrame({"CE": ["1"]})
+    destino = tmp_path / "out.xlsx"
+    exportar_excel(pd.DataFrame(), ssbb, una, pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), ["1"], destino=str(destino))
+
+    valores = [c.value for c in load_workbook(destino)["Relaciones individuales"]["A"]]
+    for titulo in ("Tabla 3: CE relacionados", "Tabla 4: CEv relacionados", "Tabla 5: DO relacionados"):
+        assert titulo in valores
+
+
+def test_bulk_zip_un_libro_por_grupo(tmp_path):
+    import zipfile
+    from core.engine import bulk
+    from core.loader import cargar_datos
+
+    data = cargar_datos("data/1ESO_LyL.xlsx")
+    assert [n for n, _ in bulk.grupos(data, "ssbb")] == ["LCL.1.A", "LCL.1.B", "LCL.1.C", "LCL.1.D"]
+
+    destino = tmp_path / "ce.zip"
+    bulk.write_zip("data/1ESO_LyL.xlsx", "ce", destino, workers=2, nombre_base="lyl")
+    with zipfile.ZipFile(destino) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [f"lyl_CE{c}.xlsx" for c in sorted(data.ce_set, key=int)]
+
+
+def test_formatos_csv_y_ndjson():
+    import io
+    import json
+    import zipfile
+    from utils.export_formats import iter_formato
+
+    tablas = generate_from_excel("data/1ESO_GeH.xlsx", ["1", "GEH.1.A.1"], build_excel=False).tablas()
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(iter_formato(tablas, "csv")))) as zf:
+        assert zf.namelist() == [f"{n}.csv" for n in tablas]
+        cabecera = zf.read("tabla2_ce.csv").decode("utf-8").splitlines()[0]
+        assert cabecera == ",".join(tablas["tabla2_ce"].columns)
+
+    lineas = [json.loads(l) for l in b"".join(iter_formato(tablas, "ndjson")).decode("utf-8").splitlines()]
+    assert len(lineas) == sum(len(df) for df in tablas.values())
+    assert lineas[0] == {"tabla": "tabla1", **tablas["tabla1"].iloc[0].to_dict()}
+
+
+def test_exportar_excel_une_fragmentos_del_mismo_formato():
+    from openpyxl import load_workbook
+    from openpyxl.cell.rich_text import CellRichText
+    from utils.export import exportar_excel
+
+    res = generate_from_excel("data/1ESO_GeH.xlsx", ["1", "GEH.1.A.1"], build_excel=False)
+    tablas = (res.tabla1, res.tabla2_ssbb, res.tabla2_ce, res.tabla2_cev, res.tabla2_do, res.tabla3)
+    libro = load_workbook(exportar_excel(*tablas, res.seleccionados), rich_text=True)
+
+    ricas = [
+        c.value for hoja in libro.worksheets for fila in hoja.iter_rows() for c in fila
+        if isinstance(c.value, CellRichText)
+    ]
+    assert ricas
+    for valor in ricas:
+        negritas = [bool(p.font.b) if hasattr(p, "font") else False for p in valor]
+        assert all(a != b for a, b in zip(negritas, negritas[1:]))
+    assert "GEH.1.A.1, GEH.1.A.5" in {str(v) for v in ricas}
@@ -13,7 +13,69 @@ def test_cargar_datos_devuelve_secuenciaciondata():
 
     # relaciones_long mínimas
     assert set(["SB", "Tipo", "Codigo"]).issubset(set(data.relaciones_long.columns))
+    assert list(data.relaciones_long["Tipo"].cat.categories) == ["CE", "CEV"]
+    assert not data.relaciones_long["Codigo"].str.endswith(".").any()
 
     # sets creados
     assert hasattr(data, "ce_set")
     assert hasattr(data, "ssbb_set")
+
+
+def test_cargar_datos_cachea_por_fichero(tmp_path):
+    import shutil
+    from core.loader import invalidar_cache, info_cache
+
+    ruta = tmp_path / "GeH.xlsx"
+    shutil.copy("data/1ESO_GeH.xlsx", ruta)
+
+    antes = info_cache()
+    data1 = cargar_datos(str(ruta))
+    data2 = cargar_datos(str(ruta))
+    assert data1 is data2
+    assert info_cache().hits == antes.hits + 1
+
+    invalidar_cache(str(ruta))
+    assert cargar_datos(str(ruta)) is not data1
+
+
+def test_cargar_datos_usa_snapshot_compilado(tmp_path):
+    import shutil
+    from core import snapshot
+    from core.loader import compilar_dataset
+
+    ruta = tmp_path / "GeH.xlsx"
+    shutil.copy("data/1ESO_GeH.xlsx", ruta)
+
+    destino = compilar_dataset(str(ruta))
+    assert destino == snapshot.ruta_snapshot(str(ruta))
+    assert destino.exists()
+
+    data = cargar_datos(str(ruta), use_cache=False)
+    original = cargar_datos(str(ruta), use_cache=False, use_snapshot=False)
+    assert data.ce_set == original.ce_set
+    assert data.descripciones == original.descripciones
+    assert data.relaciones_long.equals(original.relaciones_long)
+
+
+def test_motor_openpyxl_equivale_a_lectura_por_hoja():
+    import pandas as pd
+
+    ref = cargar_datos("data/1ESO_GeH.xlsx", use_cache=False, use_snapshot=False, engine="pandas")
+    data = cargar_datos("data/1ESO_GeH.xlsx", use_cache=False, use_snapshot=False, engine="openpyxl")
+
+    pd.testing.assert_frame_equal(data.relaciones_long, ref.relaciones_long)
+    pd.testing.assert_frame_equal(data.ce_do_exp, ref.ce_do_exp)
+    assert data.descripciones == ref.descripciones
+
+
+def test_catalogo_de_codigos():
+    from core.engine.codes import build_codigos_df
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    catalogo = data.catalogo
+    df = build_codigos_df(data.ssbb_df, data.ce_df, data.cev_df, data.do_df)
+
+    assert catalogo.frame["Código"].tolist() == df["Código"].tolist()
+    assert catalogo.code_to_type == dict(zip(df["Código"], df["Tipo"]))
+    assert catalogo.codes_by_type["CE"] == df[df["Tipo"] == "CE"]["Código"].tolist()
+    assert catalogo.demo_allowed(2) == {c for t in ("SSBB", "CE", "CEv", "DO") for c in catalogo.codes_by_type[t][:2]}
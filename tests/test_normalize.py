@@ -5,3 +5,54 @@ def test_normalize_ce_prefix():
     data = cargar_datos("data/1ESO_GeH.xlsx")
     out = normalize_codes(["CE1"], data)
     assert out[0] == "1"
+
+
+def test_normalize_atajo_ssbb_y_sugerencias():
+    import pytest
+    from core.engine.normalize import NormalizationError
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    assert normalize_codes(["A.1", "GEH.1.A.1."], data) == ["GEH.1.A.1", "GEH.1.A.1"]
+
+    with pytest.raises(NormalizationError) as e:
+        normalize_codes(["CE1", "ccl1", "1.A.l", "GEH.1.A.99"], data)
+    assert e.value.suggestions["ccl1"][0] == "CCL1"
+    assert e.value.suggestions["1.A.l"][0] == "GEH.1.A.1"
+    assert "CE1" not in e.value.suggestions
+    assert "¿Quisiste decir" in str(e.value)
+
+
+def test_normalize_expande_comodines_y_rangos():
+    import pytest
+    from core.engine.normalize import NormalizationError, split_code_input
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    assert split_code_input("CEv 2.*, CE1 - CE4\n1.A.*") == ["CEv2.*", "CE1-CE4", "1.A.*"]
+
+    assert normalize_codes(["CE1-CE4"], data) == ["1", "2", "3", "4"]
+    assert normalize_codes(["CE1-4"], data) == ["1", "2", "3", "4"]
+    assert normalize_codes(["A.1-3"], data) == ["GEH.1.A.1", "GEH.1.A.2", "GEH.1.A.3"]
+    assert normalize_codes(["1.A.*"], data) == sorted(
+        (c for c in data.ssbb_set if c.startswith("GEH.1.A.")), key=lambda c: int(c.rsplit(".", 1)[1])
+    )
+    assert all(c.startswith("2.") and c in data.cev_set for c in normalize_codes(["CEv2.*"], data))
+
+    with pytest.raises(NormalizationError, match="mismo tipo"):
+        normalize_codes(["1-CCL2"], data)
+    with pytest.raises(NormalizationError, match="máximo 5"):
+        normalize_codes(["GEH.*"], data, max_expand=5)
+
+
+def test_normalize_rangos_con_prefijo_en_los_dos_extremos():
+    import pytest
+    from core.engine.normalize import NormalizationError, split_code_input
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    assert split_code_input("CE 1 - CE 3") == ["CE1-CE3"]
+    assert split_code_input("CEv 2.*") == ["CEv2.*"]
+    assert normalize_codes(split_code_input("CE 1 - CE 3"), data) == ["1", "2", "3"]
+
+    with pytest.raises(NormalizationError, match="mismo tipo y bloque"):
+        normalize_codes(["CCL1-CE3"], data)
+    with pytest.raises(NormalizationError, match="mismo tipo y bloque"):
+        normalize_codes(["CE1-CEv3"], data)
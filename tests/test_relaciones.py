@@ -0,0 +1,76 @@
+from core.loader import cargar_datos
+
+
+def test_relation_index_equivale_a_filtrar_relaciones_long():
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    idx = data.relation_index
+    rl = data.relaciones_long
+    ces = sorted(data.ce_set)[:3]
+
+    esperado = rl[(rl["Tipo"] == "CE") & rl["Codigo"].isin(ces)]["SB"].unique().tolist()
+    assert idx.sb_for_ce(ces) == esperado
+
+    sbs = esperado[:5]
+    esperado = rl[rl["SB"].isin(sbs)]["Codigo"].unique().tolist()
+    assert idx.code_for_sb(sbs) == esperado
+
+    cev = data.cev_df["Número"]
+    esperado = cev[cev.str.startswith(tuple(c + "." for c in ces))].unique().tolist()
+    assert idx.cev_for_ce(ces) == esperado
+
+
+def test_code_hierarchy_hijos_y_padre():
+    from core.engine.hierarchy import CodeHierarchy
+
+    h = CodeHierarchy(["1", "1.1", "1.2", "1.10", "1.1.1", "10", "10.1", "2.1"])
+    assert h.descendants("1") == ["1.1", "1.2", "1.10", "1.1.1"]
+    assert h.children("1") == ["1.1", "1.2", "1.10"]
+    assert h.descendants("10") == ["10.1"]
+    assert h.parent("1.1.1") == "1.1"
+    assert h.parent("2.1") is None
+
+
+def test_motor_csr_equivale_al_de_pandas():
+    from core.engine.generate import generate_from_excel
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    seleccion = sorted(data.ce_set)[:2] + sorted(data.ssbb_set)[:2] + sorted(data.do_set)[:1]
+
+    a = generate_from_excel("data/1ESO_GeH.xlsx", seleccion, build_excel=False, use_cache=False, engine="pandas")
+    b = generate_from_excel("data/1ESO_GeH.xlsx", seleccion, build_excel=False, use_cache=False, engine="csr")
+    for nombre in ("tabla1", "tabla2_ssbb", "tabla2_ce", "tabla2_cev", "tabla2_do", "tabla3"):
+        assert getattr(a, nombre).reset_index(drop=True).equals(getattr(b, nombre).reset_index(drop=True)), nombre
+
+    comp = data.compact_index
+    assert comp.sb_to_ce.indices.dtype == "int32"
+    assert sorted(comp.sb_for_ce(seleccion[:2])) == sorted(data.relation_index.sb_for_ce(seleccion[:2]))
+
+
+def test_cierre_tabla3_equivale_a_expandir_la_seleccion():
+    from core.relaciones import relacionados_tabla3
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    codigos = sorted(data.descripciones)
+    for seleccion in ([], codigos[:1], codigos[::7], codigos[3:9] + ["no-existe"]):
+        assert data.cierre_tabla3.related(seleccion) == relacionados_tabla3(seleccion, data.relation_index)
+
+
+def test_filas_tabla2_precalculadas_equivalen_a_fila_a_fila():
+    from core.relaciones import TABLAS2
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    idx = data.relation_index
+    for nombre, (columna, _, fila) in TABLAS2.items():
+        filas = data.filas_tabla2[nombre]
+        for codigo, pos in filas.pos.items():
+            assert filas.frame.iloc[pos].to_dict() == fila(codigo, idx), (nombre, codigo)
+
+
+def test_natural_order_rangos_densos():
+    from core.engine.sort import NaturalOrder, natural_sort_key
+
+    orden = NaturalOrder(["1.10", "1.2", "1.a", "1.A", "10", "2"])
+    assert orden.ranks["1.a"] == orden.ranks["1.A"]
+    assert orden.sorted(["10", "1.10", "2", "1.2"]) == ["1.2", "1.10", "2", "10"]
+    # códigos fuera del dataset: se ordena con natural_sort_key
+    assert orden.sorted(["10", "3", "2"]) == sorted(["10", "3", "2"], key=natural_sort_key)
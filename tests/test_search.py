@@ -0,0 +1,44 @@
+from core.loader import cargar_datos
+
+
+def test_indice_de_busqueda_por_niveles():
+    from core.engine.search import CodeSearchIndex
+
+    items = [
+        {"code": c, "label": f"{t} | {c}", "tipo": t}
+        for c, t in [("1", "CE"), ("1.1", "CEv"), ("2.1", "CEv"), ("CCL1", "DO"), ("GEH.1.A.1", "SSBB")]
+    ]
+    index = CodeSearchIndex(items)
+    # empieza por > contiene > etiqueta
+    assert [items[p]["code"] for p in index.positions("1")] == ["1", "1.1", "2.1", "CCL1", "GEH.1.A.1"]
+    assert [items[p]["code"] for p in index.positions(".1")] == ["1.1", "2.1", "GEH.1.A.1"]
+    assert [items[p]["code"] for p in index.positions("cev")] == ["1.1", "2.1"]
+    grupos = index.search("geh.1", limit=10)
+    assert [i["code"] for i in grupos["SSBB"]] == ["GEH.1.A.1"] and grupos["CE"] == []
+
+
+def test_busqueda_en_descripciones_sin_tildes():
+    from core.engine.fulltext import FullTextIndex, search_descriptions
+
+    data = cargar_datos("data/1ESO_GeH.xlsx")
+    assert data.indice_texto is not None
+    assert "GEH.1.C.5" in search_descriptions(data, "comunicacion")
+    assert "GEH.1.C.5" in search_descriptions(data, "PREVENCIÓN tecnolo")
+
+    index = FullTextIndex([("A", "La Revolución Francesa"), ("B", "revolución y revolución industrial"), ("C", "otra cosa")])
+    assert [c for c, _ in index.search("revolucion")] == ["B", "A"]
+    assert [c for c, _ in index.search("revol")] == ["B", "A"]   # último término como prefijo
+    assert [c for c, _ in index.search("revolucion francesa")][0] == "A"
+    assert index.search("revol ") == []
+
+
+def test_prefijo_se_queda_con_los_terminos_mas_frecuentes(monkeypatch):
+    from core.engine import fulltext
+
+    monkeypatch.setattr(fulltext, "PREFIX_MAX_TERMS", 2)
+    index = fulltext.FullTextIndex([
+        ("A", "revolcon"), ("B", "revolucion"), ("C", "revolucion revuelta"),
+        ("D", "revuelta"), ("E", "revolucion revuelta"), ("F", "revancha"),
+    ])
+    assert sorted(index._prefijo("re")) == ["revolucion", "revuelta"]
+    assert {c for c, _ in index.search("re")} == {"B", "C", "D", "E"}
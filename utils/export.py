@@ -1,223 +1,161 @@
 import io
-import pandas as pd
-
-def _write_tabla_with_formatting(sheet, tabla, seleccionados, bold_red, bold_black, normal):
-    """Helper para escribir una tabla con formato de seleccionados."""
-    tabla.to_excel(pd.ExcelWriter(pd.io.excel._get_writer(), engine='xlsxwriter').book, 
-                   sheet_name='temp', index=False)
-    
-    for col_num, col in enumerate(tabla.columns):
-        sheet.write(0, col_num, col, bold_black)
-
-    for row_num, row in enumerate(tabla.itertuples(index=False), start=1):
-        for col_num, cell in enumerate(row):
-            texto = str(cell).replace('»', '').replace('«', '')
-
-            if ',' in texto:
-                parts = [p.strip() for p in texto.split(',')]
-                rich = []
-                for i, part in enumerate(parts):
-                    fmt = bold_red if part in seleccionados else normal
-                    rich.append(fmt)
-                    rich.append(part)
-                    if i < len(parts) - 1:
-                        rich.append(normal)
-                        rich.append(', ')
-                sheet.write_rich_string(row_num, col_num, *rich)
-            else:
-                fmt = bold_red if texto in seleccionados else normal
-                sheet.write(row_num, col_num, texto, fmt)
-
-    for col_num, col in enumerate(tabla.columns):
-        valores = [str(col)] + tabla[col].astype(str).tolist()
-        sheet.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-
-def exportar_excel(tabla1, tabla2_ssbb, tabla2_ce, tabla2_cev, tabla2_do, tabla3, seleccionados):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        workbook = writer.book
-        bold_red = workbook.add_format({'bold': True, 'font_color': 'red'})
-        bold_black = workbook.add_format({'bold': True})
-        normal = workbook.add_format()
-
-        # --- Sheet 1: Relaciones por tipo ---
-        tabla1.to_excel(writer, sheet_name='Relaciones por tipo', index=False, startrow=1, header=False)
-        sheet1 = writer.sheets['Relaciones por tipo']
-
-        for col_num, col in enumerate(tabla1.columns):
-            sheet1.write(0, col_num, col, bold_black)
 
-        for row_num, row in enumerate(tabla1.itertuples(index=False), start=1):
-            for col_num, cell in enumerate(row):
-                if col_num == 0:
-                    sheet1.write(row_num, col_num, cell, normal)
-                else:
-                    if isinstance(cell, str) and ',' in cell:
-                        parts = [p.strip() for p in cell.split(',')]
-                        rich = []
-                        for i, p in enumerate(parts):
-                            fmt = bold_red if p in seleccionados else normal
-                            rich += [fmt, p]
-                            if i < len(parts) - 1:
-                                rich += [normal, ', ']
-                        sheet1.write_rich_string(row_num, col_num, *rich)
+import xlsxwriter
+
+# Súbelo cuando cambie el Excel generado: forma parte de la clave de los
+# exportados guardados (django_apps.generator.ExportBlob), que dejan de reutilizarse
+EXPORTER_VERSION = 2
+
+# Hojas del Excel exportado
+HOJA_TIPOS = 'Relaciones por tipo'
+HOJA_INDIVIDUALES = 'Relaciones individuales'
+HOJA_DESCRIPCIONES = 'Descr. de elementos mostrados'
+
+
+class _Hoja:
+    """
+    Escritura por filas de una hoja en modo constant_memory: cada celda se
+    escribe una sola vez y en orden de fila (xlsxwriter vuelca cada fila al
+    pasar a la siguiente), y el ancho de cada columna se va calculando con lo
+    que se escribe.
+
+    `segmentos` es la caché (compartida por las hojas del libro) de lo que se
+    escribe para cada texto marcado, ya que los mismos códigos y listas se
+    repiten en todas las tablas.
+    """
+
+    def __init__(self, workbook, nombre, formatos, seleccionados, segmentos):
+        self.sheet = workbook.add_worksheet(nombre)
+        self.bold_red, self.bold_black, self.normal = formatos
+        self.seleccionados = seleccionados
+        self.segmentos = segmentos
+        self.fila = 0
+        self.anchos = {}
+
+    def _ancho(self, col, texto):
+        if len(texto) > self.anchos.get(col, 0):
+            self.anchos[col] = len(texto)
+
+    def _segmentar(self, texto, clave):
+        # (formato, texto) para una celda simple; (formato, texto, formato, texto, ...)
+        # para un rich string, con los fragmentos seguidos del mismo formato ya
+        # unidos: Excel pinta igual "A, B" en un fragmento que en tres y
+        # xlsxwriter genera el XML de cada fragmento por separado
+        if ',' not in texto:
+            return (self.bold_red if clave in self.seleccionados else self.normal, texto)
+        parts = [p.strip() for p in texto.split(',')]
+        if '' in parts:
+            # Excel no admite fragmentos vacíos: texto plano, tal cual
+            return (self.normal, texto)
+        segs = []
+
+        def añadir(fmt, trozo):
+            if segs and segs[-2] is fmt:
+                segs[-1] += trozo
+            else:
+                segs.extend((fmt, trozo))
+
+        for i, part in enumerate(parts):
+            if i:
+                añadir(self.normal, ', ')
+            añadir(self.bold_red if part in self.seleccionados else self.normal, part)
+        return tuple(segs)
+
+    def _marcado(self, row, col, texto, clave):
+        # "A, B, C" con los seleccionados en rojo (rich string); si no, celda simple
+        segs = self.segmentos.get((texto, clave))
+        if segs is None:
+            segs = self.segmentos[(texto, clave)] = self._segmentar(texto, clave)
+        if len(segs) == 2:
+            self.sheet.write(row, col, segs[1], segs[0])
+        elif self.sheet.write_rich_string(row, col, *segs) != 0:
+            self.sheet.write(row, col, texto, self.normal)
+
+    def titulo(self, texto, ncols):
+        # merge_range no admite una sola celda: con 0 o 1 columnas se escribe tal cual
+        if ncols > 1:
+            self.sheet.merge_range(self.fila, 0, self.fila, ncols - 1, texto, self.bold_black)
+        else:
+            self.sheet.write(self.fila, 0, texto, self.bold_black)
+        self.fila += 1
+
+    def tabla(self, tabla, modo):
+        """
+        Cabecera + filas de `tabla` a partir de la fila actual. `modo`:
+          "tipos": tabla 1 (primera columna tal cual, el resto marcado)
+          "marcado": tablas 2 (sin »«, seleccionados en rojo)
+          "texto": tabla 3 (texto plano)
+        """
+        for col, nombre in enumerate(tabla.columns):
+            self.sheet.write(self.fila, col, nombre, self.bold_black)
+            self._ancho(col, str(nombre))
+        self.fila += 1
+
+        for row in tabla.itertuples(index=False):
+            for col, cell in enumerate(row):
+                if modo == "texto" or (modo == "tipos" and col == 0):
+                    texto = str(cell)
+                    self.sheet.write(self.fila, col, texto if modo == "texto" else cell, self.normal)
+                elif modo == "tipos":
+                    texto = str(cell)
+                    if isinstance(cell, str):
+                        self._marcado(self.fila, col, texto, texto.strip())
                     else:
-                        fmt = bold_red if str(cell).strip() in seleccionados else normal
-                        sheet1.write(row_num, col_num, cell, fmt)
-
-        for col_num, col in enumerate(tabla1.columns):
-            valores = [str(col)] + tabla1[col].astype(str).tolist()
-            sheet1.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # --- Sheet 2: Relaciones individuales (SSBB, CE, CEv, DO) ---
-        # Tabla 2: SSBB relacionados
-        tabla2_ssbb.to_excel(writer, sheet_name='Relaciones individuales', index=False, startrow=1, header=False)
-        sheet2 = writer.sheets['Relaciones individuales']
-        
-        for col_num, col in enumerate(tabla2_ssbb.columns):
-            sheet2.write(0, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla2_ssbb.itertuples(index=False), start=1):
-            for col_num, cell in enumerate(row):
-                texto = str(cell).replace('»', '').replace('«', '')
-
-                if ',' in texto:
-                    parts = [p.strip() for p in texto.split(',')]
-                    rich = []
-                    for i, part in enumerate(parts):
-                        fmt = bold_red if part in seleccionados else normal
-                        rich.append(fmt)
-                        rich.append(part)
-                        if i < len(parts) - 1:
-                            rich.append(normal)
-                            rich.append(', ')
-                    sheet2.write_rich_string(row_num, col_num, *rich)
-                else:
-                    fmt = bold_red if texto in seleccionados else normal
-                    sheet2.write(row_num, col_num, texto, fmt)
-
-        for col_num, col in enumerate(tabla2_ssbb.columns):
-            valores = [str(col)] + tabla2_ssbb[col].astype(str).tolist()
-            sheet2.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # Tabla 3: CE relacionados (comienza en fila 2 + height(tabla2_ssbb) + 2)
-        startrow_tabla3 = len(tabla2_ssbb) + 4
-        sheet2.merge_range(startrow_tabla3 - 1, 0, startrow_tabla3 - 1, len(tabla2_ce.columns) - 1, 'Tabla 3: CE relacionados', bold_black)
-        tabla2_ce.to_excel(writer, sheet_name='Relaciones individuales', index=False, startrow=startrow_tabla3, header=False)
-        
-        for col_num, col in enumerate(tabla2_ce.columns):
-            sheet2.write(startrow_tabla3, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla2_ce.itertuples(index=False), start=startrow_tabla3 + 1):
-            for col_num, cell in enumerate(row):
-                texto = str(cell).replace('»', '').replace('«', '')
-                if ',' in texto:
-                    parts = [p.strip() for p in texto.split(',')]
-                    rich = []
-                    for i, part in enumerate(parts):
-                        fmt = bold_red if part in seleccionados else normal
-                        rich.append(fmt)
-                        rich.append(part)
-                        if i < len(parts) - 1:
-                            rich.append(normal)
-                            rich.append(', ')
-                    sheet2.write_rich_string(row_num, col_num, *rich)
-                else:
-                    fmt = bold_red if texto in seleccionados else normal
-                    sheet2.write(row_num, col_num, texto, fmt)
-
-        for col_num, col in enumerate(tabla2_ce.columns):
-            valores = [str(col)] + tabla2_ce[col].astype(str).tolist()
-            sheet2.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # Tabla 4: CEv relacionados
-        startrow_tabla4 = startrow_tabla3 + len(tabla2_ce) + 3
-        sheet2.merge_range(startrow_tabla4 - 1, 0, startrow_tabla4 - 1, len(tabla2_cev.columns) - 1, 'Tabla 4: CEv relacionados', bold_black)
-        tabla2_cev.to_excel(writer, sheet_name='Relaciones individuales', index=False, startrow=startrow_tabla4, header=False)
-        
-        for col_num, col in enumerate(tabla2_cev.columns):
-            sheet2.write(startrow_tabla4, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla2_cev.itertuples(index=False), start=startrow_tabla4 + 1):
-            for col_num, cell in enumerate(row):
-                texto = str(cell).replace('»', '').replace('«', '')
-                if ',' in texto:
-                    parts = [p.strip() for p in texto.split(',')]
-                    rich = []
-                    for i, part in enumerate(parts):
-                        fmt = bold_red if part in seleccionados else normal
-                        rich.append(fmt)
-                        rich.append(part)
-                        if i < len(parts) - 1:
-                            rich.append(normal)
-                            rich.append(', ')
-                    sheet2.write_rich_string(row_num, col_num, *rich)
-                else:
-                    fmt = bold_red if texto in seleccionados else normal
-                    sheet2.write(row_num, col_num, texto, fmt)
-
-        for col_num, col in enumerate(tabla2_cev.columns):
-            valores = [str(col)] + tabla2_cev[col].astype(str).tolist()
-            sheet2.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # Tabla 5: DO relacionados
-        startrow_tabla5 = startrow_tabla4 + len(tabla2_cev) + 3
-        sheet2.merge_range(startrow_tabla5 - 1, 0, startrow_tabla5 - 1, len(tabla2_do.columns) - 1, 'Tabla 5: DO relacionados', bold_black)
-        tabla2_do.to_excel(writer, sheet_name='Relaciones individuales', index=False, startrow=startrow_tabla5, header=False)
-        
-        for col_num, col in enumerate(tabla2_do.columns):
-            sheet2.write(startrow_tabla5, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla2_do.itertuples(index=False), start=startrow_tabla5 + 1):
-            for col_num, cell in enumerate(row):
-                texto = str(cell).replace('»', '').replace('«', '')
-                if ',' in texto:
-                    parts = [p.strip() for p in texto.split(',')]
-                    rich = []
-                    for i, part in enumerate(parts):
-                        fmt = bold_red if part in seleccionados else normal
-                        rich.append(fmt)
-                        rich.append(part)
-                        if i < len(parts) - 1:
-                            rich.append(normal)
-                            rich.append(', ')
-                    sheet2.write_rich_string(row_num, col_num, *rich)
+                        fmt = self.bold_red if texto.strip() in self.seleccionados else self.normal
+                        self.sheet.write(self.fila, col, cell, fmt)
                 else:
-                    fmt = bold_red if texto in seleccionados else normal
-                    sheet2.write(row_num, col_num, texto, fmt)
-
-        for col_num, col in enumerate(tabla2_do.columns):
-            valores = [str(col)] + tabla2_do[col].astype(str).tolist()
-            sheet2.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # Tabla 6: Descripciones de elementos mostrados (antigua tabla 3)
-        startrow_tabla6 = startrow_tabla5 + len(tabla2_do) + 3
-        sheet2.merge_range(startrow_tabla6 - 1, 0, startrow_tabla6 - 1, len(tabla3.columns) - 1, 'Tabla 6: Descripciones de elementos mostrados', bold_black)
-        tabla3.to_excel(writer, sheet_name='Relaciones individuales', index=False, startrow=startrow_tabla6, header=False)
-        
-        for col_num, col in enumerate(tabla3.columns):
-            sheet2.write(startrow_tabla6, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla3.itertuples(index=False), start=startrow_tabla6 + 1):
-            for col_num, cell in enumerate(row):
-                sheet2.write(row_num, col_num, str(cell), normal)
-
-        for col_num, col in enumerate(tabla3.columns):
-            valores = [str(col)] + tabla3[col].astype(str).tolist()
-            sheet2.set_column(col_num, col_num, max(len(v) for v in valores) + 2)
-
-        # --- Sheet 3: Descripciones de elementos mostrados (copia para compatibilidad) ---
-        tabla3.to_excel(writer, sheet_name='Descr. de elementos mostrados', index=False, startrow=1, header=False)
-        sheet3 = writer.sheets['Descr. de elementos mostrados']
-
-        for col_num, col in enumerate(tabla3.columns):
-            sheet3.write(0, col_num, col, bold_black)
-
-        for row_num, row in enumerate(tabla3.itertuples(index=False), start=1):
-            for col_num, cell in enumerate(row):
-                sheet3.write(row_num, col_num, str(cell), normal)
-
-        for col_num, col in enumerate(tabla3.columns):
-            valores = [str(col)] + tabla3[col].astype(str).tolist()
+                    texto = str(cell).replace('»', '').replace('«', '')
+                    self._marcado(self.fila, col, texto, texto)
+                self._ancho(col, texto)
+            self.fila += 1
+
+    def cerrar(self):
+        for col, ancho in self.anchos.items():
+            self.sheet.set_column(col, col, ancho + 2)
+
+
+def exportar_excel(tabla1, tabla2_ssbb, tabla2_ce, tabla2_cev, tabla2_do, tabla3, seleccionados, destino=None):
+    """
+    Escribe el Excel de las seis tablas en `destino` (ruta o fichero binario
+    abierto) y lo devuelve; sin destino lo escribe en un BytesIO.
+
+    Usa el modo constant_memory de xlsxwriter: las filas se vuelcan a disco
+    según se escriben, así que la memoria no crece con el tamaño del Excel.
+    """
+    output = io.BytesIO() if destino is None else destino
+    seleccionados = frozenset(seleccionados)
+    segmentos = {}
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    formatos = (
+        workbook.add_format({'bold': True, 'font_color': 'red'}),
+        workbook.add_format({'bold': True}),
+        workbook.add_format(),
+    )
+
+    # --- Sheet 1: Relaciones por tipo ---
+    hoja = _Hoja(workbook, HOJA_TIPOS, formatos, seleccionados, segmentos)
+    hoja.tabla(tabla1, "tipos")
+    hoja.cerrar()
+
+    # --- Sheet 2: Relaciones individuales (SSBB, CE, CEv, DO) + descripciones ---
+    # Cada bloque va tras su título y filas en blanco (dos tras la primera tabla, una después)
+    hoja = _Hoja(workbook, HOJA_INDIVIDUALES, formatos, seleccionados, segmentos)
+    hoja.tabla(tabla2_ssbb, "marcado")
+    for blancas, titulo, tabla, modo in (
+        (2, 'Tabla 3: CE relacionados', tabla2_ce, "marcado"),
+        (1, 'Tabla 4: CEv relacionados', tabla2_cev, "marcado"),
+        (1, 'Tabla 5: DO relacionados', tabla2_do, "marcado"),
+        (1, 'Tabla 6: Descripciones de elementos mostrados', tabla3, "texto"),
+    ):
+        hoja.fila += blancas
+        hoja.titulo(titulo, len(tabla.columns))
+        hoja.tabla(tabla, modo)
+    hoja.cerrar()
+
+    # --- Sheet 3: Descripciones de elementos mostrados (copia para compatibilidad) ---
+    hoja = _Hoja(workbook, HOJA_DESCRIPCIONES, formatos, seleccionados, segmentos)
+    hoja.tabla(tabla3, "texto")
+    hoja.cerrar()
+
+    workbook.close()
     return output
@@ -0,0 +1,165 @@
+"""
+Exportación de las tablas generadas en formatos de datos (sin formato visual):
+CSV (un fichero por tabla dentro de un ZIP), NDJSON (una línea JSON por fila,
+con la tabla en "tabla") y Parquet (un fichero por tabla dentro de un ZIP;
+requiere pyarrow).
+
+Todo se escribe en trozos de CHUNK_ROWS filas y se devuelve como un iterador
+de bytes, así que sirve igual para un fichero que para un StreamingHttpResponse
+sin tener la salida entera en memoria.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Union
+
+import pandas as pd
+
+FORMATOS = ("xlsx", "csv", "ndjson", "parquet")
+
+# formato -> (content type, extensión del fichero)
+TIPOS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("application/zip", "csv.zip"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/zip", "parquet.zip"),
+}
+
+CHUNK_ROWS = 1000
+
+
+class SalidaStream:
+    """Destino de solo escritura (sin seek, válido para ZipFile): acumula lo escrito hasta take()."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._pos = 0
+
+    def write(self, b) -> int:
+        self._partes.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        out = b"".join(self._partes)
+        self._partes.clear()
+        return out
+
+
+def parquet_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _trozos(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    for i in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[i:i + CHUNK_ROWS]
+
+
+def _valor_json(v):
+    # numpy -> tipos de Python; NaN/NA -> null
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+
+def iter_csv_zip(tablas: Dict[str, pd.DataFrame]) -> Iterator[bytes]:
+    """ZIP con <tabla>.csv (UTF-8, cabecera en la primera fila) para cada tabla."""
+    salida = SalidaStream()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, df in tablas.items():
+            with zf.open(f"{nombre}.csv", "w") as entrada:
+                texto = io.TextIOWrapper(entrada, encoding="utf-8", newline="")
+                writer = csv.writer(texto)
+                writer.writerow(df.columns)
+                for trozo in _trozos(df):
+                    writer.writerows(trozo.itertuples(index=False, name=None))
+                    texto.flush()
+                    yield salida.take()
+                texto.flush()
+                texto.detach()
+            yield salida.take()
+    yield salida.take()
+
+
+def iter_ndjson(tablas: Dict[str, pd.DataFrame]) -> Iterator[bytes]:
+    """Una línea por fila: {"tabla": "tabla2_ce", "CE": "1", ...}."""
+    for nombre, df in tablas.items():
+        columnas = [str(c) for c in df.columns]
+        for trozo in _trozos(df):
+            lineas = []
+            for fila in trozo.itertuples(index=False, name=None):
+                registro = {"tabla": nombre}
+                registro.update(zip(columnas, map(_valor_json, fila)))
+                lineas.append(json.dumps(registro, ensure_ascii=False))
+            yield ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+def iter_parquet_zip(tablas: Dict[str, pd.DataFrame]) -> Iterator[bytes]:
+    """ZIP con <tabla>.parquet para cada tabla (grupos de CHUNK_ROWS filas)."""
+    if not parquet_disponible():
+        raise ImportError("El formato 'parquet' requiere el paquete pyarrow.")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    salida = SalidaStream()
+    with tempfile.TemporaryDirectory(prefix="saberes-parquet-") as carpeta:
+        with zipfile.ZipFile(salida, "w", zipfile.ZIP_STORED) as zf:
+            for nombre, df in tablas.items():
+                ruta = os.path.join(carpeta, f"{nombre}.parquet")
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                with pq.ParquetWriter(ruta, schema) as writer:
+                    for trozo in _trozos(df):
+                        writer.write_table(pa.Table.from_pandas(trozo, schema=schema, preserve_index=False))
+                # Parquet ya va comprimido por columnas: se guarda tal cual
+                zf.write(ruta, f"{nombre}.parquet")
+                os.remove(ruta)
+                yield salida.take()
+        yield salida.take()
+
+
+_ESCRITORES = {
+    "csv": iter_csv_zip,
+    "ndjson": iter_ndjson,
+    "parquet": iter_parquet_zip,
+}
+
+
+def iter_formato(tablas: Dict[str, pd.DataFrame], formato: str) -> Iterator[bytes]:
+    """Las tablas en `formato` (csv, ndjson o parquet), en trozos de bytes."""
+    formato = (formato or "").strip().lower()
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato desconocido: {formato!r}. Opciones: {', '.join(_ESCRITORES)}")
+    if formato == "parquet" and not parquet_disponible():
+        # antes de empezar a escribir, no al pedir el primer trozo
+        raise ImportError("El formato 'parquet' requiere el paquete pyarrow.")
+    return _ESCRITORES[formato](tablas)
+
+
+def escribir_formato(
+    tablas: Dict[str, pd.DataFrame],
+    formato: str,
+    destino: Union[str, os.PathLike, BinaryIO],
+) -> int:
+    """Escribe las tablas en `destino` (ruta o fichero binario abierto); devuelve los bytes escritos."""
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "wb") as fh:
+            return escribir_formato(tablas, formato, fh)
+    total = 0
+    for trozo in iter_formato(tablas, formato):
+        destino.write(trozo)
+        total += len(trozo)
+    return total
@@ -89,9 +89,44 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # la web y los workers de exportación escriben a la vez: esperar al lock
+        "OPTIONS": {"timeout": 20},
     }
 }
 
+# -------------------------------------------------------------------
+# Cache
+# "saberes_results" guarda los resultados de generate_from_excel
+# (ver core.engine.result_cache). Para compartirlos entre workers de gunicorn,
+# cambiar a FileBasedCache con LOCATION en disco.
+# -------------------------------------------------------------------
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "saberes_results": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "saberes-results",
+        "TIMEOUT": int(os.environ.get("SABERES_RESULT_CACHE_TTL", "900")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("SABERES_RESULT_CACHE_SIZE", "128"))},
+    },
+}
+SABERES_RESULT_CACHE = "saberes_results"
+
+# -------------------------------------------------------------------
+# Export queue
+# Las exportaciones se encolan en ExportJob y las generan los procesos de
+# `manage.py run_export_workers` (ver django_apps.generator.jobs).
+# -------------------------------------------------------------------
+EXPORT_WORKERS = int(os.environ.get("SABERES_EXPORT_WORKERS", "2"))
+EXPORT_POLL_SECONDS = float(os.environ.get("SABERES_EXPORT_POLL_SECONDS", "1"))
+# Un RUNNING más antiguo que esto se da por perdido y vuelve a PENDING
+EXPORT_STALE_MINUTES = int(os.environ.get("SABERES_EXPORT_STALE_MINUTES", "15"))
+# Procesos por descarga de la exportación masiva (un Excel por CE/CEv/bloque, en ZIP)
+EXPORT_BULK_WORKERS = int(os.environ.get("SABERES_EXPORT_BULK_WORKERS", "2"))
+# `manage.py gc_export_blobs` no borra blobs ni ficheros más recientes que esto
+EXPORT_GC_GRACE_MINUTES = int(os.environ.get("SABERES_EXPORT_GC_GRACE_MINUTES", "60"))
+
 # -------------------------------------------------------------------
 # Password validation
 # -------------------------------------------------------------------